@@ -0,0 +1,141 @@
+"""
+Columnar store for indexed document metadata.
+
+Instead of a Python dict per document, paths are packed into UTF-8 blobs
+addressed by offset arrays, and each document records the byte range of its
+content: inside its file on disk for scanned files (read through the shared
+file cache), or inside an inline content blob otherwise. Columns are numpy
+arrays, so a store can be saved and memory-mapped back in.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+import numpy as np
+from loguru import logger
+
+from app.core.file_cache import file_cache
+
+_CORE_FIELDS = {"path", "full_path", "size", "content"}
+_COLUMNS = ("path_offsets", "full_path_offsets", "content_start", "content_end", "inline", "size")
+
+
+class DocumentStore:
+    def __init__(self, documents: Optional[List[Dict]] = None):
+        self._blobs = {"path": b"", "full_path": b"", "content": b""}
+        self._columns: Dict[str, np.ndarray] = {
+            "path_offsets": np.zeros(1, dtype=np.int64),
+            "full_path_offsets": np.zeros(1, dtype=np.int64),
+            "content_start": np.zeros(0, dtype=np.int64),
+            "content_end": np.zeros(0, dtype=np.int64),
+            "inline": np.zeros(0, dtype=bool),
+            "size": np.zeros(0, dtype=np.int64),
+        }
+        # Rare per-document fields outside the fixed columns
+        self._extras: Dict[int, Dict] = {}
+        if documents:
+            self.extend(documents)
+
+    def extend(self, documents: List[Dict]):
+        paths, full_paths, inline_content = [], [], []
+        starts, ends, inline, sizes = [], [], [], []
+        content_offset = len(self._blobs["content"])
+        base = len(self)
+        for i, doc in enumerate(documents):
+            paths.append(doc["path"].encode("utf-8"))
+            full_paths.append((doc.get("full_path") or "").encode("utf-8"))
+            if doc.get("full_path"):
+                # Scanned files: served from disk; -1 means to the end of the file
+                starts.append(doc.get("content_start", 0))
+                ends.append(doc.get("content_end", -1))
+                inline.append(False)
+            else:
+                data = (doc.get("content") or "").encode("utf-8")
+                starts.append(content_offset)
+                content_offset += len(data)
+                ends.append(content_offset)
+                inline.append(True)
+                inline_content.append(data)
+            sizes.append(doc.get("size", 0))
+            extras = {k: v for k, v in doc.items() if k not in _CORE_FIELDS and k not in ("content_start", "content_end")}
+            if extras:
+                self._extras[base + i] = extras
+
+        self._append_blob("path", paths)
+        self._append_blob("full_path", full_paths)
+        self._blobs["content"] += b"".join(inline_content)
+        cols = self._columns
+        cols["content_start"] = np.concatenate([cols["content_start"], np.array(starts, dtype=np.int64)])
+        cols["content_end"] = np.concatenate([cols["content_end"], np.array(ends, dtype=np.int64)])
+        cols["inline"] = np.concatenate([cols["inline"], np.array(inline, dtype=bool)])
+        cols["size"] = np.concatenate([cols["size"], np.array(sizes, dtype=np.int64)])
+
+    def __len__(self) -> int:
+        return len(self._columns["size"])
+
+    def __getitem__(self, doc_id: int) -> Dict:
+        if not -len(self) <= doc_id < len(self):
+            raise IndexError(doc_id)
+        doc_id %= len(self)
+        doc = {"path": self._string("path", doc_id), "size": int(self._columns["size"][doc_id])}
+        full_path = self._string("full_path", doc_id)
+        if full_path:
+            doc["full_path"] = full_path
+        doc.update(self._extras.get(doc_id, {}))
+        return doc
+
+    def __iter__(self) -> Iterator[Dict]:
+        for doc_id in range(len(self)):
+            yield self[doc_id]
+
+    def get_content(self, doc_id: int) -> str:
+        start = int(self._columns["content_start"][doc_id])
+        end = int(self._columns["content_end"][doc_id])
+        if self._columns["inline"][doc_id]:
+            return self._blobs["content"][start:end].decode("utf-8")
+        full_path = self._string("full_path", doc_id)
+        try:
+            data = file_cache.get_bytes(full_path)
+        except OSError as e:
+            logger.warning(f"Indexed file is no longer readable: {full_path} ({e})")
+            return ""
+        if start == 0 and end == -1:
+            return data.decode("utf-8", errors="ignore")
+        return data[start:None if end < 0 else end].decode("utf-8", errors="ignore")
+
+    def nbytes(self) -> int:
+        """Approximate resident size of the store."""
+        return (sum(len(b) for b in self._blobs.values())
+                + sum(c.nbytes for c in self._columns.values())
+                + len(json.dumps(self._extras, default=str)))
+
+    def save(self, directory: Union[str, Path]):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name, column in self._columns.items():
+            np.save(directory / f"{name}.npy", column)
+        for name, blob in self._blobs.items():
+            (directory / f"{name}.blob").write_bytes(blob)
+        (directory / "extras.json").write_text(json.dumps({str(k): v for k, v in self._extras.items()}, default=str))
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], mmap: bool = True) -> "DocumentStore":
+        """Load a saved store; with `mmap`, columns are mapped instead of read."""
+        directory = Path(directory)
+        store = cls()
+        for name in _COLUMNS:
+            store._columns[name] = np.load(directory / f"{name}.npy", mmap_mode="r" if mmap else None)
+        for name in store._blobs:
+            store._blobs[name] = (directory / f"{name}.blob").read_bytes()
+        store._extras = {int(k): v for k, v in json.loads((directory / "extras.json").read_text()).items()}
+        return store
+
+    def _append_blob(self, name: str, values: List[bytes]):
+        offsets = self._columns[f"{name}_offsets"]
+        lengths = np.fromiter((len(v) for v in values), dtype=np.int64, count=len(values))
+        self._columns[f"{name}_offsets"] = np.concatenate([offsets, offsets[-1] + np.cumsum(lengths)])
+        self._blobs[name] += b"".join(values)
+
+    def _string(self, name: str, doc_id: int) -> str:
+        offsets = self._columns[f"{name}_offsets"]
+        return self._blobs[name][int(offsets[doc_id]):int(offsets[doc_id + 1])].decode("utf-8")
@@ -1,46 +1,220 @@
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
-import faiss
+from typing import List, Dict, Any, Optional
 import numpy as np
 import os
+import threading
+import time
 from loguru import logger
 
+from app.ai_engine.encoders import get_encoder
+from app.ai_engine.document_store import DocumentStore
+from app.ai_engine.encoder_pool import EncoderPool
+from app.ai_engine.lexical_index import BM25Index, reciprocal_rank_fusion
+from app.ai_engine.query_batcher import QueryBatcher
+from app.ai_engine.search_scope import ScopeIndex, normalize_scope
+from app.ai_engine.vector_index import build_faiss_index, create_faiss_index
+from app.core.config import settings
+from app.core.file_cache import file_cache
+
+# Candidates taken from each retriever per requested result before fusion
+HYBRID_CANDIDATES_FACTOR = 4
+
+# Vectors decoded at a time when scoring a scope directly
+SCOPE_DIRECT_CHUNK = 8192
+
 class EmbeddingManager:
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
-        self.model = SentenceTransformer(model_name)
-        self.dimension = 384 # Dimension for all-MiniLM-L6-v2
+    def __init__(self, model_name: Optional[str] = None, backend: Optional[str] = None):
+        # Backends import torch/onnxruntime when loaded, not at module import
+        self.encoder = get_encoder(backend, model_name)
+        self.dimension = self.encoder.dimension
         self.index = None
-        self.documents = [] # Metadata store
+        self.documents = DocumentStore() # Metadata store
+        self._pool: Optional[EncoderPool] = None
+        # Set by the index service to encode concurrent queries together
+        self.query_batcher: Optional[QueryBatcher] = None
+        self.lexical: Optional[BM25Index] = None
+        self.scope_index: Optional[ScopeIndex] = None
+        self._doc_ids: Dict[str, int] = {}
+        # Indexed files written since the lexical index last saw them
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+        # BM25 postings are plain dicts: refreshing and searching them must
+        # not overlap (retrieval runs on worker threads)
+        self._lexical_lock = threading.Lock()
+        file_cache.add_listener(self._mark_dirty)
 
     def generate_embeddings(self, texts: List[str]) -> np.ndarray:
-        return self.model.encode(texts)
+        return self.encoder.encode(texts, batch_size=settings.EMBEDDING_BATCH_SIZE)
+
+    def close(self):
+        file_cache.remove_listener(self._mark_dirty)
+        if self.query_batcher is not None:
+            self.query_batcher.close()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def _use_pool(self, count: int) -> bool:
+        workers = settings.EMBEDDING_WORKERS or os.cpu_count() or 1
+        return workers > 1 and count >= settings.EMBEDDING_POOL_MIN_TEXTS
 
     def create_index(self, documents: List[Dict]):
         """
         documents: List of dicts with 'content' and 'path'
+
+        Documents scanned from disk (with a 'full_path') are stored without
+        their content, which is served from the shared file cache instead.
+        Vectors are stored as configured by EMBEDDING_INDEX_TYPE.
         """
-        self.documents = documents
         texts = [doc['content'] for doc in documents]
         
         if not texts:
             logger.warning("No texts to index")
+            self.documents, self.index, self.scope_index = DocumentStore(), None, None
             return
 
-        embeddings = self.generate_embeddings(texts)
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.index.add(embeddings.astype('float32'))
+        index = create_faiss_index(self.dimension, count=len(texts))
+        if self._use_pool(len(texts)):
+            # Shards finish out of order; documents are kept in insertion order.
+            # Workers load the same model as this manager's encoder, and are
+            # shut down afterwards rather than held between (rare) bulk builds
+            pool = self._pool = EncoderPool(self.encoder.name, self.encoder.model_name)
+            order, shards = [], []
+            try:
+                for indices, embeddings in pool.encode_stream(texts):
+                    order.extend(indices)
+                    if index.is_trained:
+                        index.add(embeddings.astype('float32'))
+                    else:
+                        # Quantizers are trained on the whole corpus before adding
+                        shards.append(embeddings)
+            finally:
+                pool.close()
+                self._pool = None
+            if shards:
+                index = build_faiss_index(np.concatenate(shards))
+            documents = [documents[i] for i in order]
+        elif index.is_trained:
+            index.add(self.generate_embeddings(texts).astype('float32'))
+        else:
+            index = build_faiss_index(self.generate_embeddings(texts))
+
+        started = time.perf_counter()
+        lexical = BM25Index()
+        for doc_id, doc in enumerate(documents):
+            lexical.add(doc_id, self._lexical_text(doc['path'], doc['content']))
+        logger.info(f"Built lexical index in {time.perf_counter() - started:.2f}s")
+        doc_ids = {os.path.abspath(doc['full_path']): i for i, doc in enumerate(documents) if doc.get('full_path')}
+        store = DocumentStore(documents)
+        scope_index = ScopeIndex(store)
+
+        # Swap in together so searches never see a half-built index
+        with self._dirty_lock:
+            self._dirty.clear()
+        self.documents, self.index, self.lexical, self._doc_ids = store, index, lexical, doc_ids
+        self.scope_index = scope_index
         logger.info(f"Indexed {len(documents)} documents")
 
-    def search(self, query: str, k: int = 5) -> List[Dict]:
+    def memory_usage(self) -> Dict[str, int]:
+        from app.ai_engine.vector_index import index_nbytes
+
+        index_bytes = index_nbytes(self.index) if self.index is not None else 0
+        documents_bytes = self.documents.nbytes()
+        return {"index_bytes": index_bytes, "documents_bytes": documents_bytes,
+                "total_bytes": index_bytes + documents_bytes}
+
+    def search(self, query: str, k: int = 5, scope: Optional[Dict] = None) -> List[Dict]:
+        """
+        Top `k` documents for `query`. With RETRIEVAL_HYBRID, vector and BM25
+        results are fused by reciprocal rank, so exact identifiers and error
+        strings are found even when the embedding misses them.
+
+        A `scope` (see `search_scope`) is resolved to document ids first and
+        both retrievers rank only those, so the top `k` all come from it.
+        """
         if not self.index or not self.documents:
             return []
-        
-        query_vector = self.generate_embeddings([query])
-        distances, indices = self.index.search(query_vector.astype('float32'), k)
-        
-        results = []
-        for idx in indices[0]:
-            if idx != -1 and idx < len(self.documents):
-                results.append(self.documents[idx])
-        
-        return results
+        allowed = None
+        scope = normalize_scope(scope)
+        if scope and self.scope_index is not None:
+            allowed = self.scope_index.select(scope)
+            if not len(allowed):
+                return []
+
+        hybrid = settings.RETRIEVAL_HYBRID and self.lexical is not None
+        candidates = k * HYBRID_CANDIDATES_FACTOR if hybrid else k
+        if self.query_batcher is not None:
+            query_vector = self.query_batcher.encode([query])
+        else:
+            query_vector = self.generate_embeddings([query])
+        query_vector = query_vector.astype('float32')
+        if allowed is None:
+            distances, indices = self.index.search(query_vector, candidates)
+            distances, indices = distances[0], indices[0]
+        else:
+            distances, indices = self._search_subset(query_vector, allowed, candidates)
+        # Scores are comparable within one result list: similarity for vector
+        # search alone, the fused reciprocal-rank score for hybrid search
+        scored = [(int(idx), 1.0 / (1.0 + float(distance))) for idx, distance in zip(indices, distances)
+                  if idx != -1 and idx < len(self.documents)]
+
+        if hybrid:
+            lexical_allowed = None if allowed is None else set(allowed.tolist())
+            with self._lexical_lock:
+                self._refresh_lexical()
+                lexical = [doc_id for doc_id, _ in self.lexical.search(query, candidates, allowed=lexical_allowed)]
+            scored = reciprocal_rank_fusion([[idx for idx, _ in scored], lexical], settings.RETRIEVAL_RRF_K)
+
+        return [dict(self.documents[idx], content=self.get_content(idx), score=round(score, 6)) for idx, score in scored[:k]]
+
+    def _search_subset(self, query_vector: np.ndarray, ids: np.ndarray, k: int):
+        """Nearest `k` of the documents `ids`: (distances, ids), closest first."""
+        import faiss
+
+        if not isinstance(self.index, faiss.IndexPQ):
+            # Vectors outside the selection are skipped without computing distances
+            selected = np.zeros(self.index.ntotal, dtype=bool)
+            selected[ids] = True
+            bitmap = np.packbits(selected, bitorder="little")
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBitmap(bitmap))
+            distances, indices = self.index.search(query_vector, k, params=params)
+            return distances[0], indices[0]
+
+        # PQ takes no search parameters: decode the selection and compare
+        # directly, giving the same (squared L2) distances the index reports
+        distances = np.empty(len(ids), dtype=np.float32)
+        for start in range(0, len(ids), SCOPE_DIRECT_CHUNK):
+            chunk = ids[start:start + SCOPE_DIRECT_CHUNK]
+            vectors = self.index.reconstruct_batch(chunk)
+            distances[start:start + len(chunk)] = ((vectors - query_vector) ** 2).sum(axis=1)
+        top = np.argpartition(distances, k)[:k] if len(ids) > k else np.arange(len(ids))
+        top = top[np.argsort(distances[top], kind="stable")]
+        return distances[top], ids[top]
+
+    def _mark_dirty(self, path: str):
+        if path in self._doc_ids:
+            if self.scope_index is not None:
+                self.scope_index.touch(self._doc_ids[path])
+            with self._dirty_lock:
+                self._dirty.add(path)
+
+    def _refresh_lexical(self):
+        """Re-tokenize indexed files edited since the last query; the caller holds `_lexical_lock`."""
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        for path in dirty:
+            doc_id = self._doc_ids.get(path)
+            if doc_id is None:
+                continue
+            if os.path.exists(path):
+                self.lexical.add(doc_id, self._lexical_text(self.documents[doc_id]['path'], self.get_content(doc_id)))
+            else:
+                self.lexical.remove(doc_id)
+
+    @staticmethod
+    def _lexical_text(path: str, content: str) -> str:
+        # The path is indexed too, so file names in a query match
+        return f"{path}\n{content}"
+
+    def get_content(self, doc_id: int) -> str:
+        """Content of an indexed document, read through the shared file cache."""
+        return self.documents.get_content(doc_id)
@@ -0,0 +1,84 @@
+"""
+Multi-process encoder pool for bulk indexing.
+
+Each worker process loads its own encoder (see `encoders.py`) pinned to a
+few threads, so a large corpus is encoded on all cores instead of one
+process. Texts are sorted by length and cut into shards, so every batch
+holds texts of similar length and little compute is wasted on padding.
+Finished shards are yielded as they complete, letting the caller add them
+to the index while the rest are still encoding.
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+
+# Batches per shard: large enough to amortise inter-process overhead, small
+# enough that results stream back steadily
+BATCHES_PER_SHARD = 4
+
+_worker_encoder = None
+
+
+def _init_worker(backend: str, model_name: str, threads: int):
+    global _worker_encoder
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    from app.ai_engine.encoders import get_encoder
+    _worker_encoder = get_encoder(backend, model_name)
+
+
+def _encode_shard(indices: List[int], texts: List[str], batch_size: int) -> Tuple[List[int], np.ndarray]:
+    return indices, _worker_encoder.encode(texts, batch_size=batch_size)
+
+
+class EncoderPool:
+    def __init__(self, backend: Optional[str] = None, model_name: Optional[str] = None,
+                 workers: Optional[int] = None, batch_size: Optional[int] = None):
+        self.backend = backend or settings.EMBEDDING_BACKEND
+        self.model_name = model_name or settings.EMBEDDING_MODEL
+        self.workers = workers or settings.EMBEDDING_WORKERS or os.cpu_count() or 1
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        threads = max((os.cpu_count() or 1) // self.workers, 1)
+        # Spawned workers: forking a process that already loaded torch is unsafe
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.backend, self.model_name, threads),
+        )
+        logger.info(f"Started encoder pool: {self.workers} workers x {threads} threads ({self.backend})")
+
+    def shards(self, texts: List[str]) -> List[List[int]]:
+        """Indices of `texts`, grouped into length-sorted shards."""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        size = self.batch_size * BATCHES_PER_SHARD
+        return [order[i:i + size] for i in range(0, len(order), size)]
+
+    def encode_stream(self, texts: List[str]) -> Iterator[Tuple[List[int], np.ndarray]]:
+        """
+        Encode `texts` across the pool, yielding (indices, vectors) per shard
+        in completion order.
+        """
+        started = time.perf_counter()
+        futures = [
+            self._executor.submit(_encode_shard, shard, [texts[i] for i in shard], self.batch_size)
+            for shard in self.shards(texts)
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+        elapsed = time.perf_counter() - started
+        logger.info(f"Encoded {len(texts)} chunks in {elapsed:.1f}s ({len(texts) / max(elapsed, 1e-9):.1f} chunks/s)")
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
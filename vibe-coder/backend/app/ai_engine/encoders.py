@@ -0,0 +1,97 @@
+"""
+Sentence encoder backends.
+
+All backends wrap a sentence-transformers model and produce the same
+embeddings (up to quantization error); they differ in how inference runs on
+the CPU:
+
+- torch: full-precision PyTorch (the reference)
+- torch_int8: PyTorch with Linear layers dynamically quantized to int8
+- onnx: ONNX Runtime
+- onnx_int8: ONNX Runtime with an int8-quantized export of the model
+
+The backend is chosen by `EMBEDDING_BACKEND`. ONNX backends need
+`sentence-transformers[onnx]` (onnxruntime and optimum).
+"""
+
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+
+
+class Encoder(ABC):
+    """A loaded sentence-transformers model behind a common interface"""
+
+    name = "base"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.model = self._load(model_name)
+        # Read from the model rather than assumed, so any model can be configured
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    @abstractmethod
+    def _load(self, model_name: str):
+        """Load the model, which must provide `encode` and `get_sentence_embedding_dimension`"""
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=batch_size), dtype='float32')
+
+
+class TorchEncoder(Encoder):
+    name = "torch"
+
+    def _load(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name, device="cpu")
+
+
+class TorchInt8Encoder(TorchEncoder):
+    name = "torch_int8"
+
+    def _load(self, model_name: str):
+        import torch
+
+        model = super()._load(model_name)
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxEncoder(Encoder):
+    name = "onnx"
+    file_name: Optional[str] = None
+
+    def _load(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        model_kwargs = {"file_name": self.file_name} if self.file_name else None
+        # Exports the model on first use if the repository has no ONNX file
+        return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+
+class OnnxInt8Encoder(OnnxEncoder):
+    name = "onnx_int8"
+
+    @property
+    def file_name(self) -> str:
+        return settings.EMBEDDING_ONNX_INT8_FILE
+
+
+ENCODERS: Dict[str, Callable[[str], Encoder]] = {
+    TorchEncoder.name: TorchEncoder,
+    TorchInt8Encoder.name: TorchInt8Encoder,
+    OnnxEncoder.name: OnnxEncoder,
+    OnnxInt8Encoder.name: OnnxInt8Encoder,
+}
+
+
+def get_encoder(backend: Optional[str] = None, model_name: Optional[str] = None) -> Encoder:
+    """Load the configured (or given) encoder backend."""
+    backend = backend or settings.EMBEDDING_BACKEND
+    model_name = model_name or settings.EMBEDDING_MODEL
+    if backend not in ENCODERS:
+        raise ValueError(f"Unknown embedding backend '{backend}'; expected one of {', '.join(ENCODERS)}")
+    logger.info(f"Loading {model_name} with the {backend} encoder backend")
+    return ENCODERS[backend](model_name)
@@ -0,0 +1,110 @@
+"""
+BM25 lexical index and rank fusion.
+
+Complements vector search for queries that name an exact identifier, error
+message or file. Identifiers are indexed both whole and split into their
+camelCase / snake_case parts, so `apply_diff`, `applyDiff` and "apply diff"
+all match. Documents can be added, replaced and removed incrementally.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+# Very common code tokens carry no signal
+STOPWORDS = frozenset({
+    "the", "a", "an", "and", "or", "of", "to", "in", "is", "it", "for", "on", "with", "as",
+    "self", "this", "return", "if", "else", "def", "import", "from", "none", "true", "false",
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased identifiers plus their camelCase / snake_case parts."""
+    tokens = []
+    for word in _WORD.findall(text):
+        lower = word.lower()
+        parts = [p.lower() for p in _PART.findall(word)]
+        if lower not in STOPWORDS:
+            tokens.append(lower)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p not in STOPWORDS and len(p) > 1)
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: Dict[int, int] = {}
+        # Terms of each document, so removal touches only its own postings
+        self._doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, doc_id: int, text: str):
+        """Index a document, replacing any previous version of it."""
+        if doc_id in self._lengths:
+            self.remove(doc_id)
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        length = sum(counts.values())
+        self._doc_terms[doc_id] = tuple(counts)
+        self._lengths[doc_id] = length
+        self._total_length += length
+
+    def remove(self, doc_id: int):
+        length = self._lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in self._doc_terms.pop(doc_id, ()):
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str, k: int = 10, allowed: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """Top `k` (doc_id, score) pairs for `query`, among the `allowed` documents if given."""
+        if not self._lengths:
+            return []
+        if allowed is not None and not isinstance(allowed, (set, frozenset)):
+            allowed = set(allowed)
+        n = len(self._lengths)
+        avg_length = self._total_length / n or 1.0
+        terms = [term for term in set(tokenize(query)) if term in self._postings]
+        # A small allowed set is cheaper to look up than the postings are to scan
+        probe = allowed is not None and len(allowed) < sum(len(self._postings[term]) for term in terms)
+        scores: Dict[int, float] = {}
+        for term in terms:
+            postings = self._postings[term]
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            if probe:
+                matches = ((doc_id, postings[doc_id]) for doc_id in allowed if doc_id in postings)
+            elif allowed is not None:
+                matches = ((doc_id, tf) for doc_id, tf in postings.items() if doc_id in allowed)
+            else:
+                matches = postings.items()
+            for doc_id, tf in matches:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Fuse ranked lists of ids: each id scores sum(1 / (k + rank)) over the
+    lists it appears in. Robust to the lists' scores being on different scales.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
@@ -1,11 +1,16 @@
-from typing import Any, List, Optional, AsyncGenerator
-from langchain_community.chat_models import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage, AIMessage, BaseMessage
+from typing import Any, List, Optional, AsyncGenerator, Dict, TYPE_CHECKING
 from pydantic import BaseModel
 from loguru import logger
+import hashlib
+import json
 import os
 
+from app.ai_engine.llm_scheduler import get_llm_scheduler
 from app.core.config import settings
+from app.core.single_flight import StreamFanout
+
+if TYPE_CHECKING:
+    from langchain.schema import BaseMessage
 
 class LLMConfig(BaseModel):
     base_url: str = "http://localhost:11434/v1" # Default to Ollama
@@ -13,8 +18,14 @@ class LLMConfig(BaseModel):
     model: str = "llama3" # Default model
     temperature: float = 0.7
 
+# Deterministic generations in progress, shared by identical requests
+llm_streams = StreamFanout()
+
 class LLMManager:
     def __init__(self, config: Optional[LLMConfig] = None):
+        # langchain is slow to import, so it is only loaded with the first manager
+        from langchain_community.chat_models import ChatOpenAI
+
         self.config = config or LLMConfig()
         self.llm = ChatOpenAI(
             base_url=self.config.base_url,
@@ -23,24 +34,61 @@ class LLMManager:
             temperature=self.config.temperature,
             streaming=True
         )
+        # Shared by every manager talking to the same model server
+        self.scheduler = get_llm_scheduler(self.config.base_url)
+
+    @property
+    def deterministic(self) -> bool:
+        """Identical messages produce identical replies, so they can share a generation."""
+        return self.config.temperature == 0
+
+    async def stream_response(self, messages: List["BaseMessage"], session: str = "",
+                              priority: str = "interactive") -> AsyncGenerator[str, None]:
+        """
+        Stream a reply; the request holds a scheduler slot until the stream
+        ends. Raises LLMQueueFull when the backend is saturated.
+
+        When the model is deterministic, a request identical to one already
+        streaming joins it instead of starting another generation: it gets
+        the chunks produced so far, then the rest as they arrive.
+        """
+        if settings.SINGLE_FLIGHT and self.deterministic:
+            source = lambda: self._stream(messages, session, priority)
+            async for chunk in llm_streams.subscribe(self._request_key(messages), source):
+                yield chunk
+        else:
+            async for chunk in self._stream(messages, session, priority):
+                yield chunk
+
+    async def _stream(self, messages: List["BaseMessage"], session: str, priority: str) -> AsyncGenerator[str, None]:
+        async with self.scheduler.slot(session, priority):
+            try:
+                async for chunk in self.llm.astream(messages):
+                    yield chunk.content
+            except Exception as e:
+                logger.error(f"LLM Stream Error: {e}")
+                yield f"Error: {str(e)}"
+
+    async def get_response(self, messages: List["BaseMessage"], session: str = "", priority: str = "rest") -> str:
+        """Complete reply, admitted by the scheduler; raises LLMQueueFull when saturated."""
+        if settings.SINGLE_FLIGHT and self.deterministic:
+            # Shares the generation with identical streaming requests too
+            return "".join([chunk async for chunk in self.stream_response(messages, session, priority)])
+        async with self.scheduler.slot(session, priority):
+            try:
+                response = await self.llm.ainvoke(messages)
+                return response.content
+            except Exception as e:
+                logger.error(f"LLM Invoice Error: {e}")
+                return f"Error: {str(e)}"
+
+    def _request_key(self, messages: List["BaseMessage"]) -> str:
+        payload = [self.config.base_url, self.config.model] + [[m.type, m.content] for m in messages]
+        return hashlib.sha1(json.dumps(payload, default=str).encode("utf-8")).hexdigest()
+
+    def create_messages(self, system_prompt: str, user_query: str, history: List[Dict[str, str]] = None) -> List["BaseMessage"]:
+        from langchain.schema import HumanMessage, SystemMessage, AIMessage
 
-    async def stream_response(self, messages: List[BaseMessage]) -> AsyncGenerator[str, None]:
-        try:
-            async for chunk in self.llm.astream(messages):
-                yield chunk.content
-        except Exception as e:
-            logger.error(f"LLM Stream Error: {e}")
-            yield f"Error: {str(e)}"
-
-    async def get_response(self, messages: List[BaseMessage]) -> str:
-        try:
-            response = await self.llm.ainvoke(messages)
-            return response.content
-        except Exception as e:
-            logger.error(f"LLM Invoice Error: {e}")
-            return f"Error: {str(e)}"
-            
-    def create_messages(self, system_prompt: str, user_query: str, history: List[Dict[str, str]] = None) -> List[BaseMessage]:
         msgs = [SystemMessage(content=system_prompt)]
         if history:
             for h in history:
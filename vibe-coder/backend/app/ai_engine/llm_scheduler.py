@@ -0,0 +1,181 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+from loguru import logger
+
+from app.core.config import settings
+
+# Lower value runs first: WebSocket chat, then REST chat, then batch/agent work
+PRIORITIES = {"interactive": 0, "rest": 1, "batch": 2}
+
+
+class LLMQueueFull(Exception):
+    """Raised instead of queueing when the backend is saturated."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMScheduler:
+    """
+    Admits requests to one LLM backend under a max-in-flight cap.
+
+    Waiting requests start in priority order. Within a priority, sessions
+    take turns (round robin), so one busy session cannot starve the others.
+    A request is rejected up front with a retry-after estimate when
+    `max_queue` requests would run before it, so a backlog of batch work
+    never makes interactive requests wait or fail; requests that wait past
+    the timeout are dropped the same way.
+
+    State is per process, so the caps apply to each web worker separately.
+    """
+
+    def __init__(self, backend: str = "", max_in_flight: Optional[int] = None, max_queue: Optional[int] = None,
+                 queue_timeout: Optional[float] = None):
+        self.backend = backend
+        self.max_in_flight = max_in_flight or settings.LLM_MAX_IN_FLIGHT_PER_WORKER
+        self.max_queue = settings.LLM_MAX_QUEUE_PER_WORKER if max_queue is None else max_queue
+        self.queue_timeout = settings.LLM_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self._in_flight = 0
+        # priority -> session -> waiting futures; dict order is the round-robin turn order
+        self._queues: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._queued = 0
+        self._wait_times: Dict[str, deque] = {p: deque(maxlen=512) for p in PRIORITIES}
+        self._admitted: Dict[str, int] = defaultdict(int)
+        self._rejected: Dict[str, int] = defaultdict(int)
+        # Moving average of how long a request holds its slot
+        self._service_time = 0.0
+
+    @asynccontextmanager
+    async def slot(self, session: str = "", priority: str = "rest") -> AsyncIterator[float]:
+        """Wait for a free slot; yields the time spent waiting in seconds."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {list(PRIORITIES)}")
+
+        started = time.monotonic()
+        await self._acquire(session, priority)
+        waited = time.monotonic() - started
+        self._wait_times[priority].append(waited)
+        self._admitted[priority] += 1
+        if waited > 1:
+            logger.info(f"LLM request for {session or 'anonymous'} ({priority}) waited {waited:.2f}s")
+        try:
+            yield waited
+        finally:
+            held = time.monotonic() - started - waited
+            self._service_time = held if not self._service_time else 0.8 * self._service_time + 0.2 * held
+            self._release()
+
+    def check_capacity(self, priority: str = "rest"):
+        """Raise LLMQueueFull now if a new request would be rejected, before doing work for it."""
+        ahead = self._queued_ahead(priority)
+        must_wait = ahead > 0 or self._in_flight >= self.max_in_flight
+        if must_wait and ahead >= self.max_queue:
+            self._rejected[priority] += 1
+            raise LLMQueueFull(f"LLM queue for {self.backend or 'the model'} is full", self.retry_after(priority))
+
+    def retry_after(self, priority: str = "rest") -> int:
+        """Seconds until a new request of `priority` would likely be admitted."""
+        per_request = self._service_time or 1.0
+        return max(1, math.ceil(per_request * (self._queued_ahead(priority) / self.max_in_flight + 1)))
+
+    def _queued_ahead(self, priority: str) -> int:
+        """Queued requests that would start before a new one of `priority`."""
+        rank = PRIORITIES[priority]
+        return sum(len(waiters) for name, queue in self._queues.items() if PRIORITIES[name] <= rank
+                   for waiters in queue.values())
+
+    def stats(self) -> Dict:
+        wait_times = {}
+        for priority, samples in self._wait_times.items():
+            ordered = sorted(samples)
+            wait_times[priority] = {
+                "admitted": self._admitted[priority],
+                "rejected": self._rejected[priority],
+                "queued": sum(len(q) for q in self._queues[priority].values()),
+                "p50_wait": round(ordered[len(ordered) // 2], 4) if ordered else 0.0,
+                "p95_wait": round(ordered[int(len(ordered) * 0.95)], 4) if ordered else 0.0,
+                "max_wait": round(ordered[-1], 4) if ordered else 0.0,
+            }
+        return {
+            "backend": self.backend,
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self._queued,
+            "max_queue": self.max_queue,
+            "sessions_waiting": len({s for q in self._queues.values() for s in q}),
+            "avg_service_time": round(self._service_time, 4),
+            "priorities": wait_times,
+        }
+
+    async def _acquire(self, session: str, priority: str):
+        if not self._queued and self._in_flight < self.max_in_flight:
+            self._in_flight += 1
+            return
+        self.check_capacity(priority)
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(session, deque()).append(future)
+        self._queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout or None)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if future.done() and not future.cancelled():
+                # Slot was granted just as we gave up; hand it on
+                self._release()
+            else:
+                future.cancel()
+                self._remove(session, priority, future)
+            if isinstance(e, asyncio.TimeoutError):
+                self._rejected[priority] += 1
+                raise LLMQueueFull(f"Timed out after {self.queue_timeout:g}s waiting for the LLM",
+                                   self.retry_after(priority))
+            raise
+
+    def _remove(self, session: str, priority: str, future: asyncio.Future):
+        waiters = self._queues[priority].get(session)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            self._queued -= 1
+            if not waiters:
+                del self._queues[priority][session]
+
+    def _release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._in_flight < self.max_in_flight and self._queued:
+            for queue in self._queues.values():
+                if queue:
+                    break
+            # The first session in line takes one turn, then moves to the back
+            session, waiters = next(iter(queue.items()))
+            future = waiters.popleft()
+            self._queued -= 1
+            del queue[session]
+            if waiters:
+                queue[session] = waiters
+            if future.cancelled():
+                continue
+            self._in_flight += 1
+            future.set_result(None)
+
+
+_schedulers: Dict[str, LLMScheduler] = {}
+
+
+def get_llm_scheduler(backend: str) -> LLMScheduler:
+    """Return this process's scheduler for an LLM backend (base URL), creating it on first use."""
+    scheduler = _schedulers.get(backend)
+    if scheduler is None:
+        scheduler = _schedulers[backend] = LLMScheduler(backend)
+    return scheduler
+
+
+def scheduler_stats() -> Dict:
+    return {backend: scheduler.stats() for backend, scheduler in _schedulers.items()}
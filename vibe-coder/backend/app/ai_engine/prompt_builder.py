@@ -15,7 +15,17 @@ Respect the existing project structure and style.
         if context_files:
             prompt += "\n\n### Context Files:\n"
             for file in context_files:
-                prompt += f"\nFile: {file['path']}\n"
+                if file.get('symbol'):
+                    prompt += f"\nFile: {file['path']} (definition of {file['symbol']}, lines {file['start_line']}-{file['end_line']})\n"
+                elif file.get('related_to'):
+                    relation = file['relation'].replace('_', ' ')
+                    prompt += f"\nFile: {file['path']} ({relation} {file['related_to']})\n"
+                elif file.get('start_line'):
+                    prompt += f"\nFile: {file['path']} (lines {file['start_line']}-{file['end_line']})\n"
+                else:
+                    prompt += f"\nFile: {file['path']}\n"
+                if file.get('error'):
+                    prompt += f"Error at line {file['error_line']}: {file['error']}\n"
                 prompt += f"```\n{file['content']}\n```\n"
         
         return prompt
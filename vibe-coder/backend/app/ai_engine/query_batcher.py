@@ -0,0 +1,84 @@
+"""
+Micro-batching of query embeddings.
+
+Concurrent callers each submit a few texts; a worker thread waits briefly
+for more to arrive and encodes them in one model call, which costs little
+more than encoding a single query. Used by the index service, where many
+web workers' queries meet in one process.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+
+
+class QueryBatcher:
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_batch: int = 64, max_wait: float = 0.002):
+        self._encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Optional[Tuple[List[str], Future]]]" = queue.Queue()
+        self.batches = 0
+        self.requests = 0
+        self._worker = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+        self._worker.start()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embeddings for `texts`, encoded together with concurrent submissions."""
+        future: Future = Future()
+        self._queue.put((texts, future))
+        return future.result()
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join(timeout=5)
+
+    def stats(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+        }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            size = len(item[0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[List[str], Future]]):
+        texts = [text for texts, _ in batch for text in texts]
+        try:
+            vectors = self._encode(texts)
+        except Exception as e:
+            logger.error(f"Batched encoding of {len(texts)} queries failed: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.requests += len(batch)
+        start = 0
+        for texts, future in batch:
+            future.set_result(vectors[start:start + len(texts)])
+            start += len(texts)
@@ -0,0 +1,208 @@
+"""
+Metadata filters for retrieval.
+
+A scope limits a search to some of the indexed documents:
+
+- path_prefix: directories or files, relative to the project root
+- glob: fnmatch pattern over relative paths (a directory matches everything under it)
+- extensions / languages: file types; both given means either
+- modified_since: Unix time the file was last modified at or after
+
+`ScopeIndex` resolves a scope to document ids from per-document metadata
+without scanning documents one by one where it can: paths are kept sorted,
+so a prefix (including the literal start of a glob) is a range, and ids are
+grouped by extension. Searches then score only those ids.
+"""
+
+import bisect
+import fnmatch
+import os
+import re
+import time
+from typing import Dict, List, Optional
+import numpy as np
+
+from app.ai_engine.document_store import DocumentStore
+
+LANGUAGE_EXTENSIONS = {
+    "python": (".py",),
+    "javascript": (".js", ".jsx"),
+    "typescript": (".ts", ".tsx"),
+    "java": (".java",),
+    "c": (".c",),
+    "cpp": (".cpp",),
+    "rust": (".rs",),
+    "go": (".go",),
+    "html": (".html",),
+    "css": (".css",),
+    "markdown": (".md",),
+    "json": (".json",),
+    "yaml": (".yml", ".yaml"),
+    "sql": (".sql",),
+    "shell": (".sh",),
+}
+
+SCOPE_KEYS = ("path_prefix", "glob", "extensions", "languages", "modified_since")
+
+_GLOB_SPECIAL = re.compile(r"[*?\[]")
+
+
+def normalize_scope(scope: Optional[Dict]) -> Optional[Dict]:
+    """
+    Validate a scope and bring it to canonical form: prefixes without
+    surrounding slashes, languages folded into lowercase dotted extensions.
+    Returns None when nothing is filtered; raises ValueError on bad input.
+    """
+    if not scope:
+        return None
+    unknown = set(scope) - set(SCOPE_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown scope fields: {', '.join(sorted(unknown))}")
+
+    normalized: Dict = {}
+    prefixes = scope.get("path_prefix")
+    if prefixes:
+        if isinstance(prefixes, str):
+            prefixes = [prefixes]
+        normalized["path_prefix"] = sorted({p.replace("\\", "/").strip("/").removeprefix("./") for p in prefixes})
+    if scope.get("glob"):
+        normalized["glob"] = scope["glob"]
+
+    extensions = set()
+    for ext in scope.get("extensions") or ():
+        ext = ext.lower()
+        extensions.add(ext if ext.startswith(".") else f".{ext}")
+    for language in scope.get("languages") or ():
+        if language.lower() not in LANGUAGE_EXTENSIONS:
+            raise ValueError(f"Unknown language '{language}', expected one of {', '.join(LANGUAGE_EXTENSIONS)}")
+        extensions.update(LANGUAGE_EXTENSIONS[language.lower()])
+    if extensions:
+        normalized["extensions"] = sorted(extensions)
+
+    if scope.get("modified_since") is not None:
+        try:
+            normalized["modified_since"] = float(scope["modified_since"])
+        except (TypeError, ValueError):
+            raise ValueError(f"modified_since must be a Unix timestamp, got {scope['modified_since']!r}")
+    return normalized or None
+
+
+def path_in_scope(scope: Optional[Dict], path: str, full_path: Optional[str] = None) -> bool:
+    """Whether one file (relative `path`, stat'ed at `full_path`) is in a normalized scope."""
+    if not scope:
+        return True
+    path = path.replace("\\", "/")
+    prefixes = scope.get("path_prefix")
+    if prefixes and not any(_under(path, prefix) for prefix in prefixes):
+        return False
+    extensions = scope.get("extensions")
+    if extensions and os.path.splitext(path)[1].lower() not in extensions:
+        return False
+    if scope.get("glob") and not _glob_matches(path, scope["glob"]):
+        return False
+    if scope.get("modified_since") is not None:
+        try:
+            return os.stat(full_path or path).st_mtime >= scope["modified_since"]
+        except OSError:
+            return False
+    return True
+
+
+class ScopeIndex:
+    """Per-document metadata of one document store, for resolving scopes to ids."""
+
+    def __init__(self, documents: DocumentStore):
+        self._paths: List[str] = []
+        self._full_paths: List[str] = []
+        by_extension: Dict[str, List[int]] = {}
+        mtimes = np.empty(len(documents), dtype=np.float64)
+        now = time.time()
+        for doc_id, doc in enumerate(documents):
+            path = doc["path"].replace("\\", "/")
+            self._paths.append(path)
+            self._full_paths.append(doc.get("full_path", ""))
+            by_extension.setdefault(os.path.splitext(path)[1].lower(), []).append(doc_id)
+            mtimes[doc_id] = self._mtime(doc.get("full_path"), now)
+        self._order = np.array(sorted(range(len(self._paths)), key=self._paths.__getitem__), dtype=np.int64)
+        self._sorted_paths = [self._paths[i] for i in self._order]
+        self._by_extension = {ext: np.array(ids, dtype=np.int64) for ext, ids in by_extension.items()}
+        # Documents without a file count as modified when they were indexed
+        self._mtimes = mtimes
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def select(self, scope: Dict) -> np.ndarray:
+        """Sorted ids of the documents in a normalized scope."""
+        mask = np.ones(len(self._paths), dtype=bool)
+        if scope.get("path_prefix"):
+            under = np.zeros_like(mask)
+            for prefix in scope["path_prefix"]:
+                under[self._prefix_ids(prefix)] = True
+            mask &= under
+        if scope.get("extensions"):
+            of_type = np.zeros_like(mask)
+            for ext in scope["extensions"]:
+                if ext in self._by_extension:
+                    of_type[self._by_extension[ext]] = True
+            mask &= of_type
+        if scope.get("modified_since") is not None:
+            mask &= self._mtimes >= scope["modified_since"]
+        if not scope.get("glob"):
+            return np.flatnonzero(mask)
+
+        pattern = scope["glob"]
+        special = _GLOB_SPECIAL.search(pattern)
+        if special is None:
+            # A plain path: the file itself or a directory's contents
+            in_range = np.zeros_like(mask)
+            in_range[self._prefix_ids(pattern.rstrip("/"))] = True
+            return np.flatnonzero(mask & in_range)
+        # Only paths starting with the pattern's literal part can match
+        in_range = np.zeros_like(mask)
+        in_range[self._order[self._string_range(pattern[:special.start()])]] = True
+        ids = np.flatnonzero(mask & in_range)
+        matcher = re.compile(fnmatch.translate(pattern)).match
+        return ids[np.array([matcher(self._paths[i]) is not None for i in ids.tolist()], dtype=bool)]
+
+    def touch(self, doc_id: int):
+        """Record that a document's file was just written."""
+        if 0 <= doc_id < len(self._mtimes):
+            self._mtimes[doc_id] = self._mtime(self._full_paths[doc_id], time.time())
+
+    def _prefix_ids(self, prefix: str) -> np.ndarray:
+        """Ids of the file `prefix` and everything under the directory `prefix`."""
+        if not prefix:
+            return self._order
+        exact = self._order[self._string_range(prefix, exact=True)]
+        return np.concatenate([exact, self._order[self._string_range(prefix + "/")]])
+
+    def _string_range(self, prefix: str, exact: bool = False) -> slice:
+        """Positions in sorted path order of paths equal to, or else starting with, `prefix`."""
+        start = bisect.bisect_left(self._sorted_paths, prefix)
+        if exact:
+            return slice(start, bisect.bisect_right(self._sorted_paths, prefix, lo=start))
+        if not prefix:
+            return slice(0, len(self._sorted_paths))
+        # The first string after every string starting with `prefix`
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return slice(start, bisect.bisect_left(self._sorted_paths, upper, lo=start))
+
+    @staticmethod
+    def _mtime(full_path: Optional[str], default: float) -> float:
+        if not full_path:
+            return default
+        try:
+            return os.stat(full_path).st_mtime
+        except OSError:
+            return default
+
+
+def _under(path: str, prefix: str) -> bool:
+    return not prefix or path == prefix or path.startswith(prefix + "/")
+
+
+def _glob_matches(path: str, pattern: str) -> bool:
+    if _GLOB_SPECIAL.search(pattern) is None:
+        return _under(path, pattern.rstrip("/"))
+    return fnmatch.fnmatchcase(path, pattern)
@@ -0,0 +1,88 @@
+"""
+Faiss index construction for the configured vector storage type.
+
+- flat: exact float32 vectors (4 bytes per dimension)
+- fp16: half-precision vectors (2 bytes per dimension)
+- sq8: 8-bit scalar quantization (1 byte per dimension, trained)
+- pq: product quantization (1 byte per 4 dimensions, trained)
+
+Trained types need enough vectors to fit their codebooks; smaller corpora
+fall back to the next lighter type.
+"""
+
+from typing import Optional
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+
+INDEX_TYPES = ("flat", "fp16", "sq8", "pq")
+
+# Dimensions encoded per PQ code byte
+PQ_DIMS_PER_SUBQUANTIZER = 4
+PQ_BITS = 8
+# Minimum training vectors per PQ centroid (faiss defaults to 39; fewer is
+# noisier but still far better than no index on mid-sized corpora)
+PQ_MIN_POINTS_PER_CENTROID = 4
+PQ_MIN_TRAIN = PQ_MIN_POINTS_PER_CENTROID * (1 << PQ_BITS)
+SQ_MIN_TRAIN = 64
+
+
+def create_faiss_index(dimension: int, index_type: Optional[str] = None, count: Optional[int] = None):
+    """
+    Create an empty index. `count` is the number of vectors that will be
+    added, used to fall back from types that cannot be trained on so few.
+    """
+    import faiss
+
+    index_type = index_type or settings.EMBEDDING_INDEX_TYPE
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'; expected one of {', '.join(INDEX_TYPES)}")
+
+    if index_type == "pq":
+        if count is not None and count < PQ_MIN_TRAIN:
+            logger.info(f"{count} vectors are too few to train PQ; using sq8")
+            index_type = "sq8"
+        else:
+            index = faiss.IndexPQ(dimension, _pq_subquantizers(dimension), PQ_BITS)
+            index.pq.cp.min_points_per_centroid = PQ_MIN_POINTS_PER_CENTROID
+            return index
+    if index_type == "sq8":
+        if count is not None and count < SQ_MIN_TRAIN:
+            index_type = "fp16"
+        else:
+            return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    if index_type == "fp16":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    return faiss.IndexFlatL2(dimension)
+
+
+def build_faiss_index(vectors: np.ndarray, index_type: Optional[str] = None):
+    """Create, train if needed, and fill an index with `vectors`."""
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    index = create_faiss_index(vectors.shape[1], index_type, count=len(vectors))
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def index_nbytes(index) -> int:
+    """
+    Memory held by an index's vector codes and codebooks. Computed from its
+    sizes rather than by serializing it, which would copy the whole index.
+    """
+    import faiss
+    nbytes = index.ntotal * index.sa_code_size()
+    if isinstance(index, faiss.IndexPQ):
+        nbytes += index.pq.centroids.size() * 4
+    elif isinstance(index, faiss.IndexScalarQuantizer):
+        nbytes += index.sq.trained.size() * 4
+    return int(nbytes)
+
+
+def _pq_subquantizers(dimension: int) -> int:
+    m = max(dimension // PQ_DIMS_PER_SUBQUANTIZER, 1)
+    while dimension % m:
+        m -= 1
+    return m
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from app.core.config import settings
+from app.core.profiling import SamplingProfiler, profile_store
+
+router = APIRouter()
+
+@router.get("/profiles")
+async def list_profiles(limit: int = 50):
+    """
+    Saved request profiles, newest first. Profile a request by sending it
+    with an `X-Profile: 1` header or a `profile=1` query parameter.
+    """
+    return {
+        "engine": "pyinstrument" if SamplingProfiler is not None else "cprofile",
+        "on_request": settings.PROFILING_ON_REQUEST,
+        "sample_rate": settings.PROFILING_SAMPLE_RATE,
+        "profiles": profile_store.list(limit),
+    }
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, summary: bool = False):
+    """
+    Download a profile: pyinstrument HTML or cProfile stats, or with
+    `summary` the plain-text call tree.
+    """
+    meta = profile_store.get(profile_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if summary:
+        return FileResponse(meta["summary_path"], media_type="text/plain")
+    return FileResponse(meta["path"], filename=meta["file"])
@@ -1,30 +1,109 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import hashlib
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from typing import List, Optional, Dict
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Union
+from app.ai_engine.llm_manager import llm_streams
+from app.ai_engine.llm_scheduler import PRIORITIES, LLMQueueFull, scheduler_stats
+from app.ai_engine.search_scope import normalize_scope
 from app.core.config import settings
-from app.services import llm_manager, prompt_builder, context_builder
+from app.core.responses import FastJSONResponse
+from app.services import container
 
 router = APIRouter()
 
+class RetrievalScope(BaseModel):
+    # Directories or files, relative to the project root
+    path_prefix: Optional[Union[str, List[str]]] = None
+    glob: Optional[str] = None
+    extensions: Optional[List[str]] = None
+    languages: Optional[List[str]] = None
+    # ISO 8601 time or Unix seconds
+    modified_since: Optional[datetime] = None
+
+    def to_dict(self) -> Optional[Dict]:
+        scope = self.model_dump(exclude_none=True)
+        if self.modified_since is not None:
+            scope["modified_since"] = self.modified_since.timestamp()
+        return scope or None
+
 class ChatRequest(BaseModel):
     message: str
     project_path: Optional[str] = None
     history: Optional[List[Dict[str, str]]] = None
+    # Terminal output to resolve tracebacks from (defaults to the message itself)
+    error_output: Optional[str] = None
+    # Return context snippet bodies too, not just references to them
+    include_snippets: bool = False
+    # Fair-queueing key (defaults to the client address) and scheduling class:
+    # "rest", or "batch" for agent/background traffic
+    session_id: Optional[str] = None
+    priority: str = "rest"
+    # Only retrieve context from matching files
+    scope: Optional[RetrievalScope] = None
 
 @router.post("/query")
-async def chat_query(request: ChatRequest):
+async def chat_query(request: ChatRequest, http_request: Request):
+    if request.priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown priority: {request.priority}")
+    try:
+        scope = normalize_scope(request.scope.to_dict() if request.scope else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    session = request.session_id or (http_request.client.host if http_request.client else "")
+    try:
+        # Reject before spending time on retrieval if the model is saturated
+        container.llm_manager.scheduler.check_capacity(request.priority)
+    except LLMQueueFull as e:
+        raise _busy(e)
+
     # 1. Retrieve Context (only if index exists/project path provided)
     # In a real scenario, we'd ensure index is loaded for this project
-    context_files = context_builder.retrieve_context(request.message)
+    # Off the event loop, so identical concurrent retrievals can share one run
+    context_files = await asyncio.to_thread(container.index_service.retrieve_context, request.message,
+                                            error_output=request.error_output, scope=scope)
     
     # 2. Build Prompt
-    system_prompt = prompt_builder.build_system_prompt(context_files)
-    messages = llm_manager.create_messages(system_prompt, request.message, request.history)
+    system_prompt = container.prompt_builder.build_system_prompt(context_files)
+    messages = container.llm_manager.create_messages(system_prompt, request.message, request.history)
     
     # 3. Get Response
-    response = await llm_manager.get_response(messages)
+    try:
+        response = await container.llm_manager.get_response(messages, session=session, priority=request.priority)
+    except LLMQueueFull as e:
+        raise _busy(e)
     
-    return {"response": response, "context": context_files}
+    context = [context_reference(file, request.include_snippets) for file in context_files]
+    return FastJSONResponse({"response": response, "context": context})
+
+@router.get("/stats")
+async def llm_stats():
+    """
+    In-flight requests, queue depth and wait times of each LLM backend's
+    scheduler, and how many generations were shared by identical requests.
+    """
+    return {"backends": scheduler_stats(), "shared_streams": llm_streams.stats()}
+
+def _busy(error: LLMQueueFull) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+
+def context_reference(file: Dict, include_snippet: bool = False) -> Dict:
+    """
+    Describe a context entry by path, line range, score and content hash;
+    the client already has the files, so the body is sent only on request.
+    """
+    content = file.get("content", "")
+    reference = {
+        "path": file["path"],
+        "start_line": file.get("start_line", 1),
+        "end_line": file.get("end_line", content.count("\n") + 1),
+        "score": file.get("score"),
+        "hash": hashlib.sha1(content.encode("utf-8")).hexdigest(),
+    }
+    for key in ("symbol", "error", "error_line", "related_to", "relation"):
+        if key in file:
+            reference[key] = file[key]
+    if include_snippet:
+        reference["content"] = content
+    return reference
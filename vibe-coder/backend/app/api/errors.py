@@ -0,0 +1,47 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import Optional
+from app.errors.detector import ErrorDetector
+
+router = APIRouter()
+detector = ErrorDetector()
+
+class AnalyzeRequest(BaseModel):
+    output: str
+    context: str = ""
+    project: str = ""
+
+@router.post("/analyze")
+async def analyze_output(request: AnalyzeRequest):
+    """
+    Detect an error in command output and record it.
+    """
+    report = detector.analyze_output(request.output, request.context, request.project)
+    return {"detected": report is not None, "report": report}
+
+@router.get("")
+async def list_reports(type: Optional[str] = None, project: Optional[str] = None,
+                       since: Optional[float] = None, cursor: Optional[str] = None, limit: int = 50):
+    """
+    Page through error reports, most recently seen first.
+    """
+    try:
+        return detector.store.query(error_type=type, project=project, since=since, cursor=cursor, limit=limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/stats")
+async def report_stats():
+    return detector.store.stats()
+
+@router.post("/retire")
+async def retire_reports(older_than_days: Optional[float] = None):
+    return detector.store.retire(older_than_days)
+
+@router.get("/{report_id}")
+async def get_report(report_id: str):
+    report = detector.store.get(report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    report["recent_occurrences"] = detector.store.occurrences(report_id)
+    return report
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import List, Optional
 from typing import List, Optional
 from app.repo.scanner import RepoScanner
-from app.services import embedding_manager 
+from app.repo.history import EditHistory, HistoryConflict, get_history, lookup_history
+from app.services import container
 from loguru import logger
 import os
 from pathlib import Path
@@ -13,16 +15,67 @@ router = APIRouter()
 class IndexRequest(BaseModel):
     path: str
 
+class ReindexRequest(BaseModel):
+    path: str
+    # Changed files relative to the project; omit to rescan the whole project
+    files: Optional[List[str]] = None
+
+class HistoryRequest(BaseModel):
+    path: str
+    file: Optional[str] = None
+    version: Optional[str] = None
+
 @router.post("/index")
 async def index_project(request: IndexRequest):
     try:
-        scanner = RepoScanner(request.path)
-        files = scanner.scan()
-        embedding_manager.create_index(files)
-        return {"message": f"Indexed {len(files)} files", "files_count": len(files)}
+        # Index service calls block (disk walks, or a socket round-trip): keep them off the event loop
+        count = await asyncio.to_thread(_index, request.path)
+        return {"message": f"Indexed {count} files", "files_count": count}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/reindex")
+async def reindex_project(request: ReindexRequest):
+    """
+    Refresh a project's indexes. With `files`, only data derived from those
+    files and the files importing them is invalidated; embeddings are
+    refreshed on the next full reindex.
+    """
+    try:
+        if request.files is None:
+            count = await asyncio.to_thread(_index, request.path)
+            return {"message": f"Reindexed {count} files", "files_count": count}
+        result = await asyncio.to_thread(container.index_service.reindex, request.path, request.files)
+        return {"message": f"Invalidated {len(result['affected'])} files", **result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _index(path: str) -> int:
+    count = container.index_service.index_project(path)["files_count"]
+    # Register the project so tool writes inside it are recorded for undo
+    get_history(path)
+    return count
+
+@router.get("/search")
+async def search_files(path: str, q: str, regex: bool = False, case_sensitive: bool = False,
+                       glob: Optional[str] = None, ext: Optional[List[str]] = Query(None),
+                       offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=1000)):
+    """
+    Literal or regex search over the project's text files, narrowed down by
+    its trigram index. Returns matching lines with line numbers, paged by
+    `offset`/`limit`.
+    """
+    if not q:
+        raise HTTPException(status_code=400, detail="q is required")
+    try:
+        return await asyncio.to_thread(container.index_service.search_files, path, q, regex=regex,
+                                       case_sensitive=case_sensitive, glob=glob, extensions=ext,
+                                       offset=offset, limit=limit)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Path not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/list")
 async def list_files(path: str):
     """
@@ -67,3 +120,48 @@ async def list_files(path: str):
         logger.error(f"Error listing files: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _registered_history(path: str) -> EditHistory:
+    # Only /index registers projects; looking one up must not start recording writes
+    history = lookup_history(path)
+    if history is None:
+        raise HTTPException(status_code=404, detail=f"No edit history for {path}; index the project first")
+    return history
+
+@router.get("/history")
+async def list_versions(path: str, file: str):
+    """
+    List the recorded versions of a file in the project's edit history.
+    """
+    history = _registered_history(path)
+    return {"versions": history.list_versions(file), "stats": history.stats()}
+
+@router.post("/history/undo")
+async def undo_edit(request: HistoryRequest):
+    try:
+        entry = _registered_history(request.path).undo()
+    except HistoryConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if entry is None:
+        raise HTTPException(status_code=409, detail="Nothing to undo")
+    return entry
+
+@router.post("/history/redo")
+async def redo_edit(request: HistoryRequest):
+    try:
+        entry = _registered_history(request.path).redo()
+    except HistoryConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if entry is None:
+        raise HTTPException(status_code=409, detail="Nothing to redo")
+    return entry
+
+@router.post("/history/restore")
+async def restore_version(request: HistoryRequest):
+    if not request.file or not request.version:
+        raise HTTPException(status_code=400, detail="file and version are required")
+    try:
+        return {"entry": _registered_history(request.path).restore(request.file, request.version)}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
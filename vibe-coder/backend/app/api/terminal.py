@@ -1,19 +1,146 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+import asyncio
+import uuid
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, ValidationError
+from typing import Optional
+from loguru import logger
 from app.terminal.executor import TerminalExecutor
+from app.terminal.sessions import SessionManager
+from app.terminal.scheduler import PRIORITIES, command_scheduler
+from app.errors.detector import StreamingErrorDetector
 
 router = APIRouter()
 executor = TerminalExecutor()
+sessions = SessionManager()
 
 class CommandRequest(BaseModel):
     command: str
-    cwd: str = "."
+    # Default: the server's directory, or for a session, wherever it is
+    cwd: Optional[str] = None
+    timeout: Optional[float] = None
+    max_output_bytes: Optional[int] = None
+    # Run inside a named persistent shell session instead of a fresh process
+    session: Optional[str] = None
+    # Scheduling class: "interactive", "background" or "agent"
+    priority: str = "interactive"
+    project: Optional[str] = None
+
+class SessionRequest(BaseModel):
+    name: str
+    # Default: the server's directory, or for an existing session, wherever it is
+    cwd: Optional[str] = None
 
 @router.post("/run")
 async def run_command(request: CommandRequest):
-    stdout, stderr, return_code = await executor.run_command(request.command, request.cwd)
+    if request.priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown priority: {request.priority}")
+
+    if request.session:
+        try:
+            output, return_code = await sessions.run(
+                request.session, request.command, request.cwd,
+                timeout=request.timeout, max_output_bytes=request.max_output_bytes,
+                priority=request.priority, project=request.project
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except RuntimeError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        # stdout and stderr are interleaved on the session's PTY
+        return {"stdout": output, "stderr": "", "return_code": return_code, "session": request.session}
+
+    stdout, stderr, return_code = await executor.run_command(
+        request.command, request.cwd or ".", timeout=request.timeout, max_output_bytes=request.max_output_bytes,
+        priority=request.priority, project=request.project
+    )
     return {
         "stdout": stdout,
         "stderr": stderr,
         "return_code": return_code
     }
+
+@router.get("/stats")
+async def scheduler_stats():
+    """
+    Queue depth, running commands and wait times of the command scheduler.
+    """
+    return command_scheduler.stats()
+
+@router.get("/sessions")
+async def list_sessions():
+    return sessions.list()
+
+@router.post("/sessions")
+async def create_session(request: SessionRequest):
+    try:
+        session = await sessions.get_or_create(request.name, request.cwd)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return session.info()
+
+@router.delete("/sessions/{name}")
+async def close_session(name: str):
+    if not await sessions.close(name):
+        raise HTTPException(status_code=404, detail=f"Session not found: {name}")
+    return {"message": f"Closed session {name}"}
+
+async def _stream_to_socket(websocket: WebSocket, request: CommandRequest, run_id: str):
+    await websocket.send_json({"type": "start", "run_id": run_id})
+    if request.priority not in PRIORITIES:
+        await websocket.send_json({"type": "error", "message": f"Unknown priority: {request.priority}"})
+        return
+    detectors = {"stdout": StreamingErrorDetector(), "stderr": StreamingErrorDetector()}
+    async for event in executor.stream_command(request.command, request.cwd or ".", timeout=request.timeout, run_id=run_id,
+                                               priority=request.priority, project=request.project):
+        if event["type"] == "exit":
+            errors = detectors["stdout"].close() + detectors["stderr"].close()
+        else:
+            errors = detectors[event["type"]].feed(event["data"])
+        for error in errors:
+            await websocket.send_json({"type": "diagnostic", "error": error, "run_id": run_id})
+        await websocket.send_json(dict(event, run_id=run_id))
+
+@router.websocket("/ws")
+async def terminal_websocket(websocket: WebSocket):
+    """
+    Streams command output as it is produced.
+
+    Client messages: {"command", "cwd", "timeout"} to start a command and
+    {"type": "cancel"} to kill the running one. Server messages: "start",
+    "stdout"/"stderr" chunks, "diagnostic" events for each error parsed from
+    the output, and a final "exit" event.
+    """
+    await websocket.accept()
+    run_id: Optional[str] = None
+    task: Optional[asyncio.Task] = None
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "message": "Expected a JSON object"})
+                continue
+            if message.get("type") == "cancel":
+                if run_id:
+                    await executor.cancel(run_id)
+                continue
+
+            if task and not task.done():
+                await websocket.send_json({"type": "error", "message": "A command is already running"})
+                continue
+
+            try:
+                request = CommandRequest(**message)
+            except ValidationError as e:
+                await websocket.send_json({"type": "error", "message": f"Invalid command request: {e}"})
+                continue
+            run_id = uuid.uuid4().hex
+            task = asyncio.create_task(_stream_to_socket(websocket, request, run_id))
+    except WebSocketDisconnect:
+        logger.info("Terminal WebSocket disconnected")
+    except Exception as e:
+        logger.error(f"Terminal WebSocket error: {e}")
+    finally:
+        if task and not task.done():
+            task.cancel()
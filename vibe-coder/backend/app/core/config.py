@@ -5,6 +5,92 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     WORKSPACE_DIR: str = "../workspace"
 
+    # Edit history (undo/redo) retention, in compressed bytes per project
+    HISTORY_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Terminal commands: default timeout (seconds) and captured output tail per stream
+    TERMINAL_TIMEOUT: float = 600.0
+    TERMINAL_MAX_OUTPUT_BYTES: int = 1024 * 1024
+
+    # Persistent PTY shell sessions
+    TERMINAL_SHELL: str = ""  # Defaults to $SHELL
+    TERMINAL_MAX_SESSIONS: int = 8
+    TERMINAL_SESSION_IDLE_TIMEOUT: float = 900.0
+    TERMINAL_SESSION_POOL_SIZE: int = 1
+
+    # Command scheduling: concurrency caps (0 = CPU count) and per-command limits (0 = unlimited)
+    TERMINAL_MAX_CONCURRENT: int = 0
+    TERMINAL_MAX_PER_PROJECT: int = 2
+    TERMINAL_RLIMIT_CPU_SECONDS: int = 0
+    TERMINAL_RLIMIT_MEMORY_BYTES: int = 0
+    TERMINAL_RLIMIT_NOFILE: int = 0
+    TERMINAL_BACKGROUND_NICE: int = 10
+
+    # Embedding model and encoder backend: torch, torch_int8, onnx or onnx_int8
+    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    EMBEDDING_BACKEND: str = "torch"
+    # Quantized ONNX file used by onnx_int8, relative to the model repository
+    EMBEDDING_ONNX_INT8_FILE: str = "onnx/model_quint8_avx2.onnx"
+
+    # Vector storage: flat (float32), fp16, sq8 (8-bit scalar) or pq (product quantized)
+    EMBEDDING_INDEX_TYPE: str = "flat"
+
+    # Hybrid retrieval: fuse BM25 and vector results by reciprocal rank (k constant)
+    RETRIEVAL_HYBRID: bool = True
+    RETRIEVAL_RRF_K: int = 60
+
+    # Bulk indexing: encoder worker processes (0 = CPU count), batch size, and
+    # the corpus size below which encoding stays in-process
+    EMBEDDING_WORKERS: int = 0
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_POOL_MIN_TEXTS: int = 256
+
+    # Retrieved context budget (estimated tokens); files imported by or importing
+    # the top hits fill whatever the hits leave
+    CONTEXT_TOKEN_BUDGET: int = 8000
+
+    # HTTP responses: bodies at least this large are compressed (zstd if
+    # available and accepted, else gzip)
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024
+    RESPONSE_GZIP_LEVEL: int = 6
+    RESPONSE_ZSTD_LEVEL: int = 3
+
+    # Request profiling: allow X-Profile / ?profile=1, profile this fraction of
+    # all requests, sampling interval (seconds, pyinstrument) and reports kept
+    PROFILING_ON_REQUEST: bool = True
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_INTERVAL: float = 0.001
+    PROFILING_MAX_REPORTS: int = 200
+
+    # LLM admission: concurrent requests per model server, queued requests
+    # beyond which new ones are rejected (429), and the longest queue wait (s).
+    # Enforced in each web worker process: with N workers the model server
+    # sees up to N x LLM_MAX_IN_FLIGHT_PER_WORKER requests at once
+    LLM_MAX_IN_FLIGHT_PER_WORKER: int = 2
+    LLM_MAX_QUEUE_PER_WORKER: int = 32
+    LLM_QUEUE_TIMEOUT: float = 60.0
+
+    # Identical concurrent requests share one computation: retrievals, and
+    # LLM generations when the model runs at temperature 0 (deterministic)
+    SINGLE_FLIGHT: bool = True
+
+    # Shared index service (python -m app.index_service.server): Unix socket
+    # web workers connect to (empty = index in-process), call timeout in
+    # seconds, and query embedding batching
+    INDEX_SERVICE_SOCKET: str = ""
+    INDEX_SERVICE_TIMEOUT: float = 600.0
+    INDEX_SERVICE_MAX_BATCH: int = 64
+    INDEX_SERVICE_BATCH_WAIT_MS: float = 2.0
+
+    # Construct AI services in the background at startup instead of on first use
+    WARMUP_ON_STARTUP: bool = True
+
+    # Shared file content cache budget (bytes)
+    FILE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    # Error reports not seen for this many days are retired
+    ERROR_RETENTION_DAYS: float = 30.0
+
     class Config:
         env_file = ".env"
 
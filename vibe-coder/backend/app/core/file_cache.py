@@ -0,0 +1,123 @@
+"""
+Process-wide file content cache.
+
+File contents are cached as bytes, keyed by path and validated against the
+file's (mtime_ns, size) on every lookup, so a stale entry is never served
+after an external edit. Entries are evicted least-recently-used once the
+cache exceeds its byte budget. Writers in this process invalidate (or
+refresh) entries explicitly, and listeners are told about those writes so
+derived indexes can update incrementally.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from app.core.config import settings
+
+
+class FileContentCache:
+    def __init__(self, max_bytes: Optional[int] = None, max_entry_bytes: Optional[int] = None):
+        self.max_bytes = settings.FILE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        # Files bigger than this are read straight from disk and never cached
+        self.max_entry_bytes = max_entry_bytes or max(self.max_bytes // 8, 1)
+        self._entries: "OrderedDict[str, Tuple[int, int, bytes]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str], None]] = []
+        self.hits = 0
+        self.misses = 0
+
+    def get_bytes(self, file_path: Union[str, Path]) -> bytes:
+        """Content of a file, from the cache if it is unchanged on disk."""
+        key = self._key(file_path)
+        stat = os.stat(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        with open(key, 'rb') as f:
+            data = f.read()
+        # Key on the stat taken before the read: if the file changed while it
+        # was read, the next lookup sees a newer mtime and reads it again
+        self._store(key, stat.st_mtime_ns, stat.st_size, data)
+        return data
+
+    def get_text(self, file_path: Union[str, Path], encoding: str = 'utf-8', errors: str = 'strict') -> str:
+        """Content of a file decoded as text, with newlines left as they are on disk."""
+        return self.get_bytes(file_path).decode(encoding, errors)
+
+    def put(self, file_path: Union[str, Path], data: bytes):
+        """Cache content that was just written to `file_path`."""
+        key = self._key(file_path)
+        try:
+            stat = os.stat(key)
+        except FileNotFoundError:
+            self.invalidate(key)
+            return
+        if stat.st_size != len(data):
+            self.invalidate(key)
+            return
+        self._store(key, stat.st_mtime_ns, stat.st_size, data)
+        self._notify(key)
+
+    def invalidate(self, file_path: Union[str, Path]):
+        key = self._key(file_path)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= len(entry[2])
+        self._notify(key)
+
+    def add_listener(self, listener: Callable[[str], None]):
+        """Call `listener(absolute_path)` whenever a file is written in this process."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, key: str):
+        for listener in list(self._listeners):
+            listener(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _store(self, key: str, mtime_ns: int, size: int, data: bytes):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[2])
+            if len(data) > self.max_entry_bytes:
+                return
+            self._entries[key] = (mtime_ns, size, data)
+            self._size += len(data)
+            while self._size > self.max_bytes and self._entries:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    @staticmethod
+    def _key(file_path: Union[str, Path]) -> str:
+        return os.path.abspath(os.fspath(file_path))
+
+
+file_cache = FileContentCache()
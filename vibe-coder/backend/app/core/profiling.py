@@ -0,0 +1,207 @@
+"""
+On-demand request profiling.
+
+A request is profiled when it carries an `X-Profile: 1` header or a
+`profile=1` query parameter (WebSocket connections are profiled for their
+whole lifetime, covering streamed LLM output), or when it is picked by the
+global sampling rate. The profiler wraps the entire ASGI call, so handler
+code, retrieval, prompt building and streamed responses all show up.
+
+pyinstrument is used when installed: it samples the stack at a fixed
+interval and follows the request across awaits. Otherwise cProfile is used,
+which is deterministic and attributes all code on the event loop thread to
+the profiled request. Only one request is profiled at a time; others are
+served normally while the profiler is busy.
+
+Profiles are written to workspace/reports/profiles with a JSON sidecar
+describing the request, and the oldest are pruned beyond a fixed count.
+"""
+
+import asyncio
+import cProfile
+import io
+import json
+import marshal
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs
+from loguru import logger
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.paths import REPORTS_DIR
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None
+
+_TRUE = {"1", "true", "yes", "on"}
+
+
+class RequestProfiler:
+    """One profiling session: pyinstrument if available, else cProfile."""
+
+    def __init__(self, interval: Optional[float] = None):
+        self.engine = "pyinstrument" if SamplingProfiler is not None else "cprofile"
+        if SamplingProfiler is not None:
+            interval = settings.PROFILING_INTERVAL if interval is None else interval
+            self._profiler = SamplingProfiler(interval=interval, async_mode="enabled")
+        else:
+            self._profiler = cProfile.Profile()
+
+    def start(self):
+        if self.engine == "pyinstrument":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self):
+        if self.engine == "pyinstrument":
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def render(self) -> Tuple[str, bytes, str]:
+        """(file suffix, report bytes, short text summary)."""
+        if self.engine == "pyinstrument":
+            summary = self._profiler.output_text(unicode=False, color=False)
+            return ".html", self._profiler.output_html().encode("utf-8"), summary
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=stream)
+        stats.sort_stats("cumulative").print_stats(30)
+        # Same format as Profile.dump_stats, so pstats or snakeviz can open it
+        return ".prof", marshal.dumps(stats.stats), stream.getvalue()
+
+
+class ProfileStore:
+    def __init__(self, directory: Optional[Union[str, Path]] = None, max_profiles: Optional[int] = None):
+        self.directory = Path(directory) if directory else REPORTS_DIR / "profiles"
+        self.max_profiles = settings.PROFILING_MAX_REPORTS if max_profiles is None else max_profiles
+        self._lock = threading.Lock()
+
+    def save(self, profile_id: str, suffix: str, data: bytes, summary: str, meta: Dict) -> Dict:
+        meta = dict(meta, id=profile_id, file=f"{profile_id}{suffix}")
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / meta["file"]).write_bytes(data)
+            (self.directory / f"{profile_id}.txt").write_text(summary)
+            (self.directory / f"{profile_id}.json").write_text(json.dumps(meta))
+            self._prune()
+        return meta
+
+    def list(self, limit: int = 50) -> List[Dict]:
+        """Saved profiles, newest first."""
+        profiles = []
+        for meta_path in sorted(self.directory.glob("*.json"), reverse=True)[:limit]:
+            try:
+                profiles.append(json.loads(meta_path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        if not re.fullmatch(r"[\w-]+", profile_id):
+            return None
+        meta_path = self.directory / f"{profile_id}.json"
+        if not meta_path.exists():
+            return None
+        meta = json.loads(meta_path.read_text())
+        meta["path"] = str(self.directory / meta["file"])
+        meta["summary_path"] = str(self.directory / f"{profile_id}.txt")
+        return meta
+
+    def _prune(self):
+        metas = sorted(self.directory.glob("*.json"))
+        for meta_path in metas[:max(len(metas) - self.max_profiles, 0)]:
+            for path in self.directory.glob(f"{meta_path.stem}.*"):
+                path.unlink(missing_ok=True)
+
+
+profile_store = ProfileStore()
+
+
+def new_profile_id() -> str:
+    # Sorts chronologically, which listing and pruning rely on
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp, store: Optional[ProfileStore] = None):
+        self.app = app
+        self.store = store or profile_store
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        if trigger is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        # Returned in the X-Profile-Id header before the profile is saved
+        profile_id = new_profile_id()
+        status = None
+
+        async def send_with_id(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(raw=list(message["headers"]))
+                headers["X-Profile-Id"] = profile_id
+                message["headers"] = headers.raw
+            await send(message)
+
+        profiler = RequestProfiler()
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            meta = {
+                "method": scope.get("method", "WEBSOCKET"),
+                "path": scope["path"],
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                "engine": profiler.engine,
+                "trigger": trigger,
+                "created": time.time(),
+            }
+            # Shielded: a client disconnect cancels this task, but the profile
+            # of the cancelled request is still saved
+            await asyncio.shield(asyncio.to_thread(self._finish, profiler, profile_id, meta))
+
+    def _finish(self, profiler: RequestProfiler, profile_id: str, meta: Dict):
+        try:
+            suffix, data, summary = profiler.render()
+            self.store.save(profile_id, suffix, data, summary, meta)
+            logger.info(f"Profiled {meta['method']} {meta['path']} in {meta['duration_ms']} ms -> {profile_id}")
+        except Exception as e:
+            logger.error(f"Failed to save profile for {meta['path']}: {e}")
+        finally:
+            self._busy.release()
+
+    @staticmethod
+    def _trigger(scope: Scope) -> Optional[str]:
+        if scope["path"].startswith("/api/v1/admin/profiles"):
+            return None
+        if settings.PROFILING_ON_REQUEST:
+            if Headers(scope=scope).get("x-profile", "").lower() in _TRUE:
+                return "header"
+            query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+            if query.get("profile", [""])[-1].lower() in _TRUE:
+                return "query"
+        if settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return "sampled"
+        return None
@@ -0,0 +1,138 @@
+"""
+Single-flight execution of identical concurrent work.
+
+`SingleFlight` lets threads that make the same call while it is running wait
+for that call instead of repeating it. `StreamFanout` does the same for
+async streams: one upstream iteration per key, with every subscriber
+receiving all chunks, including those produced before it joined. Nothing is
+kept once the work finishes; only calls that overlap in time are shared.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Optional
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Return `fn(*args, **kwargs)`, or the result of the identical call
+        already running under `key`. Callers sharing a call share the result
+        object (and its exception), so it must not be mutated.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.executed += 1
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            in_flight = len(self._calls)
+        return {"executed": self.executed, "shared": self.shared, "in_flight": in_flight}
+
+
+class _Broadcast:
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        # Replaced after every change; waiters hold the one they saw
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class StreamFanout:
+    """
+    Shares one upstream async stream per key among concurrent subscribers.
+
+    The upstream runs in its own task, so a slow subscriber does not hold up
+    the others (chunks are buffered until the stream ends). It is cancelled
+    once every subscriber has gone.
+    """
+
+    def __init__(self):
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self.started = 0
+        self.joined = 0
+
+    async def subscribe(self, key: Hashable, source: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Chunks of the stream under `key`, started with `source()` if none is running."""
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = _Broadcast()
+            stream.task = asyncio.create_task(self._pump(key, stream, source()))
+            self.started += 1
+        else:
+            self.joined += 1
+        stream.subscribers += 1
+
+        position = 0
+        try:
+            while True:
+                changed = stream.changed
+                if position < len(stream.chunks):
+                    chunk = stream.chunks[position]
+                    position += 1
+                    yield chunk
+                elif stream.done:
+                    if stream.error is not None:
+                        raise stream.error
+                    return
+                else:
+                    await changed.wait()
+        finally:
+            stream.subscribers -= 1
+            if not stream.subscribers and not stream.done:
+                # Nobody is listening any more; new subscribers start afresh
+                stream.task.cancel()
+                if self._streams.get(key) is stream:
+                    del self._streams[key]
+
+    def stats(self) -> Dict:
+        return {"started": self.started, "joined": self.joined, "in_flight": len(self._streams)}
+
+    async def _pump(self, key: Hashable, stream: _Broadcast, source: AsyncIterator[Any]):
+        try:
+            async for chunk in source:
+                stream.chunks.append(chunk)
+                stream.notify()
+        except asyncio.CancelledError:
+            stream.error = asyncio.CancelledError()
+        except Exception as e:
+            stream.error = e
+        finally:
+            # Later identical requests start a new stream
+            stream.done = True
+            if self._streams.get(key) is stream:
+                del self._streams[key]
+            stream.notify()
@@ -1,53 +1,225 @@
 import os
-import json
+import re
 import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional
-from app.core.paths import REPORTS_DIR
+from typing import Dict, List, Optional
+from app.errors.store import ErrorStore
+
+# Stack frame locations: (language, pattern). Patterns expose file/line and,
+# where the format carries them, function/column.
+FRAME_PATTERNS = [
+    ("python", re.compile(r'^\s*File "(?P<file>[^"]+)", line (?P<line>\d+)(?:, in (?P<function>.+))?$')),
+    ("node", re.compile(r'^\s*at (?:(?P<function>.+?) \()?(?:file://)?(?P<file>[^\s()]+?):(?P<line>\d+):(?P<column>\d+)\)?\s*$')),
+    ("go", re.compile(r'^\s+(?P<file>\S+\.go):(?P<line>\d+)(?: \+0x[0-9a-f]+)?\s*$')),
+    ("rust", re.compile(r'^\s*(?:-->|at) (?P<file>[^\s:]+\.rs):(?P<line>\d+):(?P<column>\d+)')),
+]
+
+# Error headlines: (language, pattern) with type/message groups
+ERROR_PATTERNS = [
+    ("python", re.compile(r'^(?P<type>[A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt|Warning))(?::\s*(?P<message>.*))?$')),
+    ("node", re.compile(r'^(?:Uncaught )?(?P<type>[A-Z]\w*Error)(?: \[[\w_]+\])?: (?P<message>.*)$')),
+    ("go", re.compile(r'^(?P<type>panic|fatal error): (?P<message>.*)$')),
+    ("rust", re.compile(r'^(?P<type>error)(?:\[E\d+\])?: (?P<message>.*)$')),
+]
+
+# Headlines carrying their location: (language, pattern, standalone). A
+# standalone diagnostic is complete on one line; others may be followed by a
+# message and backtrace.
+DIAGNOSTIC_PATTERNS = [
+    ("gcc", re.compile(r'^(?P<file>[^\s:][^:]*\.(?:c|cc|cpp|cxx|h|hh|hpp)):(?P<line>\d+):(?:(?P<column>\d+):)? (?P<type>(?:fatal )?error): (?P<message>.*)$'), True),
+    ("go", re.compile(r'^(?P<file>[^\s:][^:]*\.go):(?P<line>\d+):(?P<column>\d+): (?P<message>.*)$'), True),
+    ("rust", re.compile(r"^thread '[^']*' (?P<type>panicked) at (?:'(?P<message>.*)', )?(?P<file>[^\s:']+\.rs):(?P<line>\d+):(?P<column>\d+):?$"), False),
+]
+
+TRACEBACK_START = re.compile(r'^(?:Traceback \(most recent call last\):|goroutine \d+ \[[^\]]+\]:)$')
+
+MAX_LINES_PER_ERROR = 200
+
+
+class StreamingErrorDetector:
+    """
+    Incremental error detector for terminal output.
+
+    Output is fed in arbitrary chunks and consumed line by line. Python,
+    Node, Go, Rust and gcc errors are recognised with precompiled patterns,
+    and their tracebacks are parsed into (file, line, function) frames.
+    """
 
-class ErrorDetector:
     def __init__(self):
-        self.errors_dir = REPORTS_DIR / "errors"
-        self.errors_dir.mkdir(parents=True, exist_ok=True)
+        self.errors: List[Dict] = []
+        self._partial = ""
+        self._current: Optional[Dict] = None
+        self._previous_line = ""
+
+    def feed(self, text: str) -> List[Dict]:
+        """Consume a chunk of output; returns the errors completed by it."""
+        completed = []
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            completed.extend(self.feed_line(line.rstrip("\r")))
+        return completed
+
+    def close(self) -> List[Dict]:
+        """Flush buffered output; returns the errors completed by it."""
+        completed = []
+        if self._partial:
+            completed.extend(self.feed_line(self._partial))
+            self._partial = ""
+        completed.extend(self._finish())
+        return completed
+
+    def feed_line(self, line: str) -> List[Dict]:
+        completed = []
+
+        if TRACEBACK_START.match(line):
+            # A Go goroutine dump continues the preceding panic
+            if not (self._current and self._current["language"] == "go" and not self._current["frames"]):
+                completed.extend(self._finish())
+                self._start("python" if line.startswith("Traceback") else "go")
+            self._append_line(line)
+            self._previous_line = line
+            return completed
+
+        for language, pattern, standalone in DIAGNOSTIC_PATTERNS:
+            match = pattern.match(line)
+            if match:
+                completed.extend(self._finish())
+                groups = match.groupdict()
+                error = self._start(language, groups.get("type") or "error", groups.get("message") or "")
+                error["frames"].append(self._frame(language, match))
+                self._append_line(line)
+                if standalone:
+                    completed.extend(self._finish())
+                self._previous_line = line
+                return completed
+
+        for language, pattern in FRAME_PATTERNS:
+            match = pattern.match(line)
+            if match:
+                if self._current is None:
+                    self._start(language)
+                elif not self._current["frames"]:
+                    # Headlines are ambiguous (e.g. "TypeError: ..."); frames are not
+                    self._current["language"] = language
+                frame = self._frame(language, match)
+                if language == "go" and frame["function"] is None:
+                    # Go prints the function on the line before its location
+                    frame["function"] = self._previous_line.strip().split("(")[0] or None
+                self._current["frames"].append(frame)
+                self._append_line(line)
+                self._previous_line = line
+                return completed
+
+        for language, pattern in ERROR_PATTERNS:
+            match = pattern.match(line)
+            if match:
+                current = self._current
+                if current and current["type"] is None and current["language"] == "python":
+                    # The exception line closes a Python traceback
+                    current["type"] = match.group("type")
+                    current["message"] = (match.group("message") or "").strip()
+                    self._append_line(line)
+                    completed.extend(self._finish())
+                else:
+                    completed.extend(self._finish())
+                    self._start(language, match.group("type"), (match.group("message") or "").strip())
+                    self._append_line(line)
+                self._previous_line = line
+                return completed
 
-    def analyze_output(self, stderr: str, context: str = "") -> Optional[Dict]:
+        if self._current is not None and line.strip():
+            current = self._current
+            if current["type"] and not current["message"] and len(current["frames"]) <= 1:
+                # e.g. Rust prints the panic message on the line after its location
+                current["message"] = line.strip()
+            self._append_line(line)
+        self._previous_line = line
+        return completed
+
+    def _start(self, language: str, error_type: Optional[str] = None, message: str = "") -> Dict:
+        self._current = {
+            "language": language,
+            "type": error_type,
+            "message": message,
+            "frames": [],
+            "lines": [],
+        }
+        return self._current
+
+    def _append_line(self, line: str):
+        if len(self._current["lines"]) < MAX_LINES_PER_ERROR:
+            self._current["lines"].append(line)
+
+    def _finish(self) -> List[Dict]:
+        error, self._current = self._current, None
+        if error is None or (error["type"] is None and not error["frames"]):
+            return []
+        if error["type"] is None:
+            error["type"] = "UnknownError"
+        error["trace"] = "\n".join(error.pop("lines"))
+        self.errors.append(error)
+        return [error]
+
+    @staticmethod
+    def _frame(language: str, match: re.Match) -> Dict:
+        groups = match.groupdict()
+        return {
+            "language": language,
+            "file": groups["file"],
+            "line": int(groups["line"]),
+            "column": int(groups["column"]) if groups.get("column") else None,
+            "function": (groups.get("function") or "").strip() or None,
+        }
+
+
+def detect_errors(output: str) -> List[Dict]:
+    """Run the streaming detector over a complete output string."""
+    detector = StreamingErrorDetector()
+    detector.feed(output)
+    detector.close()
+    return detector.errors
+
+
+class ErrorDetector:
+    def __init__(self, store: Optional[ErrorStore] = None):
+        self.store = store or ErrorStore()
+
+    def analyze_output(self, stderr: str, context: str = "", project: str = "") -> Optional[Dict]:
         """
         Analyzes stderr to detect errors and saves a report.
         """
         if not stderr:
             return None
 
-        # Simple heuristic for now - real implementation would be smarter
-        error_type = "UnknownError"
-        if "ImportError" in stderr or "ModuleNotFoundError" in stderr:
-            error_type = "ImportError"
-        elif "SyntaxError" in stderr:
-            error_type = "SyntaxError"
-        elif "TypeError" in stderr:
-            error_type = "TypeError"
-        elif "NameError" in stderr:
-            error_type = "NameError"
+        errors = detect_errors(stderr)
+        if errors:
+            # The last error is the one that ended the run (e.g. the outermost
+            # exception of a chained Python traceback)
+            error = errors[-1]
+            error_type = error["type"]
+            frames = error["frames"]
+            message = error["message"]
+        elif "Error:" in stderr or "Exception" in stderr:
+            error_type, frames, message = "RuntimeError", [], ""
         else:
-             # If obscure, maybe not an error we can categorize easily, but still log
-             if "Error:" not in stderr and "Exception" not in stderr:
-                 # Check if it looks like an error
-                 return None
-             error_type = "RuntimeError"
+            return None
 
         report = {
             "id": str(uuid.uuid4()),
             "timestamp": datetime.now().isoformat(),
             "type": error_type,
+            "message": message,
+            "frames": frames,
+            "project": project,
             "description": stderr[:500], # Truncate for summary
             "full_trace": stderr,
             "context": context
         }
-        
-        self._save_report(report)
-        return report
-
-    def _save_report(self, report: Dict):
-        filename = f"error_{datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}_{report['id'][:8]}.json"
-        with open(self.errors_dir / filename, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2)
+
+        return self._save_report(report)
+
+    def _save_report(self, report: Dict) -> Dict:
+        # Repeats of a known error only bump its occurrence count
+        return self.store.record(report)
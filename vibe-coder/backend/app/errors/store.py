@@ -0,0 +1,230 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+from loguru import logger
+
+from app.core.config import settings
+from app.core.paths import REPORTS_DIR
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS errors (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fingerprint TEXT NOT NULL UNIQUE,
+    report_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    project TEXT NOT NULL DEFAULT '',
+    message TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    full_trace TEXT NOT NULL DEFAULT '',
+    context TEXT NOT NULL DEFAULT '',
+    frames TEXT NOT NULL DEFAULT '[]',
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    occurrences INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_errors_last_seen ON errors (last_seen, id);
+CREATE INDEX IF NOT EXISTS idx_errors_type ON errors (type, last_seen, id);
+CREATE INDEX IF NOT EXISTS idx_errors_project ON errors (project, last_seen, id);
+
+CREATE TABLE IF NOT EXISTS occurrences (
+    error_id INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    context TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_occurrences_error ON occurrences (error_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_occurrences_timestamp ON occurrences (timestamp);
+"""
+
+# Volatile parts of error text that differ between occurrences of the same bug
+_NORMALIZERS = [
+    (re.compile(r"0x[0-9a-fA-F]+"), "0x?"),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"), "<uuid>"),
+    (re.compile(r"'[^']*'|\"[^\"]*\""), "<str>"),
+    (re.compile(r"\d+"), "<n>"),
+]
+
+
+def fingerprint(report: Dict) -> str:
+    """
+    Fingerprint of an error that is stable across occurrences: error type,
+    normalized message and the (file name, function) of each frame. Line
+    numbers, addresses, ids and quoted values are ignored.
+    """
+    message = report.get("message") or ""
+    frames = report.get("frames") or []
+    if not message and not frames:
+        # No structure parsed; fall back to the last lines of the trace
+        message = "\n".join((report.get("full_trace") or "").strip().splitlines()[-3:])
+    for pattern, replacement in _NORMALIZERS:
+        message = pattern.sub(replacement, message)
+    parts = [report.get("project") or "", report.get("type") or "", message]
+    parts.extend(f"{Path(f['file']).name}:{f.get('function') or ''}" for f in frames)
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class ErrorStore:
+    """
+    SQLite-backed store of error reports.
+
+    Repeated errors are folded into one row by fingerprint with an occurrence
+    count; each occurrence is appended to a lightweight log. Reports are
+    indexed by last occurrence, type and project, and paged with a keyset
+    cursor so deep pages stay cheap.
+    """
+
+    def __init__(self, db_path: Optional[Union[str, Path]] = None):
+        self.db_path = Path(db_path) if db_path else REPORTS_DIR / "errors" / "errors.db"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def record(self, report: Dict) -> Dict:
+        """
+        Insert a report, or bump the occurrence count of an identical one.
+        Returns the report with its fingerprint and occurrence count.
+        """
+        digest = fingerprint(report)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                """
+                INSERT INTO errors (fingerprint, report_id, type, project, message, description,
+                                    full_trace, context, frames, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (fingerprint) DO UPDATE SET
+                    last_seen = excluded.last_seen,
+                    occurrences = occurrences + 1,
+                    full_trace = excluded.full_trace,
+                    description = excluded.description,
+                    context = excluded.context
+                RETURNING id, report_id, occurrences, first_seen
+                """,
+                (
+                    digest, report["id"], report["type"], report.get("project") or "",
+                    report.get("message") or "", report.get("description") or "",
+                    report.get("full_trace") or "", report.get("context") or "",
+                    json.dumps(report.get("frames") or []), now, now,
+                ),
+            ).fetchone()
+            self._conn.execute(
+                "INSERT INTO occurrences (error_id, timestamp, context) VALUES (?, ?, ?)",
+                (row["id"], now, report.get("context") or ""),
+            )
+        return dict(
+            report,
+            id=row["report_id"],
+            fingerprint=digest,
+            occurrences=row["occurrences"],
+            first_seen=datetime.fromtimestamp(row["first_seen"]).isoformat(),
+        )
+
+    def get(self, report_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM errors WHERE report_id = ?", (report_id,)).fetchone()
+        return self._to_report(row) if row else None
+
+    def query(self, error_type: Optional[str] = None, project: Optional[str] = None,
+              since: Optional[float] = None, cursor: Optional[str] = None, limit: int = 50) -> Dict:
+        """
+        Page through reports, most recently seen first.
+
+        `cursor` is the `next_cursor` of the previous page.
+        """
+        clauses, params = [], []
+        if error_type:
+            clauses.append("type = ?")
+            params.append(error_type)
+        if project is not None:
+            clauses.append("project = ?")
+            params.append(project)
+        if since is not None:
+            clauses.append("last_seen >= ?")
+            params.append(since)
+        if cursor:
+            last_seen, row_id = cursor.split(":")
+            clauses.append("(last_seen, id) < (?, ?)")
+            params.extend([float(last_seen), int(row_id)])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        limit = max(1, min(limit, 500))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM errors {where} ORDER BY last_seen DESC, id DESC LIMIT ?",
+                (*params, limit + 1),
+            ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = f"{rows[-1]['last_seen']!r}:{rows[-1]['id']}"
+        return {"items": [self._to_report(row) for row in rows], "next_cursor": next_cursor}
+
+    def occurrences(self, report_id: str, limit: int = 100) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT o.timestamp, o.context FROM occurrences o
+                JOIN errors e ON e.id = o.error_id
+                WHERE e.report_id = ? ORDER BY o.timestamp DESC LIMIT ?
+                """,
+                (report_id, limit),
+            ).fetchall()
+        return [{"timestamp": datetime.fromtimestamp(r["timestamp"]).isoformat(), "context": r["context"]} for r in rows]
+
+    def retire(self, older_than_days: Optional[float] = None) -> Dict:
+        """
+        Delete reports not seen for `older_than_days` and compact the
+        occurrence log to the same horizon.
+        """
+        days = settings.ERROR_RETENTION_DAYS if older_than_days is None else older_than_days
+        cutoff = time.time() - days * 86400
+        with self._lock:
+            with self._conn:
+                errors = self._conn.execute("DELETE FROM errors WHERE last_seen < ?", (cutoff,)).rowcount
+                occurrences = self._conn.execute(
+                    "DELETE FROM occurrences WHERE timestamp < ? OR error_id NOT IN (SELECT id FROM errors)",
+                    (cutoff,),
+                ).rowcount
+            if errors or occurrences:
+                self._conn.execute("VACUUM")
+        if errors or occurrences:
+            logger.info(f"Retired {errors} error reports and {occurrences} occurrences older than {days} days")
+        return {"errors": errors, "occurrences": occurrences}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS reports, COALESCE(SUM(occurrences), 0) AS occurrences FROM errors"
+            ).fetchone()
+        return {"reports": row["reports"], "occurrences": row["occurrences"], "path": str(self.db_path)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_report(row: sqlite3.Row) -> Dict:
+        return {
+            "id": row["report_id"],
+            "fingerprint": row["fingerprint"],
+            "type": row["type"],
+            "project": row["project"],
+            "message": row["message"],
+            "description": row["description"],
+            "full_trace": row["full_trace"],
+            "context": row["context"],
+            "frames": json.loads(row["frames"]),
+            "occurrences": row["occurrences"],
+            "first_seen": datetime.fromtimestamp(row["first_seen"]).isoformat(),
+            "timestamp": datetime.fromtimestamp(row["last_seen"]).isoformat(),
+        }
@@ -0,0 +1,119 @@
+"""
+Thin client for the index service.
+
+`IndexClient` has the same methods as `IndexService`, so callers do not care
+whether indexing runs in-process or in the shared service process. Each
+thread keeps its own connection. Files written in this process are reported
+to the service so its incremental indexes see them.
+"""
+
+import itertools
+import socket
+import threading
+from typing import Dict, List, Optional
+from loguru import logger
+
+from app.core.config import settings
+from app.core.file_cache import file_cache
+from app.index_service.protocol import recv_message, send_message
+
+# Remote errors re-raised as the same builtin type, so callers can map them
+_BUILTIN_ERRORS = {cls.__name__: cls for cls in (ValueError, KeyError, FileNotFoundError, PermissionError)}
+
+# Methods that may run twice without harm; indexing can take minutes
+IDEMPOTENT_METHODS = frozenset({"invalidate", "retrieve_context", "search", "search_files", "status", "ping"})
+
+
+class IndexServiceError(Exception):
+    def __init__(self, error_type: str, message: str):
+        super().__init__(f"{error_type}: {message}")
+        self.error_type = error_type
+
+
+class IndexClient:
+    def __init__(self, socket_path: Optional[str] = None, timeout: Optional[float] = None):
+        self.socket_path = socket_path or settings.INDEX_SERVICE_SOCKET
+        self.timeout = settings.INDEX_SERVICE_TIMEOUT if timeout is None else timeout
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        file_cache.add_listener(self._forward_write)
+
+    def call(self, method: str, **params):
+        """
+        Call a service method. A dropped connection is retried once if the
+        request never reached the service or the method is idempotent;
+        timeouts are never retried.
+        """
+        request = {"id": next(self._ids), "method": method, "params": params}
+        for attempt in (1, 2):
+            sock = self._connection()
+            sent = False
+            try:
+                send_message(sock, request)
+                sent = True
+                response = recv_message(sock)
+                break
+            except socket.timeout:
+                # The service may still be working on it; the stream is out of step
+                self._disconnect()
+                raise
+            except OSError:
+                self._disconnect()
+                if attempt == 2 or (sent and method not in IDEMPOTENT_METHODS):
+                    raise
+        error = response.get("error")
+        if error:
+            builtin = _BUILTIN_ERRORS.get(error["type"])
+            if builtin is not None:
+                raise builtin(error["message"])
+            raise IndexServiceError(error["type"], error["message"])
+        return response.get("result")
+
+    def index_project(self, path: str) -> Dict:
+        return self.call("index_project", path=path)
+
+    def reindex(self, path: str, files: Optional[List[str]] = None) -> Dict:
+        return self.call("reindex", path=path, files=files)
+
+    def invalidate(self, paths: List[str]) -> Dict:
+        return self.call("invalidate", paths=paths)
+
+    def retrieve_context(self, query: str, max_files: int = 3, error_output: Optional[str] = None,
+                         token_budget: Optional[int] = None, scope: Optional[Dict] = None) -> List[Dict]:
+        return self.call("retrieve_context", query=query, max_files=max_files,
+                         error_output=error_output, token_budget=token_budget, scope=scope)
+
+    def search(self, query: str, k: int = 5, scope: Optional[Dict] = None) -> List[Dict]:
+        return self.call("search", query=query, k=k, scope=scope)
+
+    def search_files(self, path: str, query: str, **options) -> Dict:
+        return self.call("search_files", path=path, query=query, **options)
+
+    def status(self) -> Dict:
+        return self.call("status")
+
+    def close(self):
+        file_cache.remove_listener(self._forward_write)
+        self._disconnect()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _disconnect(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _forward_write(self, path: str):
+        try:
+            self.invalidate([path])
+        except Exception as e:
+            # The write itself succeeded; a full reindex will catch up
+            logger.warning(f"Could not notify the index service about {path}: {e}")
@@ -0,0 +1,72 @@
+"""
+Wire format between web workers and the index service.
+
+Each message is a 4-byte big-endian length followed by a JSON object:
+requests are {"id", "method", "params"}, responses {"id", "result"} or
+{"id", "error": {"type", "message"}}. Ids let a connection carry several
+requests at once; responses may come back in any order.
+"""
+
+import asyncio
+import json
+import socket
+import struct
+from typing import Any, Dict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+HEADER = struct.Struct(">I")
+MAX_MESSAGE_BYTES = 256 * 1024 * 1024
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def dumps(message: Dict) -> bytes:
+    if orjson is not None:
+        body = orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS, default=str)
+    else:
+        body = json.dumps(message, separators=(",", ":"), default=str).encode("utf-8")
+    return HEADER.pack(len(body)) + body
+
+
+def loads(body: bytes) -> Dict:
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def _check_length(length: int):
+    if length > MAX_MESSAGE_BYTES:
+        raise ProtocolError(f"Message of {length} bytes exceeds the {MAX_MESSAGE_BYTES} byte limit")
+
+
+async def read_message(reader: asyncio.StreamReader) -> Dict:
+    """Read one message; raises asyncio.IncompleteReadError at end of stream."""
+    (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    _check_length(length)
+    return loads(await reader.readexactly(length))
+
+
+def recv_message(sock: socket.socket) -> Dict:
+    (length,) = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+    _check_length(length)
+    return loads(_recv_exactly(sock, length))
+
+
+def send_message(sock: socket.socket, message: Any):
+    sock.sendall(dumps(message))
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if not count:
+            raise ConnectionError("Index service closed the connection")
+        received += count
+    return bytes(buffer)
@@ -0,0 +1,134 @@
+"""
+Index service process.
+
+Owns the embedding model and every project index so that several uvicorn
+workers share one copy of each. Workers connect over a Unix socket (see
+`protocol`) and call `IndexService` methods; requests on a connection run
+concurrently, and query embeddings from concurrent requests are encoded in
+batches.
+
+Usage: python -m app.index_service.server [--socket PATH]
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import sys
+from pathlib import Path
+from typing import Dict, Optional, Set
+from loguru import logger
+
+from app.ai_engine.query_batcher import QueryBatcher
+from app.core.config import settings
+from app.index_service.protocol import ProtocolError, dumps, read_message
+from app.index_service.service import IndexService
+from app.services import LOCAL_INDEX_FACTORIES, ServiceContainer
+
+# IndexService methods callable over the socket
+METHODS = ("index_project", "reindex", "invalidate", "retrieve_context", "search", "search_files", "status")
+
+
+def _batched_embedding_manager(container: ServiceContainer):
+    manager = LOCAL_INDEX_FACTORIES["embedding_manager"](container)
+    manager.query_batcher = QueryBatcher(manager.generate_embeddings, max_batch=settings.INDEX_SERVICE_MAX_BATCH,
+                                         max_wait=settings.INDEX_SERVICE_BATCH_WAIT_MS / 1000)
+    return manager
+
+
+class IndexServer:
+    def __init__(self, socket_path: str, service: Optional[IndexService] = None):
+        self.socket_path = socket_path
+        if service is None:
+            container = ServiceContainer(dict(LOCAL_INDEX_FACTORIES, embedding_manager=_batched_embedding_manager))
+            service = IndexService(container)
+        self.service = service
+        self.handlers = {name: getattr(service, name) for name in METHODS}
+        self.handlers["ping"] = lambda: "pong"
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._warmup: Optional[asyncio.Task] = None
+
+    async def start(self):
+        path = Path(self.socket_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            # Left behind by a previous run; connecting to it would fail anyway
+            path.unlink()
+        self._server = await asyncio.start_unix_server(self._handle, path=str(path))
+        os.chmod(path, 0o600)
+        logger.info(f"Index service listening on {path}")
+        if settings.WARMUP_ON_STARTUP:
+            self._warmup = asyncio.create_task(self.service.container.warmup())
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        container = self.service.container
+        if container.is_loaded("embedding_manager"):
+            container.embedding_manager.close()
+        Path(self.socket_path).unlink(missing_ok=True)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write_lock = asyncio.Lock()
+        tasks: Set[asyncio.Task] = set()
+        try:
+            while True:
+                try:
+                    message = await read_message(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                task = asyncio.create_task(self._dispatch(message, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except ProtocolError as e:
+            logger.warning(f"Dropping index service client: {e}")
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def _dispatch(self, message: Dict, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        handler = self.handlers.get(message.get("method"))
+        if handler is None:
+            response = {"id": message.get("id"), "error": {"type": "ValueError", "message": f"Unknown method {message.get('method')!r}"}}
+        else:
+            try:
+                # Handlers block (model inference, file I/O); keep the loop free.
+                # They run concurrently, so the indexes they share lock
+                # themselves (see EmbeddingManager._lexical_lock)
+                result = await asyncio.to_thread(handler, **(message.get("params") or {}))
+                response = {"id": message.get("id"), "result": result}
+            except Exception as e:
+                response = {"id": message.get("id"), "error": {"type": type(e).__name__, "message": str(e)}}
+        async with write_lock:
+            try:
+                writer.write(dumps(response))
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+
+async def serve(socket_path: str):
+    server = IndexServer(socket_path)
+    await server.start()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+    logger.info("Index service shutting down")
+    await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=settings.INDEX_SERVICE_SOCKET, help="Unix socket to listen on")
+    args = parser.parse_args()
+    if not args.socket:
+        parser.error("--socket or INDEX_SERVICE_SOCKET is required")
+    asyncio.run(serve(args.socket))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Project indexing and retrieval operations.
+
+`IndexService` owns everything derived from a project's files: embeddings,
+the lexical, symbol, import and trigram indexes, and the context builder
+that reads them. The API calls it in-process by default; with
+INDEX_SERVICE_SOCKET set, one `app.index_service.server` process runs it
+and web workers reach it through `IndexClient`, which has the same methods.
+Arguments and results are plain JSON-compatible values either way.
+"""
+
+import itertools
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.ai_engine.search_scope import normalize_scope
+from app.core.config import settings
+from app.core.file_cache import file_cache
+from app.core.single_flight import SingleFlight
+from app.repo.dependency_graph import get_dependency_graph
+from app.repo.scanner import RepoScanner
+from app.repo.symbols import get_symbol_index
+from app.repo.trigram_index import get_trigram_index
+
+# Container services an index service needs
+INDEX_SERVICES = ("embedding_manager", "context_builder")
+
+
+class IndexService:
+    def __init__(self, container):
+        # Models are built lazily by the service container of this process
+        self.container = container
+        # Identical retrievals running at the same time are computed once.
+        # Keys carry the index generation, bumped on every reindex or file
+        # write, so a call never joins one that started on older data.
+        self._retrievals = SingleFlight()
+        self._project: Optional[str] = None
+        self._generations = itertools.count(1)
+        self._generation = 0
+        file_cache.add_listener(self._bump_generation)
+
+    def index_project(self, path: str) -> Dict:
+        """Scan a project and rebuild its indexes (unchanged files are skipped where possible)."""
+        symbols = get_symbol_index(path)
+        graph = get_dependency_graph(path)
+        files = RepoScanner(path).scan(symbol_index=symbols, dependency_graph=graph,
+                                       trigram_index=get_trigram_index(path))
+        self.container.embedding_manager.create_index(files)
+        context_builder = self.container.context_builder
+        context_builder.symbol_index = symbols
+        context_builder.dependency_graph = graph
+        self._project = str(Path(path).resolve())
+        self._bump_generation()
+        return {"files_count": len(files)}
+
+    def reindex(self, path: str, files: Optional[List[str]] = None) -> Dict:
+        """
+        Without `files`, rebuild everything. With them, invalidate the data
+        derived from those files and their transitive dependents.
+        """
+        if files is None:
+            return self.index_project(path)
+        graph = get_dependency_graph(path)
+        affected = graph.affected(files)
+        for rel_path in affected:
+            # Symbols, imports and lexical terms re-derive lazily on next use
+            file_cache.invalidate(graph.root_path / rel_path)
+        return {"changed": files, "affected": affected}
+
+    def invalidate(self, paths: List[str]) -> Dict:
+        """Tell the indexes that files (absolute paths) were written elsewhere."""
+        for path in paths:
+            file_cache.invalidate(path)
+        return {"invalidated": len(paths)}
+
+    def retrieve_context(self, query: str, max_files: int = 3, error_output: Optional[str] = None,
+                         token_budget: Optional[int] = None, scope: Optional[Dict] = None) -> List[Dict]:
+        """Context for a chat query; `scope` filters are described in `search_scope` (ValueError if invalid)."""
+        scope = normalize_scope(scope)
+        return self._single_flight(
+            ("retrieve_context", query, max_files, error_output, token_budget, _scope_key(scope)),
+            self.container.context_builder.retrieve_context,
+            query, max_files=max_files, error_output=error_output, token_budget=token_budget, scope=scope)
+
+    def search(self, query: str, k: int = 5, scope: Optional[Dict] = None) -> List[Dict]:
+        scope = normalize_scope(scope)
+        return self._single_flight(("search", query, k, _scope_key(scope)),
+                                   self.container.embedding_manager.search, query, k=k, scope=scope)
+
+    def search_files(self, path: str, query: str, regex: bool = False, case_sensitive: bool = False,
+                     glob: Optional[str] = None, extensions: Optional[List[str]] = None,
+                     offset: int = 0, limit: int = 50) -> Dict:
+        if not Path(path).is_dir():
+            raise FileNotFoundError(f"Path not found: {path}")
+        index = get_trigram_index(path)
+        if not index.stats()["files"]:
+            # First search in a project that was never indexed
+            RepoScanner(path).scan(trigram_index=index)
+        try:
+            return index.search(query, regex=regex, case_sensitive=case_sensitive, glob=glob,
+                                extensions=extensions, offset=offset, limit=limit)
+        except re.error as e:
+            raise ValueError(f"Invalid regex: {e}")
+
+    def status(self) -> Dict:
+        status = self.container.status()
+        services = {name: status["services"].get(name, "pending") for name in INDEX_SERVICES}
+        return {
+            "ready": all(state == "loaded" for state in services.values()),
+            "services": services,
+            "errors": {name: e for name, e in status["errors"].items() if name in INDEX_SERVICES},
+            "single_flight": self._retrievals.stats(),
+        }
+
+    def _single_flight(self, call: tuple, fn, *args, **kwargs):
+        if not settings.SINGLE_FLIGHT:
+            return fn(*args, **kwargs)
+        return self._retrievals.do((self._project, self._generation) + call, fn, *args, **kwargs)
+
+    def _bump_generation(self, path: Optional[str] = None):
+        # Called from request threads and file_cache listeners; count() is atomic
+        self._generation = next(self._generations)
+
+
+def _scope_key(scope: Optional[Dict]) -> Optional[str]:
+    return json.dumps(scope, sort_keys=True) if scope else None
@@ -1,26 +1,39 @@
 import sys
+import time
 from pathlib import Path
 
+_import_started = time.perf_counter()
+
 # Fix path to allow running directly: python main.py
 if __name__ == "__main__":
     sys.path.append(str(Path(__file__).resolve().parent.parent))
 
+import asyncio
+import json
 from fastapi import FastAPI, WebSocket
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from loguru import logger
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 # Import app modules after path fix
 try:
-    from app.api import chat, files, terminal
-    from app.services import llm_manager, context_builder, prompt_builder
+    from app.ai_engine.llm_scheduler import LLMQueueFull
+    from app.ai_engine.search_scope import normalize_scope
+    from app.api import admin, chat, errors, files, terminal
+    from app.core.config import settings
+    from app.core.profiling import ProfilingMiddleware
+    from app.core.responses import CompressionMiddleware, FastJSONResponse
+    from app.services import container
 except ImportError as e:
     # Fallback/Error logging if path setup failed
     logger.error(f"Failed to import app modules: {e}")
     raise e
 
-app = FastAPI(title="Vibe Coder API")
+container.record("import_app", time.perf_counter() - _import_started)
+
+app = FastAPI(title="Vibe Coder API", default_response_class=FastJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -30,33 +43,90 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+# Outermost, so the profile covers compression and streaming too
+app.add_middleware(ProfilingMiddleware)
 
 app.include_router(chat.router, prefix="/api/v1/chat", tags=["chat"])
 app.include_router(files.router, prefix="/api/v1/files", tags=["files"])
 app.include_router(terminal.router, prefix="/api/v1/terminal", tags=["terminal"])
+app.include_router(errors.router, prefix="/api/v1/errors", tags=["errors"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
+
+@app.on_event("startup")
+async def startup():
+    errors.detector.store.retire()
+    if settings.WARMUP_ON_STARTUP:
+        # Load models after the server starts listening; /ready reports progress
+        app.state.warmup = asyncio.create_task(container.warmup())
+
+@app.on_event("shutdown")
+async def shutdown():
+    await terminal.sessions.close_all()
+    if container.is_loaded("embedding_manager"):
+        container.embedding_manager.close()
+    if settings.INDEX_SERVICE_SOCKET and container.is_loaded("index_service"):
+        container.index_service.close()
 
 @app.get("/")
 async def root():
     return {"message": "Vibe Coder API is running"}
 
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: all services (including the embedding model) are loaded."""
+    status = container.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+def parse_chat_message(data: str) -> Tuple[str, Optional[Dict]]:
+    """
+    A WebSocket chat message is either plain text or a JSON object
+    {"message": ..., "scope": {...}} (scope as in ChatRequest).
+    Raises ValueError for a JSON request with an invalid scope.
+    """
+    try:
+        payload = json.loads(data) if data.lstrip().startswith("{") else None
+    except json.JSONDecodeError:
+        payload = None
+    if not isinstance(payload, dict) or "message" not in payload:
+        # Text that merely looks like JSON, e.g. pasted code
+        return data, None
+    scope = chat.RetrievalScope.model_validate(payload.get("scope") or {})
+    return str(payload["message"]), normalize_scope(scope.to_dict())
+
 @app.websocket("/ws/chat")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     logger.info("WebSocket connection established")
+    # Each connection is queued fairly against the others
+    session = websocket.query_params.get("session") or f"ws-{id(websocket)}"
     try:
         while True:
             data = await websocket.receive_text()
-            
+            try:
+                message, scope = parse_chat_message(data)
+            except ValueError as e:
+                await websocket.send_text(f"Error: invalid scope: {e}")
+                continue
+
             # 1. Retrieve Context
-            context_files = context_builder.retrieve_context(data)
+            context_files = await asyncio.to_thread(container.index_service.retrieve_context, message, scope=scope)
             
             # 2. Build Prompt
-            system_prompt = prompt_builder.build_system_prompt(context_files)
-            messages = llm_manager.create_messages(system_prompt, data)
+            system_prompt = container.prompt_builder.build_system_prompt(context_files)
+            messages = container.llm_manager.create_messages(system_prompt, message)
             
             # 3. Stream Response
-            async for chunk in llm_manager.stream_response(messages):
-                await websocket.send_text(chunk)
+            try:
+                async for chunk in container.llm_manager.stream_response(messages, session=session, priority="interactive"):
+                    await websocket.send_text(chunk)
+            except LLMQueueFull as e:
+                await websocket.send_text(f"Error: {e}, retry in {e.retry_after}s")
                 
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
@@ -1,15 +1,224 @@
-from typing import List, Dict
+import re
+from pathlib import PurePosixPath
+from typing import List, Dict, Optional
 from app.ai_engine.embeddings import EmbeddingManager
+from app.ai_engine.search_scope import normalize_scope, path_in_scope
+from app.core.config import settings
+from app.core.file_cache import file_cache
+from app.errors.detector import detect_errors
+from app.repo.dependency_graph import DependencyGraph
+from app.repo.symbols import SymbolIndex
 from loguru import logger
 
+# Lines of code shown on each side of a traceback frame
+FRAME_CONTEXT_LINES = 15
+
+# Longest symbol definition included in full
+MAX_SYMBOL_LINES = 200
+
+# Rough size of a token, for budgeting context without a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Fewest path components a traceback path outside the project root must
+# share with an indexed file to be taken as that file
+MIN_OUTSIDE_ROOT_PARTS = 2
+# Directories of installed packages; frames there are never project code
+_INSTALLED_PACKAGE_DIRS = frozenset({"site-packages", "dist-packages", "node_modules"})
+_STDLIB_DIR = re.compile(r"/lib/python\d[\d.]*/")
+_DRIVE = re.compile(r"^[A-Za-z]:/")
+
+
 class ContextBuilder:
     def __init__(self, embedding_manager: EmbeddingManager):
         self.embedding_manager = embedding_manager
+        self._path_index: Dict[str, List[int]] = {}
+        self._path_ids: Dict[str, int] = {}
+        self._roots: List[str] = []
+        self._path_index_source = None
+        # Symbols and imports of the indexed project, set when a project is indexed
+        self.symbol_index: Optional[SymbolIndex] = None
+        self.dependency_graph: Optional[DependencyGraph] = None
 
-    def retrieve_context(self, query: str, max_files: int = 3) -> List[Dict]:
+    def retrieve_context(self, query: str, max_files: int = 3, error_output: Optional[str] = None,
+                         token_budget: Optional[int] = None, scope: Optional[Dict] = None) -> List[Dict]:
         """
         Retrieve relevant files based on semantic search.
+
+        If the query (or `error_output`) contains a traceback whose frames
+        point into the indexed project, only the code around those frames is
+        returned instead. Identifiers in the query that name a known symbol
+        resolve directly to their definitions, ahead of search results.
+        Files imported by or importing those results are then added while
+        they fit in `token_budget` (CONTEXT_TOKEN_BUDGET by default).
+
+        A `scope` (see `search_scope`) limits symbols, search results and
+        related files to matching paths. Traceback frames are not limited:
+        the error names the code that matters.
         """
         logger.info(f"Retrieving context for query: {query}")
-        relevant_docs = self.embedding_manager.search(query, k=max_files)
-        return relevant_docs
+        scope = normalize_scope(scope)
+        error_spans = self.retrieve_error_context(error_output or query, max_spans=max_files)
+        if error_spans:
+            return error_spans
+        results = self.retrieve_symbol_context(query, max_spans=max_files, scope=scope)
+        if len(results) < max_files:
+            paths = {r["path"] for r in results}
+            for doc in self.embedding_manager.search(query, k=max_files, scope=scope):
+                if doc["path"] not in paths:
+                    results.append(doc)
+                if len(results) >= max_files:
+                    break
+        return self.expand_with_dependencies(results, token_budget, scope=scope)
+
+    def expand_with_dependencies(self, results: List[Dict], token_budget: Optional[int] = None,
+                                 scope: Optional[Dict] = None) -> List[Dict]:
+        """
+        Append the direct dependencies, then dependents, of each result (in
+        rank order) that fit in the token budget left over by the results.
+        """
+        if self.dependency_graph is None or not results:
+            return results
+        budget = settings.CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+        remaining = budget - sum(self._estimate_tokens(r["content"]) for r in results)
+        included = {r["path"] for r in results}
+        expanded = list(results)
+        for result in results:
+            candidates = [(path, "imported_by") for path in self.dependency_graph.dependencies(result["path"])]
+            candidates += [(path, "imports") for path in self.dependency_graph.dependents(result["path"])]
+            for path, relation in candidates:
+                if remaining <= 0:
+                    return expanded
+                full_path = self.dependency_graph.root_path / path
+                if path in included or not path_in_scope(scope, path, full_path):
+                    continue
+                try:
+                    content = file_cache.get_text(full_path, errors="ignore")
+                except OSError:
+                    continue
+                tokens = self._estimate_tokens(content)
+                if tokens > remaining:
+                    continue
+                included.add(path)
+                remaining -= tokens
+                expanded.append({"path": path, "content": content, "related_to": result["path"], "relation": relation})
+        return expanded
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        return len(text) // CHARS_PER_TOKEN + 1
+
+    def retrieve_symbol_context(self, query: str, max_spans: int = 3, scope: Optional[Dict] = None) -> List[Dict]:
+        """
+        Definitions of the identifiers mentioned in `query` (in `scope`, if given).
+        """
+        if self.symbol_index is None:
+            return []
+        spans = []
+        for symbol in self.symbol_index.resolve_query(query, limit=max_spans):
+            full_path = self.symbol_index.root_path / symbol["path"]
+            if not path_in_scope(scope, symbol["path"], full_path):
+                continue
+            try:
+                lines = file_cache.get_text(full_path, errors="ignore").splitlines()
+            except OSError:
+                continue
+            start = symbol["line"]
+            end = min(symbol["end_line"], start + MAX_SYMBOL_LINES - 1, len(lines))
+            spans.append({
+                "path": symbol["path"],
+                "content": "\n".join(lines[start - 1:end]),
+                "start_line": start,
+                "end_line": end,
+                "symbol": symbol["qualname"],
+            })
+        return spans
+
+    def retrieve_error_context(self, output: str, max_spans: int = 3) -> List[Dict]:
+        """
+        Parse errors in `output` and return the code spans their frames point to.
+        """
+        spans = []
+        seen = set()
+        for error in reversed(detect_errors(output)):
+            frames = error["frames"]
+            # Python lists the innermost frame last; the others list it first
+            if error["language"] == "python":
+                frames = list(reversed(frames))
+            for frame in frames:
+                doc_id = self.resolve_path(frame["file"])
+                if doc_id is None or (doc_id, frame["line"]) in seen:
+                    continue
+                seen.add((doc_id, frame["line"]))
+                spans.append(self._span(doc_id, frame, error))
+                if len(spans) >= max_spans:
+                    return spans
+        return spans
+
+    def resolve_path(self, file_path: str) -> Optional[int]:
+        """
+        Map a path from a traceback (absolute, or relative to some cwd) to the
+        index of an indexed document, by the longest matching path suffix.
+
+        An absolute path under the project root must name an indexed file.
+        One outside it (another checkout, a container mount) must end with an
+        indexed file's whole relative path, of at least MIN_OUTSIDE_ROOT_PARTS
+        components, and not be stdlib or installed package code, so such
+        frames are not mistaken for project files of the same name.
+        """
+        self._refresh_path_index()
+        normalized = file_path.replace("\\", "/")
+        parts = PurePosixPath(normalized).parts
+        if not parts:
+            return None
+        absolute = normalized.startswith("/") or bool(_DRIVE.match(normalized))
+        if absolute:
+            for root in self._roots:
+                if normalized.startswith(root + "/"):
+                    return self._path_ids.get(normalized[len(root) + 1:])
+            if _INSTALLED_PACKAGE_DIRS.intersection(parts) or _STDLIB_DIR.search(normalized):
+                return None
+
+        best, best_len, best_whole = None, 0, False
+        for doc_id in self._path_index.get(parts[-1], ()):
+            doc_parts = PurePosixPath(self.embedding_manager.documents[doc_id]["path"].replace("\\", "/")).parts
+            common = 0
+            while common < min(len(parts), len(doc_parts)) and parts[-1 - common] == doc_parts[-1 - common]:
+                common += 1
+            if common > best_len:
+                best, best_len, best_whole = doc_id, common, common == len(doc_parts)
+        if absolute and (best_len < MIN_OUTSIDE_ROOT_PARTS or not best_whole):
+            return None
+        return best
+
+    def _refresh_path_index(self):
+        documents = self.embedding_manager.documents
+        if self._path_index_source is documents:
+            return
+        # Built aside and swapped in: other threads may be resolving paths
+        path_index: Dict[str, List[int]] = {}
+        path_ids: Dict[str, int] = {}
+        roots = set()
+        for doc_id, doc in enumerate(documents):
+            path = doc["path"].replace("\\", "/")
+            path_index.setdefault(PurePosixPath(path).name, []).append(doc_id)
+            path_ids[path] = doc_id
+            full_path = (doc.get("full_path") or "").replace("\\", "/")
+            if full_path.endswith("/" + path):
+                roots.add(full_path[:-len(path) - 1])
+        self._path_index, self._path_ids, self._roots = path_index, path_ids, sorted(roots, key=len, reverse=True)
+        self._path_index_source = documents
+
+    def _span(self, doc_id: int, frame: Dict, error: Dict) -> Dict:
+        doc = self.embedding_manager.documents[doc_id]
+        lines = self.embedding_manager.get_content(doc_id).splitlines()
+        start = max(frame["line"] - FRAME_CONTEXT_LINES, 1)
+        end = min(frame["line"] + FRAME_CONTEXT_LINES, len(lines))
+        return {
+            "path": doc["path"],
+            "content": "\n".join(lines[start - 1:end]),
+            "start_line": start,
+            "end_line": end,
+            "error_line": frame["line"],
+            "function": frame["function"],
+            "error": f"{error['type']}: {error['message']}" if error['message'] else error['type'],
+        }
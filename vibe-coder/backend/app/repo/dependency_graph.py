@@ -0,0 +1,367 @@
+"""
+Project import graph
+
+Records which project files each file imports (Python `import`/`from`,
+JS/TS `import`/`require`/`export ... from`, Go `import`), resolved to paths
+inside the project, with the reverse edges kept alongside so both
+dependencies and dependents are a dict lookup away.
+
+The graph is persisted per project and updated incrementally like the
+symbol index: only changed files are re-parsed, and imports that could not
+be resolved are retried when a file that might satisfy them appears.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import posixpath
+import re
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+from loguru import logger
+
+from app.core.file_cache import file_cache
+from app.core.paths import INDEX_DIR
+
+JS_EXTENSIONS = ('.js', '.jsx', '.ts', '.tsx', '.mjs', '.cjs')
+SUPPORTED_EXTENSIONS = set(JS_EXTENSIONS) | {'.py', '.go'}
+
+_JS_IMPORT = re.compile(
+    r'''(?:\bimport\s+(?:[\w*{}\s,$]+\s+from\s+)?|\bexport\s+[\w*{}\s,$]+\s+from\s+|\brequire\s*\(\s*|\bimport\s*\(\s*)['"]([^'"]+)['"]'''
+)
+_JS_SUFFIXES = ('',) + JS_EXTENSIONS + tuple(f'/index{ext}' for ext in JS_EXTENSIONS)
+_GO_IMPORT_BLOCK = re.compile(r'^import\s*\((.*?)^\)', re.M | re.S)
+_GO_IMPORT_LINE = re.compile(r'^import\s+(?:[\w.]+\s+)?"([^"]+)"', re.M)
+_GO_SPEC = re.compile(r'"([^"]+)"')
+
+
+def extract_imports(path: str, content: str) -> List[str]:
+    """
+    Import specifiers in a file. Python relative imports are returned with
+    their leading dots (e.g. "..models.user").
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.py':
+        try:
+            tree = ast.parse(content)
+        except SyntaxError:
+            return []
+        specs = []
+        for node in _statements(tree):
+            if isinstance(node, ast.Import):
+                specs.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                base = "." * node.level + (node.module or "")
+                # `from pkg import mod` may import a submodule; keep both forms
+                specs.extend(f"{base}.{alias.name}" if node.module else f"{base}{alias.name}"
+                             for alias in node.names if alias.name != "*")
+                if node.module:
+                    specs.append(base)
+        return specs
+    if extension in JS_EXTENSIONS:
+        return _JS_IMPORT.findall(content)
+    if extension == '.go':
+        specs = _GO_IMPORT_LINE.findall(content)
+        for block in _GO_IMPORT_BLOCK.findall(content):
+            specs.extend(_GO_SPEC.findall(block))
+        return specs
+    return []
+
+
+def _statements(tree: ast.AST):
+    """Every statement in a module; imports never appear inside expressions."""
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        yield node
+        for field in ('body', 'orelse', 'finalbody', 'handlers', 'cases'):
+            children = getattr(node, field, None)
+            if isinstance(children, list):
+                stack.extend(children)
+
+
+class DependencyGraph:
+    def __init__(self, root_path: Union[str, Path], index_path: Optional[Union[str, Path]] = None):
+        self.root_path = Path(root_path).resolve()
+        digest = hashlib.sha1(str(self.root_path).encode("utf-8")).hexdigest()[:16]
+        self.index_path = Path(index_path) if index_path else INDEX_DIR / digest / "imports.json"
+        self._lock = threading.RLock()
+        # rel_path -> {"mtime_ns", "size", "imports"}
+        self._files: Dict[str, Dict] = {}
+        self._deps: Dict[str, Set[str]] = {}
+        self._rdeps: Dict[str, Set[str]] = {}
+        # Files with unresolved imports, keyed by the last name the import mentions
+        self._unresolved: Dict[str, Set[str]] = {}
+        self._unresolved_keys: Dict[str, Set[str]] = {}
+        # Python dotted-module suffixes and Go package directories -> files
+        self._modules: Dict[str, Set[str]] = {}
+        self._packages: Dict[str, Set[str]] = {}
+        self._dirty: Set[str] = set()
+        self._load()
+        file_cache.add_listener(self._mark_dirty)
+
+    def sync(self, documents: Iterable[Dict]) -> Dict:
+        """Update the graph from scanned documents ('path' relative to the root, 'content')."""
+        parsed = 0
+        seen = set()
+        changed = []
+        with self._lock:
+            for doc in documents:
+                rel_path = Path(doc["path"]).as_posix()
+                if os.path.splitext(rel_path)[1].lower() not in SUPPORTED_EXTENSIONS:
+                    continue
+                seen.add(rel_path)
+                stat = self._stat(rel_path)
+                record = self._files.get(rel_path)
+                if stat and record and (record["mtime_ns"], record["size"]) == stat:
+                    continue
+                self._set_file(rel_path, extract_imports(rel_path, doc["content"]), stat)
+                changed.append(rel_path)
+                parsed += 1
+            for rel_path in [p for p in self._files if p not in seen]:
+                self._remove_file(rel_path)
+                changed.append(rel_path)
+            self._resolve_pending(changed)
+            self.save()
+        logger.info(f"Import graph: parsed {parsed} files, {len(self._files)} files in {self.root_path}")
+        return {"parsed": parsed, "files": len(self._files), "changed": changed}
+
+    def update_file(self, rel_path: str):
+        """Re-parse one file from disk (or drop it if it no longer exists)."""
+        full_path = self.root_path / rel_path
+        with self._lock:
+            if not full_path.is_file():
+                self._remove_file(rel_path)
+            else:
+                try:
+                    content = file_cache.get_text(full_path, errors="ignore")
+                except OSError:
+                    return
+                self._set_file(rel_path, extract_imports(rel_path, content), self._stat(rel_path))
+            self._resolve_pending([rel_path])
+
+    def dependencies(self, rel_path: str) -> List[str]:
+        """Project files imported by `rel_path`."""
+        self._refresh()
+        return sorted(self._deps.get(Path(rel_path).as_posix(), ()))
+
+    def dependents(self, rel_path: str) -> List[str]:
+        """Project files that import `rel_path`."""
+        self._refresh()
+        return sorted(self._rdeps.get(Path(rel_path).as_posix(), ()))
+
+    def affected(self, rel_paths: Iterable[str], max_depth: Optional[int] = None) -> List[str]:
+        """
+        Files whose derived data may be stale after `rel_paths` change: the
+        files themselves plus their transitive dependents.
+        """
+        self._refresh()
+        start = [Path(p).as_posix() for p in rel_paths]
+        seen = set(start)
+        queue = deque((p, 0) for p in start)
+        while queue:
+            path, depth = queue.popleft()
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for dependent in self._rdeps.get(path, ()):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    queue.append((dependent, depth + 1))
+        return sorted(seen)
+
+    def save(self):
+        with self._lock:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps({"root": str(self.root_path), "files": self._files}))
+            os.replace(tmp_path, self.index_path)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "root": str(self.root_path),
+                "files": len(self._files),
+                "edges": sum(len(d) for d in self._deps.values()),
+                "unresolved": len(self._unresolved_keys),
+            }
+
+    def _load(self):
+        if not self.index_path.exists():
+            return
+        try:
+            data = json.loads(self.index_path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable import graph {self.index_path}: {e}")
+            return
+        with self._lock:
+            files = data.get("files", {})
+            for rel_path, record in files.items():
+                self._files[rel_path] = record
+                self._add_module(rel_path)
+            for rel_path in files:
+                self._link(rel_path)
+
+    def _set_file(self, rel_path: str, imports: List[str], stat: Optional[Tuple[int, int]]):
+        is_new = rel_path not in self._files
+        self._unlink(rel_path)
+        mtime_ns, size = stat or (0, 0)
+        self._files[rel_path] = {"mtime_ns": mtime_ns, "size": size, "imports": imports}
+        if is_new:
+            self._add_module(rel_path)
+        self._link(rel_path)
+
+    def _remove_file(self, rel_path: str):
+        if rel_path not in self._files:
+            return
+        self._unlink(rel_path)
+        del self._files[rel_path]
+        for index in (self._modules, self._packages):
+            for key in [k for k in self._module_keys(rel_path) if k in index]:
+                index[key].discard(rel_path)
+                if not index[key]:
+                    del index[key]
+        # Files importing it now have an unresolved import
+        for dependent in list(self._rdeps.pop(rel_path, ())):
+            self._unlink(dependent)
+            self._link(dependent)
+
+    def _link(self, rel_path: str):
+        deps = set()
+        for spec in self._files[rel_path]["imports"]:
+            targets = self._resolve(rel_path, spec)
+            if targets:
+                deps.update(t for t in targets if t != rel_path)
+            else:
+                key = re.split(r'[./]', spec.rstrip("/"))[-1]
+                self._unresolved.setdefault(key, set()).add(rel_path)
+                self._unresolved_keys.setdefault(rel_path, set()).add(key)
+        self._deps[rel_path] = deps
+        for dep in deps:
+            self._rdeps.setdefault(dep, set()).add(rel_path)
+
+    def _unlink(self, rel_path: str):
+        for dep in self._deps.pop(rel_path, ()):
+            dependents = self._rdeps.get(dep)
+            if dependents:
+                dependents.discard(rel_path)
+                if not dependents:
+                    del self._rdeps[dep]
+        for key in self._unresolved_keys.pop(rel_path, ()):
+            self._unresolved[key].discard(rel_path)
+            if not self._unresolved[key]:
+                del self._unresolved[key]
+
+    def _resolve_pending(self, changed: Iterable[str]):
+        """Retry unresolved imports that a new or changed file might satisfy."""
+        retry = set()
+        for rel_path in changed:
+            # Packages are imported by directory name (__init__.py, index.js, Go)
+            for name in (Path(rel_path).stem, Path(rel_path).parent.name):
+                retry.update(self._unresolved.get(name, ()))
+        for rel_path in retry:
+            if rel_path in self._files:
+                self._unlink(rel_path)
+                self._link(rel_path)
+
+    def _add_module(self, rel_path: str):
+        extension = os.path.splitext(rel_path)[1]
+        index = self._modules if extension == '.py' else self._packages if extension == '.go' else None
+        if index is not None:
+            for key in self._module_keys(rel_path):
+                index.setdefault(key, set()).add(rel_path)
+
+    @staticmethod
+    def _module_keys(rel_path: str) -> List[str]:
+        """Every dotted-module (Python) or directory (Go) suffix naming this file."""
+        parts = rel_path.split("/")
+        if rel_path.endswith(".py"):
+            parts[-1] = parts[-1][:-3]
+            if parts[-1] == "__init__":
+                parts.pop()
+            return [".".join(parts[i:]) for i in range(len(parts)) if parts[i:]]
+        if rel_path.endswith(".go"):
+            dirs = parts[:-1]
+            return ["/".join(dirs[i:]) for i in range(len(dirs))]
+        return []
+
+    def _resolve(self, importer: str, spec: str) -> Set[str]:
+        extension = os.path.splitext(importer)[1]
+        if extension == '.py':
+            if spec.startswith("."):
+                level = len(spec) - len(spec.lstrip("."))
+                package = importer.split("/")[:-1]
+                if level > 1:
+                    package = package[:-(level - 1)] if level - 1 <= len(package) else []
+                rest = spec[level:]
+                target = "/".join(package + (rest.split(".") if rest else []))
+                candidates = {f"{target}.py", f"{target}/__init__.py"}
+                return {c for c in candidates if c in self._files}
+            return self._closest(importer, self._modules.get(spec, set()))
+        if extension in JS_EXTENSIONS:
+            if not spec.startswith("."):
+                return set()
+            base = posixpath.normpath(posixpath.join(posixpath.dirname(importer), spec))
+            for suffix in _JS_SUFFIXES:
+                if base + suffix in self._files:
+                    return {base + suffix}
+            return set()
+        if extension == '.go':
+            # Import paths end with the package directory; match the longest suffix
+            parts = spec.split("/")
+            for i in range(len(parts)):
+                files = self._packages.get("/".join(parts[i:]))
+                if files:
+                    return set(files)
+            return set()
+        return set()
+
+    @staticmethod
+    def _closest(importer: str, candidates: Set[str]) -> Set[str]:
+        """Of several files providing a module, the one nearest the importer."""
+        if len(candidates) <= 1:
+            return set(candidates)
+        def shared(path: str) -> int:
+            return len(os.path.commonprefix([path.split("/"), importer.split("/")]))
+        return {max(sorted(candidates), key=shared)}
+
+    def _stat(self, rel_path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.root_path / rel_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _mark_dirty(self, path: str):
+        try:
+            rel_path = Path(path).relative_to(self.root_path).as_posix()
+        except ValueError:
+            return
+        if os.path.splitext(rel_path)[1].lower() in SUPPORTED_EXTENSIONS:
+            with self._lock:
+                self._dirty.add(rel_path)
+
+    def _refresh(self):
+        if not self._dirty:
+            return
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            for rel_path in dirty:
+                self.update_file(rel_path)
+
+
+_graphs: Dict[Path, DependencyGraph] = {}
+_registry_lock = threading.Lock()
+
+
+def get_dependency_graph(root_path: Union[str, Path]) -> DependencyGraph:
+    """Return the import graph for a project root, loading it on first use."""
+    root = Path(root_path).resolve()
+    with _registry_lock:
+        graph = _graphs.get(root)
+        if graph is None:
+            graph = DependencyGraph(root)
+            _graphs[root] = graph
+        return graph
@@ -3,35 +3,33 @@ import os
 from pathlib import Path
 from typing import List, Dict, Optional
 from loguru import logger
-import git
-from datetime import datetime
+
+from app.core.file_cache import file_cache
+from app.repo.history import EditHistory, find_history
 
 class DiffManager:
     def __init__(self, root_path: str):
         self.root_path = Path(root_path)
-        self.repo = self._init_git_repo()
 
-    def _init_git_repo(self) -> Optional[git.Repo]:
-        try:
-            if not (self.root_path / '.git').exists():
-                 logger.info(f"Initializing git repo in {self.root_path}")
-                 return git.Repo.init(self.root_path)
-            return git.Repo(self.root_path)
-        except Exception as e:
-            logger.error(f"Failed to init git repo: {e}")
-            return None
+    @property
+    def history(self) -> Optional[EditHistory]:
+        """Edit history of the indexed project containing the root; this never registers one"""
+        return find_history(self.root_path)
 
-    def create_snapshot(self, message: str = "AI Snapshot"):
-        if not self.repo:
-            return
-        try:
-            # Check for changes
-            if self.repo.is_dirty(untracked_files=True):
-                self.repo.git.add([str(self.root_path)])
-                self.repo.index.commit(f"{message} - {datetime.now().isoformat()}")
-                logger.info("Created git snapshot")
-        except Exception as e:
-            logger.error(f"Snapshot failed: {e}")
+    def read_file(self, file_path: str) -> str:
+        """
+        Current content of a project file, through the shared content cache.
+        """
+        full_path = self.root_path / file_path
+        if not full_path.exists():
+            return ""
+        return file_cache.get_text(full_path, errors='replace')
+
+    def diff_against_disk(self, file_path: str, new_content: str) -> str:
+        """
+        Unified diff between a file as it is on disk and `new_content`.
+        """
+        return self.generate_diff(file_path, self.read_file(file_path), new_content)
 
     def generate_diff(self, file_path: str, original_content: str, new_content: str) -> str:
         diff = difflib.unified_diff(
@@ -55,18 +53,40 @@ class DiffManager:
              return {"success": False, "error": "Invalid path"}
 
         try:
-            # 1. Snapshot before write
-            self.create_snapshot(f"Pre-change: {file_path}")
+            # 1. Capture the previous version for the edit history
+            before = file_cache.get_bytes(full_path) if full_path.exists() else None
 
             # 2. Write file
             full_path.parent.mkdir(parents=True, exist_ok=True)
             with open(full_path, 'w', encoding='utf-8') as f:
                 f.write(new_content)
+            file_cache.invalidate(full_path)
             
-            # 3. Snapshot after write
-            self.create_snapshot(f"Post-change: {file_path}")
+            # 3. Record the edit so it can be undone without touching git
+            history = self.history
+            entry = None
+            if history is not None:
+                entry = history.record(full_path, before, file_cache.get_bytes(full_path))
             
-            return {"success": True, "message": f"Updated {file_path}"}
+            return {"success": True, "message": f"Updated {file_path}", "version": entry["version"] if entry else None}
         except Exception as e:
             logger.error(f"Failed to apply diff: {e}")
             return {"success": False, "error": str(e)}
+
+    def undo(self) -> Optional[Dict]:
+        """
+        Reverts the most recent recorded edit in this project.
+        """
+        history = self.history
+        return history.undo() if history is not None else None
+
+    def redo(self) -> Optional[Dict]:
+        """
+        Re-applies the most recently undone edit in this project.
+        """
+        history = self.history
+        return history.redo() if history is not None else None
+
+    def list_versions(self, file_path: str) -> List[Dict]:
+        history = self.history
+        return history.list_versions(file_path) if history is not None else []
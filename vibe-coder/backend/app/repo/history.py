@@ -0,0 +1,280 @@
+"""
+In-process edit history
+
+Keeps deduplicated, compressed versions of every file touched by
+`DiffManager.apply_diff` or the `FileWriter` tools, so AI edits can be undone
+and redone instantly without running git or committing into the user's repo.
+"""
+
+import hashlib
+import threading
+import time
+import zlib
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+from loguru import logger
+
+from app.core.config import settings
+from app.core.file_cache import file_cache
+
+
+class HistoryConflict(Exception):
+    """The file changed outside the history since the edit being undone or redone."""
+
+
+class BlobStore:
+    """Content-addressed store of zlib-compressed blobs with reference counts"""
+
+    def __init__(self):
+        self._blobs: Dict[str, bytes] = {}
+        self._refs: Dict[str, int] = {}
+        self.size_bytes = 0
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in self._blobs:
+            compressed = zlib.compress(data, 6)
+            self._blobs[digest] = compressed
+            self.size_bytes += len(compressed)
+        self._refs[digest] = self._refs.get(digest, 0) + 1
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        return zlib.decompress(self._blobs[digest])
+
+    def release(self, digest: Optional[str]):
+        if digest is None:
+            return
+        refs = self._refs.get(digest, 0) - 1
+        if refs > 0:
+            self._refs[digest] = refs
+            return
+        self._refs.pop(digest, None)
+        blob = self._blobs.pop(digest, None)
+        if blob is not None:
+            self.size_bytes -= len(blob)
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._blobs
+
+
+class EditHistory:
+    """
+    Per-project undo/redo history.
+
+    Each edit records the blob hashes of a file before and after the change
+    (None meaning the file did not exist). Undo and redo pop a single entry
+    and rewrite one file, so both are O(1) in the size of the history. Once
+    the compressed blobs exceed `max_bytes`, the oldest edits are retired.
+    """
+
+    def __init__(self, root_path: Union[str, Path], max_bytes: Optional[int] = None):
+        self.root_path = Path(root_path).resolve()
+        self.max_bytes = max_bytes or settings.HISTORY_MAX_BYTES
+        self.blobs = BlobStore()
+        self._undo: deque = deque()
+        self._redo: List[Dict] = []
+        self._versions: Dict[str, deque] = {}
+        self._next_id = 1
+        self._lock = threading.RLock()
+
+    def relative_path(self, file_path: Union[str, Path]) -> Optional[str]:
+        path = Path(file_path)
+        if not path.is_absolute():
+            path = self.root_path / path
+        try:
+            return path.resolve().relative_to(self.root_path).as_posix()
+        except ValueError:
+            return None
+
+    def record(self, file_path: Union[str, Path], before: Optional[bytes], after: Optional[bytes]) -> Optional[Dict]:
+        """
+        Record a change of `file_path` from `before` to `after` content.
+
+        Returns the history entry, or None if nothing changed or the file
+        lies outside the project.
+        """
+        rel_path = self.relative_path(file_path)
+        if rel_path is None or before == after:
+            return None
+
+        with self._lock:
+            entry = {
+                "id": self._next_id,
+                "path": rel_path,
+                "before": self.blobs.put(before) if before is not None else None,
+                "after": self.blobs.put(after) if after is not None else None,
+                "size": len(after) if after is not None else 0,
+                "timestamp": time.time(),
+            }
+            self._next_id += 1
+
+            # A new edit invalidates everything that was undone before it,
+            # newest first (the first entry undone is the newest edit)
+            for undone in self._redo:
+                self._drop_newest(undone)
+            self._redo.clear()
+
+            self._undo.append(entry)
+            self._versions.setdefault(rel_path, deque()).append(entry)
+            self._enforce_retention()
+            return self._describe(entry)
+
+    def undo(self) -> Optional[Dict]:
+        """
+        Revert the most recent edit. Returns the reverted entry. Raises
+        HistoryConflict, changing nothing, if the file no longer holds the
+        content that edit produced.
+        """
+        with self._lock:
+            if not self._undo:
+                return None
+            entry = self._undo[-1]
+            self._check_current(entry["path"], entry["after"])
+            self._undo.pop()
+            self._write(entry["path"], entry["before"])
+            self._redo.append(entry)
+            logger.info(f"Undid edit {entry['id']} on {entry['path']}")
+            return self._describe(entry)
+
+    def redo(self) -> Optional[Dict]:
+        """
+        Re-apply the most recently undone edit. Returns the entry. Raises
+        HistoryConflict if the file changed since it was undone.
+        """
+        with self._lock:
+            if not self._redo:
+                return None
+            entry = self._redo[-1]
+            self._check_current(entry["path"], entry["before"])
+            self._redo.pop()
+            self._write(entry["path"], entry["after"])
+            self._undo.append(entry)
+            logger.info(f"Redid edit {entry['id']} on {entry['path']}")
+            return self._describe(entry)
+
+    def list_versions(self, file_path: Union[str, Path]) -> List[Dict]:
+        """List the retained versions of a file, oldest first."""
+        rel_path = self.relative_path(file_path)
+        with self._lock:
+            entries = self._versions.get(rel_path, ())
+            undone = {entry["id"] for entry in self._redo}
+            return [dict(self._describe(entry), undone=entry["id"] in undone) for entry in entries]
+
+    def get_version(self, digest: str) -> bytes:
+        with self._lock:
+            if digest not in self.blobs:
+                raise KeyError(f"Unknown version: {digest}")
+            return self.blobs.get(digest)
+
+    def restore(self, file_path: Union[str, Path], digest: str) -> Optional[Dict]:
+        """Restore a file to a recorded version. The restore itself is undoable."""
+        rel_path = self.relative_path(file_path)
+        if rel_path is None:
+            raise ValueError(f"Path outside project: {file_path}")
+        with self._lock:
+            content = self.get_version(digest)
+            full_path = self.root_path / rel_path
+            before = full_path.read_bytes() if full_path.exists() else None
+            self._write(rel_path, digest)
+            return self.record(rel_path, before, content)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "root": str(self.root_path),
+                "undo_depth": len(self._undo),
+                "redo_depth": len(self._redo),
+                "files": len(self._versions),
+                "size_bytes": self.blobs.size_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _check_current(self, rel_path: str, expected: Optional[str]):
+        """Raise HistoryConflict unless the file holds the blob `expected` (None: absent)."""
+        full_path = self.root_path / rel_path
+        try:
+            current = hashlib.sha256(full_path.read_bytes()).hexdigest()
+        except FileNotFoundError:
+            current = None
+        if current != expected:
+            raise HistoryConflict(f"{rel_path} was modified outside the edit history")
+
+    def _write(self, rel_path: str, digest: Optional[str]):
+        full_path = self.root_path / rel_path
+        if digest is None:
+            if full_path.exists():
+                full_path.unlink()
+            file_cache.invalidate(full_path)
+            return
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        data = self.blobs.get(digest)
+        full_path.write_bytes(data)
+        file_cache.put(full_path, data)
+
+    def _drop_newest(self, entry: Dict):
+        versions = self._versions.get(entry["path"])
+        if versions and versions[-1] is entry:
+            versions.pop()
+            if not versions:
+                del self._versions[entry["path"]]
+        self._release(entry)
+
+    def _enforce_retention(self):
+        while self.blobs.size_bytes > self.max_bytes and len(self._undo) > 1:
+            entry = self._undo.popleft()
+            versions = self._versions.get(entry["path"])
+            if versions:
+                versions.popleft()
+                if not versions:
+                    del self._versions[entry["path"]]
+            self._release(entry)
+
+    def _release(self, entry: Dict):
+        self.blobs.release(entry["before"])
+        self.blobs.release(entry["after"])
+
+    @staticmethod
+    def _describe(entry: Dict) -> Dict:
+        return {
+            "id": entry["id"],
+            "path": entry["path"],
+            "version": entry["after"],
+            "previous": entry["before"],
+            "size": entry["size"],
+            "timestamp": entry["timestamp"],
+        }
+
+
+# Registry of per-project histories
+_histories: Dict[Path, EditHistory] = {}
+_registry_lock = threading.Lock()
+
+
+def get_history(root_path: Union[str, Path]) -> EditHistory:
+    """Return the history for a project root, creating it on first use."""
+    root = Path(root_path).resolve()
+    with _registry_lock:
+        history = _histories.get(root)
+        if history is None:
+            history = EditHistory(root)
+            _histories[root] = history
+        return history
+
+
+def lookup_history(root_path: Union[str, Path]) -> Optional[EditHistory]:
+    """Return the history of a registered project root, without registering it."""
+    root = Path(root_path).resolve()
+    with _registry_lock:
+        return _histories.get(root)
+
+
+def find_history(file_path: Union[str, Path]) -> Optional[EditHistory]:
+    """Return the history of the innermost registered project containing `file_path`."""
+    path = Path(file_path).resolve()
+    with _registry_lock:
+        for parent in (path, *path.parents):
+            if parent in _histories:
+                return _histories[parent]
+    return None
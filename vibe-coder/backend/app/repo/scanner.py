@@ -1,9 +1,17 @@
 import os
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, TYPE_CHECKING
 import pathspec
 from loguru import logger
 
+from app.core.file_cache import file_cache
+from app.tools.file_sniffer import is_text_file
+
+if TYPE_CHECKING:
+    from app.repo.dependency_graph import DependencyGraph
+    from app.repo.symbols import SymbolIndex
+    from app.repo.trigram_index import TrigramIndex
+
 class RepoScanner:
     SUPPORTED_EXTENSIONS = {
         '.py', '.js', '.ts', '.tsx', '.jsx', '.json', '.md', '.html', '.css',
@@ -41,12 +49,8 @@ class RepoScanner:
         
         return False
 
-    def scan(self) -> List[Dict]:
-        indexed_files = []
-        if not self.root_path.exists():
-            logger.error(f"Root path {self.root_path} does not exist")
-            return []
-
+    def iter_files(self) -> Iterator[Path]:
+        """Paths of the supported, non-ignored files under the root, without reading them."""
         for root, dirs, files in os.walk(self.root_path):
             # Modify dirs in-place to skip ignored directories early
             dirs[:] = [d for d in dirs if not self._should_ignore(Path(root) / d)]
@@ -59,18 +63,44 @@ class RepoScanner:
                 if self._should_ignore(file_path):
                     continue
 
-                try:
-                    # Using errors='ignore' to skip non-utf8 files
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                    
-                    indexed_files.append({
-                        "path": str(file_path.relative_to(self.root_path)),
-                        "content": content,
-                        "size": file_path.stat().st_size
-                    })
-                except Exception as e:
-                    logger.error(f"Error reading {file_path}: {e}")
+                yield file_path
+
+    def scan(self, symbol_index: Optional["SymbolIndex"] = None,
+             dependency_graph: Optional["DependencyGraph"] = None,
+             trigram_index: Optional["TrigramIndex"] = None) -> List[Dict]:
+        """
+        Read all supported text files under the root. Any of `symbol_index`,
+        `dependency_graph` and `trigram_index` given is updated from the
+        files that changed.
+        """
+        indexed_files = []
+        if not self.root_path.exists():
+            logger.error(f"Root path {self.root_path} does not exist")
+            return []
+
+        for file_path in self.iter_files():
+            try:
+                # Skip binaries by sniffing the head instead of reading them in full
+                if not is_text_file(file_path):
+                    continue
+
+                # Using errors='ignore' to skip non-utf8 files
+                data = file_cache.get_bytes(file_path)
+                
+                indexed_files.append({
+                    "path": str(file_path.relative_to(self.root_path)),
+                    "full_path": str(file_path.absolute()),
+                    "content": data.decode('utf-8', errors='ignore'),
+                    "size": len(data)
+                })
+            except Exception as e:
+                logger.error(f"Error reading {file_path}: {e}")
         
         logger.info(f"Scanned {len(indexed_files)} files in {self.root_path}")
+        if symbol_index is not None:
+            symbol_index.sync(indexed_files)
+        if dependency_graph is not None:
+            dependency_graph.sync(indexed_files)
+        if trigram_index is not None:
+            trigram_index.sync(indexed_files)
         return indexed_files
@@ -0,0 +1,339 @@
+"""
+Symbol definition index
+
+Maps function, class, method and type names to the file and line range
+that defines them, so identifiers in a question resolve straight to their
+definitions. Python is parsed with `ast`; JS/TS, Go, Rust and Java use
+line-based patterns with brace matching for the end of each definition.
+
+The index is persisted per project and updated incrementally: only files
+whose mtime or size changed are re-parsed, and files written by this
+process are re-parsed on the next lookup.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from loguru import logger
+
+from app.core.file_cache import file_cache
+from app.core.paths import INDEX_DIR
+
+# Longest definition scanned for its closing brace
+MAX_DEFINITION_LINES = 2000
+
+_JS = [
+    ("function", re.compile(r'^\s*(?:export\s+(?:default\s+)?)?(?:async\s+)?function\s*\*?\s*(?P<name>[A-Za-z_$][\w$]*)')),
+    ("class", re.compile(r'^\s*(?:export\s+(?:default\s+)?)?(?:abstract\s+)?class\s+(?P<name>[A-Za-z_$][\w$]*)')),
+    ("function", re.compile(r'^\s*(?:export\s+)?(?:const|let|var)\s+(?P<name>[A-Za-z_$][\w$]*)\s*(?::[^=]+)?=\s*(?:async\s*)?(?:function\b|\([^)]*\)\s*(?::[^=]+)?=>|[A-Za-z_$][\w$]*\s*=>)')),
+    ("type", re.compile(r'^\s*(?:export\s+)?(?:declare\s+)?(?:interface|type|enum)\s+(?P<name>[A-Za-z_$][\w$]*)')),
+    ("method", re.compile(r'^\s+(?:(?:public|private|protected|static|async|readonly|override|get|set)\s+)*(?P<name>[A-Za-z_$][\w$]*)\s*(?:<[^>]*>)?\([^;]*\)\s*(?::[^{;]+)?\{\s*$')),
+]
+_GO = [
+    ("function", re.compile(r'^func\s+(?:\(\s*\w*\s*\*?(?P<receiver>\w+)[^)]*\)\s*)?(?P<name>\w+)')),
+    ("type", re.compile(r'^type\s+(?P<name>\w+)\b')),
+]
+_RUST = [
+    ("function", re.compile(r'^\s*(?:pub(?:\([^)]*\))?\s+)?(?:(?:async|unsafe|const|extern\s+"[^"]*")\s+)*fn\s+(?P<name>\w+)')),
+    ("type", re.compile(r'^\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait|union|type|mod)\s+(?P<name>\w+)')),
+    ("impl", re.compile(r'^\s*impl(?:<[^>]*>)?\s+(?:[\w:<>, ]+\s+for\s+)?(?P<name>\w+)')),
+]
+_JAVA = [
+    ("class", re.compile(r'^\s*(?:(?:public|private|protected|static|final|abstract|sealed)\s+)*(?:class|interface|enum|record)\s+(?P<name>\w+)')),
+    ("method", re.compile(r'^\s*(?:(?:public|private|protected|static|final|abstract|synchronized|native|default)\s+)+[\w<>\[\],.?\s]+?\s+(?P<name>\w+)\s*\([^)]*\)?\s*(?:throws\s+[\w.,\s]+)?(?:\{.*)?$')),
+]
+
+PATTERNS = {
+    '.js': _JS, '.jsx': _JS, '.ts': _JS, '.tsx': _JS, '.mjs': _JS, '.cjs': _JS,
+    '.go': _GO, '.rs': _RUST, '.java': _JAVA,
+}
+SUPPORTED_EXTENSIONS = set(PATTERNS) | {'.py'}
+
+_KEYWORDS = {"if", "for", "while", "switch", "catch", "function", "return", "else", "new", "do", "try"}
+_CONTAINERS = {"class", "type", "impl"}
+
+# Identifier-like words in a query: dotted names, snake_case, camelCase or calls
+_QUERY_IDENTIFIER = re.compile(r'[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*')
+
+
+def extract_symbols(path: str, content: str) -> List[Dict]:
+    """Definitions in a file: dicts with name, qualname, kind, line and end_line."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.py':
+        try:
+            return _python_symbols(content)
+        except SyntaxError:
+            return []
+    patterns = PATTERNS.get(extension)
+    return _pattern_symbols(content, patterns) if patterns else []
+
+
+def _python_symbols(content: str) -> List[Dict]:
+    symbols = []
+
+    def visit(node: ast.AST, prefix: str, in_class: bool):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                is_class = isinstance(child, ast.ClassDef)
+                kind = "class" if is_class else ("method" if in_class else "function")
+                qualname = f"{prefix}{child.name}"
+                start = min([child.lineno] + [d.lineno for d in child.decorator_list])
+                symbols.append({"name": child.name, "qualname": qualname, "kind": kind,
+                                "line": start, "end_line": child.end_lineno or child.lineno})
+                visit(child, qualname + ".", is_class)
+            elif isinstance(child, (ast.Assign, ast.AnnAssign)) and not prefix:
+                targets = child.targets if isinstance(child, ast.Assign) else [child.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        symbols.append({"name": target.id, "qualname": target.id, "kind": "variable",
+                                        "line": child.lineno, "end_line": child.end_lineno or child.lineno})
+
+    visit(ast.parse(content), "", False)
+    return symbols
+
+
+def _pattern_symbols(content: str, patterns: List[Tuple[str, re.Pattern]]) -> List[Dict]:
+    lines = content.splitlines()
+    found = []
+    for number, line in enumerate(lines, start=1):
+        for kind, pattern in patterns:
+            match = pattern.match(line)
+            # Control flow like `if (x) {` looks like a method definition
+            if not match or (kind == "method" and match.group("name") in _KEYWORDS):
+                continue
+            groups = match.groupdict()
+            symbol = {"name": groups["name"], "qualname": groups["name"], "kind": kind,
+                      "line": number, "end_line": _block_end(lines, number - 1)}
+            if groups.get("receiver"):
+                # Go method: qualify by receiver type
+                symbol["qualname"] = f"{groups['receiver']}.{groups['name']}"
+                symbol["kind"] = "method"
+            found.append(symbol)
+            break
+
+    # Qualify members by their innermost enclosing class/type/impl
+    containers = [s for s in found if s["kind"] in _CONTAINERS]
+    for symbol in found:
+        if symbol["qualname"] != symbol["name"] or symbol["kind"] in _CONTAINERS:
+            continue
+        enclosing = [c for c in containers if c["line"] < symbol["line"] <= c["end_line"]]
+        if enclosing:
+            owner = max(enclosing, key=lambda c: c["line"])
+            symbol["qualname"] = f"{owner['name']}.{symbol['name']}"
+            if symbol["kind"] == "function":
+                symbol["kind"] = "method"
+    return [s for s in found if s["kind"] != "impl"]
+
+
+def _block_end(lines: List[str], start: int) -> int:
+    """Line (1-based) of the brace closing the block opened at or after `start`."""
+    depth = 0
+    opened = False
+    for index in range(start, min(start + MAX_DEFINITION_LINES, len(lines))):
+        line = lines[index]
+        quote = None
+        i = 0
+        while i < len(line):
+            char = line[i]
+            if quote:
+                if char == "\\":
+                    i += 1
+                elif char == quote:
+                    quote = None
+            elif char in "\"'`":
+                quote = char
+            elif line.startswith("//", i):
+                break
+            elif char == "{":
+                depth += 1
+                opened = True
+            elif char == "}":
+                depth -= 1
+                if opened and depth <= 0:
+                    return index + 1
+            elif char == ";" and not opened:
+                # Declaration without a body
+                return index + 1
+            i += 1
+        if not opened and index > start + 2:
+            break
+    return start + 1
+
+
+class SymbolIndex:
+    def __init__(self, root_path: Union[str, Path], index_path: Optional[Union[str, Path]] = None):
+        self.root_path = Path(root_path).resolve()
+        digest = hashlib.sha1(str(self.root_path).encode("utf-8")).hexdigest()[:16]
+        self.index_path = Path(index_path) if index_path else INDEX_DIR / digest / "symbols.json"
+        self._lock = threading.RLock()
+        # rel_path -> {"mtime_ns", "size", "symbols"}
+        self._files: Dict[str, Dict] = {}
+        self._by_name: Dict[str, List[Tuple[str, Dict]]] = {}
+        self._dirty = set()
+        self._load()
+        file_cache.add_listener(self._mark_dirty)
+
+    def sync(self, documents: Iterable[Dict]) -> Dict:
+        """
+        Bring the index up to date with scanned documents ('path' relative to
+        the root, 'content'); unchanged files are skipped, missing ones dropped.
+        """
+        parsed = 0
+        seen = set()
+        with self._lock:
+            for doc in documents:
+                rel_path = Path(doc["path"]).as_posix()
+                seen.add(rel_path)
+                if os.path.splitext(rel_path)[1].lower() not in SUPPORTED_EXTENSIONS:
+                    continue
+                stat = self._stat(rel_path)
+                record = self._files.get(rel_path)
+                if stat and record and (record["mtime_ns"], record["size"]) == stat:
+                    continue
+                self._index_file(rel_path, doc["content"], stat)
+                parsed += 1
+            for rel_path in [p for p in self._files if p not in seen]:
+                self._remove_file(rel_path)
+            self.save()
+        logger.info(f"Symbol index: parsed {parsed} files, {len(self._by_name)} names in {self.root_path}")
+        return {"parsed": parsed, "files": len(self._files), "names": len(self._by_name)}
+
+    def update_file(self, rel_path: str):
+        """Re-parse one file from disk (or drop it if it no longer exists)."""
+        full_path = self.root_path / rel_path
+        with self._lock:
+            if not full_path.is_file():
+                self._remove_file(rel_path)
+                return
+            try:
+                content = file_cache.get_text(full_path, errors="ignore")
+            except OSError:
+                return
+            self._index_file(rel_path, content, self._stat(rel_path))
+
+    def lookup(self, name: str) -> List[Dict]:
+        """Definitions of `name`, matched by qualified name first, then by bare name."""
+        self._refresh()
+        with self._lock:
+            matches = self._by_name.get(name) or self._by_name.get(name.rsplit(".", 1)[-1], [])
+            if "." in name:
+                exact = [(p, s) for p, s in matches if s["qualname"] == name or s["qualname"].endswith("." + name)]
+                matches = exact or matches
+            return [dict(symbol, path=path) for path, symbol in matches]
+
+    def resolve_query(self, query: str, limit: int = 5) -> List[Dict]:
+        """Definitions of the identifiers mentioned in a free-text query."""
+        results, seen = [], set()
+        for match in _QUERY_IDENTIFIER.finditer(query):
+            word = match.group(0)
+            if not self._looks_like_identifier(word, query, match.end()):
+                continue
+            for symbol in self.lookup(word):
+                key = (symbol["path"], symbol["line"])
+                if key not in seen:
+                    seen.add(key)
+                    results.append(symbol)
+                if len(results) >= limit:
+                    return results
+        return results
+
+    def save(self):
+        with self._lock:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps({"root": str(self.root_path), "files": self._files}))
+            os.replace(tmp_path, self.index_path)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"root": str(self.root_path), "files": len(self._files), "names": len(self._by_name)}
+
+    def _load(self):
+        if not self.index_path.exists():
+            return
+        try:
+            data = json.loads(self.index_path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable symbol index {self.index_path}: {e}")
+            return
+        for rel_path, record in data.get("files", {}).items():
+            self._files[rel_path] = record
+            self._add_names(rel_path, record["symbols"])
+
+    def _index_file(self, rel_path: str, content: str, stat: Optional[Tuple[int, int]]):
+        self._remove_file(rel_path)
+        symbols = extract_symbols(rel_path, content)
+        mtime_ns, size = stat or (0, 0)
+        self._files[rel_path] = {"mtime_ns": mtime_ns, "size": size, "symbols": symbols}
+        self._add_names(rel_path, symbols)
+
+    def _add_names(self, rel_path: str, symbols: List[Dict]):
+        for symbol in symbols:
+            names = {symbol["name"], symbol["qualname"]}
+            for name in names:
+                self._by_name.setdefault(name, []).append((rel_path, symbol))
+
+    def _remove_file(self, rel_path: str):
+        record = self._files.pop(rel_path, None)
+        if record is None:
+            return
+        for symbol in record["symbols"]:
+            for name in {symbol["name"], symbol["qualname"]}:
+                entries = [e for e in self._by_name.get(name, []) if e[0] != rel_path]
+                if entries:
+                    self._by_name[name] = entries
+                else:
+                    self._by_name.pop(name, None)
+
+    def _stat(self, rel_path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.root_path / rel_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _mark_dirty(self, path: str):
+        try:
+            rel_path = Path(path).relative_to(self.root_path).as_posix()
+        except ValueError:
+            return
+        if os.path.splitext(rel_path)[1].lower() in SUPPORTED_EXTENSIONS:
+            with self._lock:
+                self._dirty.add(rel_path)
+
+    def _refresh(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            for rel_path in dirty:
+                self.update_file(rel_path)
+
+    @staticmethod
+    def _looks_like_identifier(word: str, query: str, end: int) -> bool:
+        if len(word) < 3:
+            return False
+        if "." in word or "_" in word or "$" in word:
+            return True
+        if any(c.isupper() for c in word[1:]):
+            return True
+        # Backticked or called: `scan` or scan()
+        return query[end:end + 1] in ("`", "(")
+
+
+_indexes: Dict[Path, SymbolIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def get_symbol_index(root_path: Union[str, Path]) -> SymbolIndex:
+    """Return the symbol index for a project root, loading it on first use."""
+    root = Path(root_path).resolve()
+    with _registry_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = SymbolIndex(root)
+            _indexes[root] = index
+        return index
@@ -0,0 +1,421 @@
+"""
+Trigram index for literal and regex code search.
+
+Every indexed file is reduced to the set of byte trigrams in its
+ASCII-lowercased content. A query is turned into the trigrams any match
+must contain, the posting lists narrow the project down to the candidate
+files, and only those are searched for real (through the shared file
+cache), so results are always exact.
+
+Posting lists live in three numpy arrays (sorted trigram keys, offsets and
+file ids) that are saved per project. Files changed since the arrays were
+built are kept as a small pending set and merged in bulk. Writes made in
+this process are picked up by the next search; changes made by anything
+else (editors, git, build tools) are found by a background thread that
+rechecks the project on disk every RESCAN_INTERVAL seconds, so searches
+never walk the project themselves.
+"""
+
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+import numpy as np
+from loguru import logger
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+from app.core.file_cache import file_cache
+from app.core.paths import INDEX_DIR
+from app.repo.scanner import RepoScanner
+from app.tools.file_sniffer import is_text_file
+
+# Pending files merged into the posting arrays once there are this many
+MERGE_THRESHOLD = 256
+
+# The project on disk is rechecked for outside changes this often (seconds)
+RESCAN_INTERVAL = 2.0
+
+# Matched lines are cut to this many characters in results
+MAX_LINE_CHARS = 500
+
+_EMPTY = np.zeros(0, dtype=np.uint32)
+
+
+def trigrams(data: bytes) -> np.ndarray:
+    """Sorted unique trigrams of ASCII-lowercased `data`, packed into uint32."""
+    if len(data) < 3:
+        return _EMPTY
+    a = np.frombuffer(data.lower(), dtype=np.uint8).astype(np.uint32)
+    grams = np.sort((a[:-2] << 16) | (a[1:-1] << 8) | a[2:])
+    return grams[np.r_[True, grams[1:] != grams[:-1]]]
+
+
+def _literal_runs(text: str, case_sensitive: bool) -> List[str]:
+    """
+    Pieces of a literal usable for lookup. Only ASCII is case-folded in the
+    index, so case-insensitive queries cannot rely on other characters.
+    """
+    if case_sensitive:
+        return [text]
+    return [run for run in re.split(r'[^\x00-\x7f]+', text) if run]
+
+
+def _regex_literals(items, case_sensitive: bool) -> List[str]:
+    """Literal strings every match of a parsed regex sequence must contain."""
+    literals, run = [], []
+
+    def flush():
+        if run:
+            literals.extend(_literal_runs("".join(run), case_sensitive))
+            run.clear()
+
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+        elif op is sre_constants.AT:
+            # Anchors consume nothing, so the literal run continues
+            continue
+        elif op is sre_constants.SUBPATTERN:
+            flush()
+            literals.extend(_regex_literals(av[-1], case_sensitive))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            flush()
+            if av[0] >= 1:
+                literals.extend(_regex_literals(av[2], case_sensitive))
+        else:
+            flush()
+    flush()
+    return [lit for lit in literals if len(lit.encode("utf-8")) >= 3]
+
+
+def query_plan(query: str, regex: bool = False, case_sensitive: bool = False) -> Optional[List[List[str]]]:
+    """
+    Alternatives of required literals for a query: a file can match only if
+    it contains every literal of at least one alternative. None means the
+    query cannot be narrowed down and every file is a candidate.
+    """
+    if not regex:
+        literals = [lit for lit in _literal_runs(query, case_sensitive) if len(lit.encode("utf-8")) >= 3]
+        return [literals] if literals else None
+    parsed = sre_parse.parse(query, 0 if case_sensitive else re.IGNORECASE)
+    items = list(parsed)
+    if len(items) == 1 and items[0][0] is sre_constants.BRANCH:
+        alternatives = [_regex_literals(branch, case_sensitive) for branch in items[0][1][1]]
+        return None if any(not alt for alt in alternatives) else alternatives
+    literals = _regex_literals(items, case_sensitive)
+    return [literals] if literals else None
+
+
+class TrigramIndex:
+    def __init__(self, root_path: Union[str, Path], index_path: Optional[Union[str, Path]] = None):
+        self.root_path = Path(root_path).resolve()
+        digest = hashlib.sha1(str(self.root_path).encode("utf-8")).hexdigest()[:16]
+        self.index_path = Path(index_path) if index_path else INDEX_DIR / digest / "trigrams"
+        self._lock = threading.RLock()
+        # rel_path -> {"id", "mtime_ns", "size"}; ids of replaced files go dead
+        self._files: Dict[str, Dict] = {}
+        self._paths: Dict[int, str] = {}
+        self._next_id = 0
+        self._keys = _EMPTY
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._ids = _EMPTY
+        self._dead: Set[int] = set()
+        # Files indexed since the posting arrays were built: id -> trigrams
+        self._pending: Dict[int, np.ndarray] = {}
+        self._dirty: Set[str] = set()
+        self._load()
+        file_cache.add_listener(self._mark_dirty)
+        self._closed = threading.Event()
+        self._rescanner = threading.Thread(target=self._rescan_loop, name="trigram-rescan", daemon=True)
+        self._rescanner.start()
+
+    def sync(self, documents: Iterable[Dict]) -> Dict:
+        """Bring the index up to date with scanned documents ('path' relative to the root, 'content')."""
+        indexed = 0
+        seen = set()
+        with self._lock:
+            for doc in documents:
+                rel_path = Path(doc["path"]).as_posix()
+                seen.add(rel_path)
+                stat = self._stat(rel_path)
+                record = self._files.get(rel_path)
+                if stat and record and (record["mtime_ns"], record["size"]) == stat:
+                    continue
+                self._index_file(rel_path, doc["content"].encode("utf-8"), stat)
+                indexed += 1
+            for rel_path in [p for p in self._files if p not in seen]:
+                self._remove_file(rel_path)
+            self._merge()
+            self.save()
+        logger.info(f"Trigram index: indexed {indexed} files, {len(self._files)} files in {self.root_path}")
+        return {"indexed": indexed, "files": len(self._files)}
+
+    def update_file(self, rel_path: str):
+        """Re-index one file from disk (or drop it if it no longer exists)."""
+        full_path = self.root_path / rel_path
+        with self._lock:
+            if not full_path.is_file():
+                self._remove_file(rel_path)
+                return
+            try:
+                data = file_cache.get_bytes(full_path)
+            except OSError:
+                return
+            self._index_file(rel_path, data, self._stat(rel_path))
+            if len(self._pending) >= MERGE_THRESHOLD:
+                self._merge()
+
+    def candidates(self, plan: Optional[List[List[str]]]) -> List[str]:
+        """Paths of the files that may match a query plan (see `query_plan`)."""
+        self._refresh()
+        with self._lock:
+            if plan is None:
+                return sorted(self._files)
+            ids: Set[int] = set()
+            for literals in plan:
+                ids.update(self._candidate_ids(literals))
+            return sorted(self._paths[i] for i in ids if i in self._paths)
+
+    def search(self, query: str, regex: bool = False, case_sensitive: bool = False,
+               glob: Optional[str] = None, extensions: Optional[List[str]] = None,
+               offset: int = 0, limit: int = 50) -> Dict:
+        """
+        Matching lines, ordered by path and line number. Results are paged by
+        `offset`/`limit`; `next_offset` is None on the last page.
+        """
+        started = time.perf_counter()
+        flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+        pattern = re.compile(query if regex else re.escape(query), flags)
+        paths = self.candidates(query_plan(query, regex, case_sensitive))
+        candidate_count = len(paths)
+        if extensions:
+            wanted = {e if e.startswith(".") else f".{e}" for e in (x.lower() for x in extensions)}
+            paths = [p for p in paths if os.path.splitext(p)[1].lower() in wanted]
+        if glob:
+            paths = [p for p in paths if fnmatch.fnmatch(p, glob) or p.startswith(glob.rstrip("/") + "/")]
+
+        results, skipped, searched, more = [], 0, 0, False
+        for rel_path in paths:
+            try:
+                content = file_cache.get_text(self.root_path / rel_path, errors="ignore")
+            except OSError:
+                continue
+            searched += 1
+            for line, column, text in self._matching_lines(pattern, content):
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                if len(results) >= limit:
+                    more = True
+                    break
+                results.append({"path": rel_path, "line": line, "column": column, "text": text})
+            if more:
+                break
+        return {
+            "results": results,
+            "next_offset": offset + len(results) if more else None,
+            "candidates": candidate_count,
+            "files_searched": searched,
+            "took_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    def close(self):
+        """Stop watching the project for outside changes."""
+        file_cache.remove_listener(self._mark_dirty)
+        self._closed.set()
+        self._rescanner.join(timeout=5)
+
+    def save(self):
+        with self._lock:
+            self._merge()
+            self.index_path.mkdir(parents=True, exist_ok=True)
+            for name in ("keys", "offsets", "ids"):
+                np.save(self.index_path / f"{name}.tmp.npy", getattr(self, f"_{name}"))
+            (self.index_path / "files.tmp.json").write_text(json.dumps({"root": str(self.root_path), "files": self._files}))
+            for name in ("keys.npy", "offsets.npy", "ids.npy", "files.json"):
+                stem, suffix = name.split(".")
+                os.replace(self.index_path / f"{stem}.tmp.{suffix}", self.index_path / name)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "root": str(self.root_path),
+                "files": len(self._files),
+                "trigrams": len(self._keys),
+                "postings": len(self._ids),
+                "pending": len(self._pending),
+                "bytes": self._keys.nbytes + self._offsets.nbytes + self._ids.nbytes,
+            }
+
+    def _load(self):
+        if not (self.index_path / "files.json").exists():
+            return
+        try:
+            files = json.loads((self.index_path / "files.json").read_text())["files"]
+            keys, offsets, ids = (np.load(self.index_path / f"{name}.npy") for name in ("keys", "offsets", "ids"))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable trigram index {self.index_path}: {e}")
+            return
+        self._files = files
+        self._paths = {record["id"]: rel_path for rel_path, record in files.items()}
+        self._next_id = max(self._paths, default=-1) + 1
+        self._keys, self._offsets, self._ids = keys, offsets, ids
+
+    def _index_file(self, rel_path: str, data: bytes, stat: Optional[Tuple[int, int]]):
+        self._remove_file(rel_path)
+        file_id = self._next_id
+        self._next_id += 1
+        mtime_ns, size = stat or (0, 0)
+        self._files[rel_path] = {"id": file_id, "mtime_ns": mtime_ns, "size": size}
+        self._paths[file_id] = rel_path
+        self._pending[file_id] = trigrams(data)
+
+    def _remove_file(self, rel_path: str):
+        record = self._files.pop(rel_path, None)
+        if record is None:
+            return
+        file_id = record["id"]
+        del self._paths[file_id]
+        if self._pending.pop(file_id, None) is None:
+            self._dead.add(file_id)
+
+    def _merge(self):
+        """Fold pending files into the posting arrays and drop dead ids."""
+        if not self._pending and not self._dead:
+            return
+        counts = np.diff(self._offsets)
+        keys = [np.repeat(self._keys, counts)]
+        ids = [self._ids]
+        for file_id, grams in self._pending.items():
+            keys.append(grams)
+            ids.append(np.full(len(grams), file_id, dtype=np.uint32))
+        keys, ids = np.concatenate(keys), np.concatenate(ids)
+        if self._dead:
+            live = ~np.isin(ids, np.fromiter(self._dead, dtype=np.uint32))
+            keys, ids = keys[live], ids[live]
+        # Sorting (trigram, id) packed into one uint64 is far cheaper than a lexsort
+        packed = np.sort((keys.astype(np.uint64) << np.uint64(32)) | ids.astype(np.uint64))
+        keys = (packed >> np.uint64(32)).astype(np.uint32)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.zeros(0, dtype=np.int64)
+        self._keys = keys[starts]
+        self._offsets = np.append(starts, len(keys)).astype(np.int64)
+        self._ids = (packed & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+        self._pending.clear()
+        self._dead.clear()
+
+    def _candidate_ids(self, literals: List[str]) -> Set[int]:
+        grams = np.unique(np.concatenate([trigrams(lit.encode("utf-8")) for lit in literals]))
+        positions = np.searchsorted(self._keys, grams)
+        found = positions < len(self._keys)
+        found[found] = self._keys[positions[found]] == grams[found]
+        ids: Optional[np.ndarray] = None
+        if found.all():
+            # Intersect the shortest posting lists first
+            spans = sorted(((self._offsets[p], self._offsets[p + 1]) for p in positions), key=lambda s: s[1] - s[0])
+            for start, end in spans:
+                postings = self._ids[start:end]
+                ids = postings if ids is None else np.intersect1d(ids, postings, assume_unique=True)
+                if not len(ids):
+                    break
+        result = set() if ids is None else set(ids.tolist()) - self._dead
+        for file_id, file_grams in self._pending.items():
+            if np.isin(grams, file_grams, assume_unique=True).all():
+                result.add(file_id)
+        return result
+
+    @staticmethod
+    def _matching_lines(pattern: re.Pattern, content: str):
+        """(line number, column, line text) for each line with a match."""
+        line, line_start, last_line = 1, 0, 0
+        for match in pattern.finditer(content):
+            start = match.start()
+            line += content.count("\n", line_start, start)
+            line_start = content.rfind("\n", 0, start) + 1
+            if line == last_line:
+                continue
+            last_line = line
+            line_end = content.find("\n", start)
+            text = content[line_start:line_end if line_end != -1 else len(content)]
+            yield line, start - line_start + 1, text.rstrip("\r")[:MAX_LINE_CHARS]
+
+    def _stat(self, rel_path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.root_path / rel_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _mark_dirty(self, path: str):
+        try:
+            rel_path = Path(path).relative_to(self.root_path).as_posix()
+        except ValueError:
+            return
+        with self._lock:
+            if rel_path in self._files or os.path.splitext(rel_path)[1] in RepoScanner.SUPPORTED_EXTENSIONS:
+                self._dirty.add(rel_path)
+
+    def _refresh(self):
+        """Re-index the files written in this process since the last search."""
+        if not self._dirty:
+            return
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            for rel_path in dirty:
+                self.update_file(rel_path)
+
+    def _rescan_loop(self):
+        while not self._closed.wait(RESCAN_INTERVAL):
+            try:
+                changed = self._check_disk()
+                # One file at a time, so searches are not held up behind a large change
+                for rel_path in changed:
+                    self.update_file(rel_path)
+            except Exception as e:
+                logger.error(f"Trigram rescan of {self.root_path} failed: {e}")
+
+    def _check_disk(self) -> Set[str]:
+        """Files that were edited, created or deleted on disk since they were indexed."""
+        if not self._files:
+            # Never indexed: the first search scans the whole project
+            return set()
+        on_disk = {}
+        for file_path in RepoScanner(str(self.root_path)).iter_files():
+            rel_path = file_path.relative_to(self.root_path).as_posix()
+            on_disk[rel_path] = self._stat(rel_path)
+        with self._lock:
+            indexed = {rel_path: (record["mtime_ns"], record["size"]) for rel_path, record in self._files.items()}
+        changed = {rel_path for rel_path in indexed if rel_path not in on_disk}
+        for rel_path, stat in on_disk.items():
+            if rel_path not in indexed:
+                # New files are indexed only if the scanner would index them
+                if stat and is_text_file(self.root_path / rel_path):
+                    changed.add(rel_path)
+            elif indexed[rel_path] != stat:
+                changed.add(rel_path)
+        return changed
+
+
+_indexes: Dict[Path, TrigramIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def get_trigram_index(root_path: Union[str, Path]) -> TrigramIndex:
+    """Return the trigram index for a project root, loading it on first use."""
+    root = Path(root_path).resolve()
+    with _registry_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = TrigramIndex(root)
+            _indexes[root] = index
+        return index
@@ -1,17 +1,145 @@
-from app.ai_engine.llm_manager import LLMManager
-from app.ai_engine.prompt_builder import PromptBuilder
-from app.repo.context_builder import ContextBuilder
-from app.ai_engine.embeddings import EmbeddingManager
+"""
+Lazily constructed AI services.
+
+Heavy dependencies (langchain, faiss, sentence-transformers and the embedding
+model itself) are imported and built the first time a service is used, or
+ahead of time by `container.warmup()` once the server is accepting
+connections. Each service is built at most once; the time it took is kept
+for the startup profile.
+
+With INDEX_SERVICE_SOCKET set, the model and indexes live in a separate
+index service process and `index_service` is a client for it.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, List, Optional
 from loguru import logger
 
-# Initialize Singletons
-logger.info("Initializing AI Services...")
-try:
-    llm_manager = LLMManager()
-    prompt_builder = PromptBuilder()
-    embedding_manager = EmbeddingManager()
-    context_builder = ContextBuilder(embedding_manager)
-    logger.info("AI Services Initialized successfully.")
-except Exception as e:
-    logger.error(f"Failed to initialize services: {e}")
-    raise e
+from app.core.config import settings
+
+
+def _llm_manager(container: "ServiceContainer"):
+    from app.ai_engine.llm_manager import LLMManager
+    return LLMManager()
+
+
+def _prompt_builder(container: "ServiceContainer"):
+    from app.ai_engine.prompt_builder import PromptBuilder
+    return PromptBuilder()
+
+
+def _embedding_manager(container: "ServiceContainer"):
+    from app.ai_engine.embeddings import EmbeddingManager
+    return EmbeddingManager()
+
+
+def _context_builder(container: "ServiceContainer"):
+    from app.repo.context_builder import ContextBuilder
+    return ContextBuilder(container.embedding_manager)
+
+
+def _index_service(container: "ServiceContainer"):
+    if settings.INDEX_SERVICE_SOCKET:
+        from app.index_service.client import IndexClient
+        client = IndexClient()
+        # Fail (and stay not-ready) until the service process is reachable
+        client.call("ping")
+        return client
+    from app.index_service.service import IndexService
+    return IndexService(container)
+
+
+# Services that hold the model and indexes: built here, or only inside the
+# index service process when INDEX_SERVICE_SOCKET is set
+LOCAL_INDEX_FACTORIES = {
+    "embedding_manager": _embedding_manager,
+    "context_builder": _context_builder,
+}
+
+
+class ServiceContainer:
+    def __init__(self, factories: Dict[str, Callable[["ServiceContainer"], object]]):
+        self._factories = factories
+        self._instances: Dict[str, object] = {}
+        self._locks = {name: threading.Lock() for name in factories}
+        self.errors: Dict[str, str] = {}
+        self.profile: Dict[str, float] = {}
+        self.warmup_started: Optional[float] = None
+        self.warmup_finished: Optional[float] = None
+
+    def __getattr__(self, name: str):
+        factories = self.__dict__.get("_factories", {})
+        if name in factories:
+            return self.get(name)
+        raise AttributeError(name)
+
+    def get(self, name: str):
+        """Return a service, constructing it on first use."""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._locks[name]:
+            if name not in self._instances:
+                started = time.perf_counter()
+                try:
+                    self._instances[name] = self._factories[name](self)
+                except Exception as e:
+                    self.errors[name] = str(e)
+                    logger.error(f"Failed to initialize {name}: {e}")
+                    raise
+                self.errors.pop(name, None)
+                self.record(name, time.perf_counter() - started)
+                logger.info(f"Initialized {name} in {self.profile[name]:.2f}s")
+        return self._instances[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def record(self, phase: str, seconds: float):
+        self.profile[phase] = round(seconds, 3)
+
+    async def warmup(self, names: Optional[List[str]] = None):
+        """Construct services in worker threads without blocking the event loop."""
+        self.warmup_started = time.perf_counter()
+        for name in names or list(self._factories):
+            try:
+                await asyncio.to_thread(self.get, name)
+            except Exception:
+                # Logged by get(); the service is retried on first use
+                pass
+        self.warmup_finished = time.perf_counter()
+        self.record("warmup", self.warmup_finished - self.warmup_started)
+        logger.info("Startup profile: " + ", ".join(f"{k}={v:.2f}s" for k, v in self.profile.items()))
+
+    @property
+    def ready(self) -> bool:
+        return all(name in self._instances for name in self._factories)
+
+    def status(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "warming_up": self.warmup_started is not None and self.warmup_finished is None,
+            "services": {
+                name: "loaded" if name in self._instances else ("failed" if name in self.errors else "pending")
+                for name in self._factories
+            },
+            "errors": dict(self.errors),
+            "profile": dict(self.profile),
+        }
+
+
+container = ServiceContainer(dict(
+    {} if settings.INDEX_SERVICE_SOCKET else LOCAL_INDEX_FACTORIES,
+    llm_manager=_llm_manager,
+    prompt_builder=_prompt_builder,
+    index_service=_index_service,
+))
+
+
+def __getattr__(name: str):
+    # `from app.services import llm_manager` keeps working (it constructs the service)
+    if name in container._factories:
+        return container.get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,27 +1,259 @@
 import subprocess
 import asyncio
-from typing import Tuple
+import codecs
+import os
+import signal
+import time
+from collections import deque
+from typing import AsyncGenerator, Dict, Optional, Set, Tuple
 from loguru import logger
 
+from app.core.config import settings
+from app.terminal.scheduler import CommandScheduler, ResourceLimits, command_scheduler
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class OutputBuffer:
+    """
+    Ring buffer that keeps only the last `max_bytes` of a stream.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._chunks: deque = deque()
+        self._size = 0
+
+    def append(self, data: bytes):
+        self.total_bytes += len(data)
+        self._chunks.append(data)
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            excess = self._size - self.max_bytes
+            head = self._chunks[0]
+            if len(head) <= excess:
+                self._chunks.popleft()
+                self._size -= len(head)
+            else:
+                self._chunks[0] = head[excess:]
+                self._size -= excess
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > self._size
+
+    def getvalue(self) -> bytes:
+        return b"".join(self._chunks)
+
+
 class TerminalExecutor:
-    async def run_command(self, command: str, cwd: str = ".") -> Tuple[str, str, int]:
+    def __init__(self, timeout: Optional[float] = None, max_output_bytes: Optional[int] = None,
+                 scheduler: Optional[CommandScheduler] = None):
+        self.timeout = timeout or settings.TERMINAL_TIMEOUT
+        self.max_output_bytes = max_output_bytes or settings.TERMINAL_MAX_OUTPUT_BYTES
+        self.scheduler = scheduler or command_scheduler
+        self._processes: Dict[str, asyncio.subprocess.Process] = {}
+        # Streamed commands still waiting for a scheduler slot, and runs asked to stop
+        self._waiting: Dict[str, asyncio.Task] = {}
+        self._cancelled: Set[str] = set()
+
+    async def run_command(self, command: str, cwd: str = ".", timeout: Optional[float] = None,
+                          max_output_bytes: Optional[int] = None, priority: str = "interactive",
+                          project: Optional[str] = None, limits: Optional[ResourceLimits] = None) -> Tuple[str, str, int]:
         """
         Executes a shell command and returns (stdout, stderr, return_code).
+
+        Only the last `max_output_bytes` of each stream are kept. A command
+        running longer than `timeout` seconds is killed. The command waits for
+        a scheduler slot for its project and priority before it starts.
         """
-        logger.info(f"Executing command: {command} in {cwd}")
+        limit = max_output_bytes or self.max_output_bytes
+        buffers = {"stdout": OutputBuffer(limit), "stderr": OutputBuffer(limit)}
+        result = {"return_code": -1, "timed_out": False}
         try:
-            process = await asyncio.create_subprocess_shell(
-                command,
-                cwd=cwd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-            
-            stdout_decoded = stdout.decode().strip()
-            stderr_decoded = stderr.decode().strip()
-            
-            return stdout_decoded, stderr_decoded, process.returncode
+            async for stream, data in self._stream(command, cwd, timeout, priority=priority,
+                                                   project=project, limits=limits):
+                if stream == "exit":
+                    result = data
+                else:
+                    buffers[stream].append(data)
         except Exception as e:
             logger.error(f"Command execution error: {e}")
             return "", str(e), -1
+
+        stdout_decoded = self._decode_tail(buffers["stdout"])
+        stderr_decoded = self._decode_tail(buffers["stderr"])
+        if result["timed_out"]:
+            stderr_decoded += f"\n[Command timed out after {timeout or self.timeout}s]"
+
+        return stdout_decoded, stderr_decoded.strip(), result["return_code"]
+
+    async def stream_command(self, command: str, cwd: str = ".", timeout: Optional[float] = None,
+                             run_id: Optional[str] = None, priority: str = "interactive",
+                             project: Optional[str] = None,
+                             limits: Optional[ResourceLimits] = None) -> AsyncGenerator[Dict, None]:
+        """
+        Executes a shell command and yields its output incrementally.
+
+        Events are dicts: {"type": "stdout"|"stderr", "data": str} while the
+        command runs, then {"type": "exit", "return_code", "timed_out",
+        "cancelled", "duration"}. The reader pauses while the consumer is busy, so a slow
+        client applies backpressure to the process instead of growing memory.
+        """
+        decoders = {
+            "stdout": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+            "stderr": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+        }
+        try:
+            async for stream, data in self._stream(command, cwd, timeout, run_id, priority=priority,
+                                                   project=project, limits=limits):
+                if stream == "exit":
+                    yield dict(data, type="exit")
+                    continue
+                text = decoders[stream].decode(data)
+                if text:
+                    yield {"type": stream, "data": text}
+        except Exception as e:
+            logger.error(f"Command execution error: {e}")
+            yield {"type": "stderr", "data": str(e)}
+            yield {"type": "exit", "return_code": -1, "timed_out": False, "duration": 0.0}
+
+    async def cancel(self, run_id: str) -> bool:
+        """
+        Kills the process group of a running streamed command, or drops it
+        from the scheduler queue if it has not started yet.
+        """
+        waiting = self._waiting.get(run_id)
+        process = self._processes.get(run_id)
+        if waiting is None and (process is None or process.returncode is not None):
+            return False
+        logger.info(f"Cancelling command {run_id}")
+        # Also covers a command granted its slot but not yet spawned
+        self._cancelled.add(run_id)
+        if waiting is not None:
+            waiting.cancel()
+        if process is not None:
+            self._kill(process)
+        return True
+
+    async def _stream(self, command: str, cwd: str, timeout: Optional[float],
+                      run_id: Optional[str] = None, priority: str = "interactive",
+                      project: Optional[str] = None,
+                      limits: Optional[ResourceLimits] = None) -> AsyncGenerator[Tuple[str, object], None]:
+        project = project or os.path.abspath(cwd)
+        limits = limits or ResourceLimits.for_priority(priority)
+        slot = self.scheduler.slot(project, priority)
+        # The wait runs as its own task, so cancel() can abort it
+        enter = asyncio.ensure_future(slot.__aenter__())
+        if run_id:
+            self._waiting[run_id] = enter
+        started = time.monotonic()
+        try:
+            try:
+                waited = await enter
+            except asyncio.CancelledError:
+                if enter.done() and not enter.cancelled():
+                    # Granted just as the wait was interrupted; hand the slot on
+                    await slot.__aexit__(None, None, None)
+                if run_id not in self._cancelled:
+                    raise
+                yield "exit", {"return_code": -1, "timed_out": False, "cancelled": True, "duration": 0.0,
+                               "queue_wait": round(time.monotonic() - started, 3)}
+                return
+            finally:
+                if run_id:
+                    self._waiting.pop(run_id, None)
+
+            try:
+                async for event in self._spawn(command, cwd, timeout, run_id, limits):
+                    if event[0] == "exit":
+                        event[1]["queue_wait"] = round(waited, 3)
+                    yield event
+            finally:
+                await slot.__aexit__(None, None, None)
+        finally:
+            self._cancelled.discard(run_id)
+
+    async def _spawn(self, command: str, cwd: str, timeout: Optional[float], run_id: Optional[str],
+                     limits: ResourceLimits) -> AsyncGenerator[Tuple[str, object], None]:
+        logger.info(f"Executing command: {command} in {cwd}")
+        timeout = timeout or self.timeout
+        started = time.monotonic()
+        process = await asyncio.create_subprocess_shell(
+            command,
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            # Own process group, so the whole tree can be killed on cancel
+            start_new_session=True,
+            preexec_fn=limits.preexec_fn(),
+        )
+        if run_id:
+            self._processes[run_id] = process
+            if run_id in self._cancelled:
+                self._kill(process)
+
+        # Bounded queue: readers stop draining the pipes while it is full
+        queue: asyncio.Queue = asyncio.Queue(maxsize=16)
+
+        async def pump(name: str, reader: asyncio.StreamReader):
+            while True:
+                chunk = await reader.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                await queue.put((name, chunk))
+            await queue.put((name, None))
+
+        readers = [
+            asyncio.create_task(pump("stdout", process.stdout)),
+            asyncio.create_task(pump("stderr", process.stderr)),
+        ]
+        timed_out = False
+        try:
+            open_streams = len(readers)
+            while open_streams:
+                remaining = timeout - (time.monotonic() - started)
+                try:
+                    name, chunk = await asyncio.wait_for(queue.get(), max(remaining, 0))
+                except asyncio.TimeoutError:
+                    logger.warning(f"Command timed out after {timeout}s: {command}")
+                    timed_out = True
+                    self._kill(process)
+                    break
+                if chunk is None:
+                    open_streams -= 1
+                    continue
+                yield name, chunk
+
+            await process.wait()
+            yield "exit", {
+                "return_code": process.returncode,
+                "timed_out": timed_out,
+                "cancelled": run_id in self._cancelled,
+                "duration": round(time.monotonic() - started, 3),
+            }
+        finally:
+            for task in readers:
+                task.cancel()
+            if process.returncode is None:
+                self._kill(process)
+            if run_id:
+                self._processes.pop(run_id, None)
+
+    @staticmethod
+    def _kill(process: asyncio.subprocess.Process):
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+
+    @staticmethod
+    def _decode_tail(buffer: OutputBuffer) -> str:
+        text = buffer.getvalue().decode(errors="replace").strip()
+        if buffer.truncated:
+            text = f"[... {buffer.total_bytes - len(buffer.getvalue())} bytes truncated ...]\n" + text
+        return text
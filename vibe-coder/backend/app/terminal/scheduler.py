@@ -0,0 +1,168 @@
+import asyncio
+import itertools
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from pydantic import BaseModel
+from loguru import logger
+
+from app.core.config import settings
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Lower value runs first
+PRIORITIES = {"interactive": 0, "background": 1, "agent": 2}
+
+
+class ResourceLimits(BaseModel):
+    """Per-command limits applied in the child before exec. 0 means unlimited."""
+    cpu_seconds: int = 0
+    memory_bytes: int = 0
+    open_files: int = 0
+    nice: int = 0
+
+    @classmethod
+    def for_priority(cls, priority: str) -> "ResourceLimits":
+        return cls(
+            cpu_seconds=settings.TERMINAL_RLIMIT_CPU_SECONDS,
+            memory_bytes=settings.TERMINAL_RLIMIT_MEMORY_BYTES,
+            open_files=settings.TERMINAL_RLIMIT_NOFILE,
+            nice=0 if priority == "interactive" else settings.TERMINAL_BACKGROUND_NICE,
+        )
+
+    def preexec_fn(self) -> Optional[Callable[[], None]]:
+        """Return a function applying the limits in the child, or None if there is nothing to apply."""
+        if resource is None or not (self.cpu_seconds or self.memory_bytes or self.open_files or self.nice):
+            return None
+
+        limits = []
+        if self.cpu_seconds:
+            limits.append((resource.RLIMIT_CPU, self.cpu_seconds))
+        if self.memory_bytes:
+            limits.append((resource.RLIMIT_AS, self.memory_bytes))
+        if self.open_files:
+            limits.append((resource.RLIMIT_NOFILE, self.open_files))
+        nice = self.nice
+
+        def apply():
+            for kind, value in limits:
+                _, hard = resource.getrlimit(kind)
+                if hard != resource.RLIM_INFINITY:
+                    value = min(value, hard)
+                resource.setrlimit(kind, (value, hard))
+            if nice:
+                os.nice(nice)
+
+        return apply
+
+
+class CommandScheduler:
+    """
+    Admits terminal commands under a global and a per-project concurrency cap.
+
+    Waiting commands are started in priority order (interactive before
+    background before agent), first come first served within a priority.
+    A waiter whose project is at its cap does not block other projects.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None, max_per_project: Optional[int] = None):
+        self.max_concurrent = max_concurrent or settings.TERMINAL_MAX_CONCURRENT or os.cpu_count() or 4
+        self.max_per_project = max_per_project or settings.TERMINAL_MAX_PER_PROJECT
+        self._running = 0
+        self._running_by_project: Dict[str, int] = defaultdict(int)
+        self._waiters: List[Dict] = []
+        self._sequence = itertools.count()
+        self._wait_times: Dict[str, deque] = {name: deque(maxlen=256) for name in PRIORITIES}
+        self._admitted: Dict[str, int] = defaultdict(int)
+
+    @asynccontextmanager
+    async def slot(self, project: str = "", priority: str = "interactive") -> AsyncIterator[float]:
+        """Wait for a free slot; yields the time spent waiting in seconds."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {list(PRIORITIES)}")
+
+        started = time.monotonic()
+        await self._acquire(project, priority)
+        waited = time.monotonic() - started
+        self._wait_times[priority].append(waited)
+        self._admitted[priority] += 1
+        if waited > 1:
+            logger.info(f"Command for {project or 'default'} ({priority}) waited {waited:.2f}s for a slot")
+        try:
+            yield waited
+        finally:
+            self._release(project)
+
+    def stats(self) -> Dict:
+        queued = defaultdict(int)
+        for waiter in self._waiters:
+            queued[waiter["priority"]] += 1
+        wait_times = {}
+        for name, samples in self._wait_times.items():
+            wait_times[name] = {
+                "admitted": self._admitted[name],
+                "avg_wait": round(sum(samples) / len(samples), 4) if samples else 0.0,
+                "max_wait": round(max(samples), 4) if samples else 0.0,
+            }
+        return {
+            "running": self._running,
+            "max_concurrent": self.max_concurrent,
+            "max_per_project": self.max_per_project,
+            "queue_depth": len(self._waiters),
+            "queued_by_priority": dict(queued),
+            "running_by_project": {k: v for k, v in self._running_by_project.items() if v},
+            "wait_times": wait_times,
+        }
+
+    def _can_run(self, project: str) -> bool:
+        return self._running < self.max_concurrent and self._running_by_project[project] < self.max_per_project
+
+    def _take(self, project: str):
+        self._running += 1
+        self._running_by_project[project] += 1
+
+    async def _acquire(self, project: str, priority: str):
+        if not self._waiters and self._can_run(project):
+            self._take(project)
+            return
+
+        waiter = {
+            "key": (PRIORITIES[priority], next(self._sequence)),
+            "project": project,
+            "priority": priority,
+            "future": asyncio.get_running_loop().create_future(),
+        }
+        self._waiters.append(waiter)
+        self._dispatch()
+        try:
+            await waiter["future"]
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter["future"].done() and not waiter["future"].cancelled():
+                # Slot was granted just as we were cancelled; hand it on
+                self._release(project)
+            raise
+
+    def _release(self, project: str):
+        self._running -= 1
+        self._running_by_project[project] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        for waiter in sorted(self._waiters, key=lambda w: w["key"]):
+            if self._running >= self.max_concurrent:
+                break
+            if self._can_run(waiter["project"]):
+                self._waiters.remove(waiter)
+                self._take(waiter["project"])
+                waiter["future"].set_result(None)
+
+
+# Shared by every executor and shell session in the process
+command_scheduler = CommandScheduler()
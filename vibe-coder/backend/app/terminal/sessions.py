@@ -0,0 +1,406 @@
+import asyncio
+import os
+import re
+import shlex
+import signal
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+from app.core.config import settings
+from app.terminal.executor import OutputBuffer
+from app.terminal.scheduler import CommandScheduler, ResourceLimits, command_scheduler
+
+try:
+    import fcntl
+    import pty
+    import termios
+except ImportError:  # Windows has no PTYs
+    pty = None
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def _attach_controlling_tty():
+    """Runs in the shell child: new session with the PTY as controlling terminal."""
+    os.setsid()
+    fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+
+
+def _shell_preexec(limits: ResourceLimits) -> Callable[[], None]:
+    """Child setup for a session shell: the PTY, then the same limits as one-off commands."""
+    apply_limits = limits.preexec_fn()
+
+    def preexec():
+        _attach_controlling_tty()
+        if apply_limits is not None:
+            apply_limits()
+
+    return preexec
+
+
+class ShellSession:
+    """
+    A long-lived shell attached to a PTY.
+
+    `cd`, exported variables and activated virtualenvs persist between
+    commands. Each command is followed by a unique sentinel carrying `$?`,
+    which marks the end of its output and its exit code.
+
+    The shell is started under the scheduler's resource limits, which every
+    command it runs inherits. Its niceness is that of the priority the
+    session was created for: unprivileged processes can raise it, not lower
+    it, so it cannot follow each command's priority.
+    """
+
+    def __init__(self, name: str, cwd: str = ".", shell: Optional[str] = None,
+                 limits: Optional[ResourceLimits] = None):
+        self.name = name
+        self.cwd = cwd
+        self.shell = shell or settings.TERMINAL_SHELL or os.environ.get("SHELL") or "/bin/sh"
+        self.limits = limits or ResourceLimits.for_priority("interactive")
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.commands_run = 0
+        self._master: Optional[int] = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._lock = asyncio.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    async def start(self):
+        if pty is None:
+            raise RuntimeError("PTY shell sessions require a POSIX system")
+
+        master, slave = pty.openpty()
+        # No echo and no \n -> \r\n translation, so output comes back verbatim
+        attrs = termios.tcgetattr(slave)
+        attrs[1] &= ~termios.ONLCR
+        attrs[3] &= ~termios.ECHO
+        termios.tcsetattr(slave, termios.TCSANOW, attrs)
+
+        env = dict(os.environ, PS1="", PS2="", TERM="dumb")
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *self._shell_args(),
+                stdin=slave,
+                stdout=slave,
+                stderr=slave,
+                cwd=self.cwd,
+                env=env,
+                preexec_fn=_shell_preexec(self.limits),
+            )
+        finally:
+            os.close(slave)
+
+        self._master = master
+        os.set_blocking(master, False)
+        asyncio.get_running_loop().add_reader(master, self._on_readable)
+
+        # rc files may set their own prompts or terminal modes; reset them and wait until ready
+        await self.run("stty -echo -onlcr 2>/dev/null; PS1=''; PS2=''; PROMPT_COMMAND=''; unset HISTFILE", timeout=10)
+        self.commands_run = 0
+        logger.info(f"Started shell session '{self.name}' ({self.shell}, pid {self.process.pid})")
+
+    async def run(self, command: str, timeout: Optional[float] = None,
+                  max_output_bytes: Optional[int] = None, cwd: Optional[str] = None) -> Tuple[str, int]:
+        """
+        Runs a command inside the session and returns (output, return_code).
+
+        stdout and stderr share the PTY, so they come back interleaved. With
+        `cwd`, the shell changes to it first, in the same turn as the command
+        (ValueError if it cannot); without, it runs wherever the shell is.
+        """
+        if self._master is None:
+            raise RuntimeError(f"Session '{self.name}' is not running")
+        timeout = timeout or settings.TERMINAL_TIMEOUT
+
+        async with self._lock:
+            if cwd is not None:
+                await self._chdir(cwd)
+            return await self._execute(command, timeout, max_output_bytes)
+
+    async def chdir(self, cwd: str):
+        """Change the shell's working directory (ValueError if it cannot)."""
+        async with self._lock:
+            await self._chdir(cwd)
+
+    async def _chdir(self, cwd: str):
+        # Relative to the server's directory, not wherever the shell has cd'ed to
+        output, return_code = await self._execute(f"cd {shlex.quote(os.path.abspath(cwd))}", 10, None)
+        if return_code != 0:
+            raise ValueError(f"Cannot change session '{self.name}' to {cwd}: {output.strip()}")
+        self.cwd = cwd
+
+    async def _execute(self, command: str, timeout: float, max_output_bytes: Optional[int]) -> Tuple[str, int]:
+        self.last_used = time.monotonic()
+        self._drain()
+
+        marker = f"__VIBE_DONE_{uuid.uuid4().hex}__"
+        pattern = re.compile(rb"\n" + marker.encode() + rb":(\d+)\n")
+        sentinel = f"printf '\\n{marker}:%s\\n' \"$?\""
+        # The brace group makes the shell read the sentinel together with
+        # the command, so a command reading stdin cannot swallow it
+        self._write(f"{{ {command}\n}}; {sentinel}\n")
+
+        captured = OutputBuffer(max_output_bytes or settings.TERMINAL_MAX_OUTPUT_BYTES)
+        window = b""
+        keep = len(marker) + 16
+        deadline = time.monotonic() + timeout
+        interrupted = False
+        return_code = -1
+
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                chunk = await asyncio.wait_for(self._queue.get(), max(remaining, 0))
+            except asyncio.TimeoutError:
+                if interrupted:
+                    logger.warning(f"Session '{self.name}' unresponsive, closing")
+                    await self.close()
+                    break
+                # Ctrl-C the foreground job, then ask again for the status
+                logger.warning(f"Command timed out after {timeout}s in session '{self.name}'")
+                interrupted = True
+                deadline = time.monotonic() + 5
+                self._write(f"\x03\n{sentinel}\n")
+                continue
+
+            if chunk is None:
+                logger.warning(f"Session '{self.name}' exited")
+                break
+
+            window += chunk
+            match = pattern.search(window)
+            if match:
+                captured.append(window[:match.start()])
+                return_code = int(match.group(1))
+                break
+            captured.append(window[:-keep])
+            window = window[-keep:]
+
+        self.commands_run += 1
+        self.last_used = time.monotonic()
+        output = captured.getvalue().decode(errors="replace")
+        if interrupted:
+            output += f"\n[Command timed out after {timeout}s]"
+        return output, return_code
+
+    def renice(self, nice: int):
+        """Run later commands at `nice` (applied to the shell, whose children inherit it)."""
+        if nice != self.limits.nice and self.alive:
+            os.setpriority(os.PRIO_PROCESS, self.process.pid, nice)
+            self.limits = self.limits.model_copy(update={"nice": nice})
+
+    async def close(self):
+        if self._master is not None:
+            asyncio.get_running_loop().remove_reader(self._master)
+            os.close(self._master)
+            self._master = None
+        if self.alive:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await self.process.wait()
+        self._queue.put_nowait(None)
+
+    def info(self) -> Dict:
+        return {
+            "name": self.name,
+            "shell": self.shell,
+            "pid": self.process.pid if self.process else None,
+            "alive": self.alive,
+            "busy": self.busy,
+            "commands_run": self.commands_run,
+            "created_at": self.created_at,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1),
+        }
+
+    def _shell_args(self) -> List[str]:
+        # Line editors echo input themselves, which would mix it into the output
+        name = os.path.basename(self.shell)
+        if name == "bash":
+            return [self.shell, "--noediting"]
+        if name == "zsh":
+            return [self.shell, "+Z"]
+        return [self.shell]
+
+    def _write(self, text: str):
+        os.write(self._master, text.encode())
+
+    def _drain(self):
+        """Discard output produced between commands (e.g. by background jobs)."""
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+    def _on_readable(self):
+        try:
+            data = os.read(self._master, READ_CHUNK_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""  # EIO: the shell closed the PTY
+        if not data:
+            asyncio.get_running_loop().remove_reader(self._master)
+            self._queue.put_nowait(None)
+            return
+        self._queue.put_nowait(data)
+
+
+class SessionManager:
+    """
+    Named shell sessions with a warm spare pool, a cap on live sessions and
+    reaping of sessions idle for longer than `idle_timeout` seconds.
+    """
+
+    def __init__(self, max_sessions: Optional[int] = None, idle_timeout: Optional[float] = None,
+                 pool_size: Optional[int] = None, scheduler: Optional[CommandScheduler] = None):
+        self.max_sessions = max_sessions or settings.TERMINAL_MAX_SESSIONS
+        self.scheduler = scheduler or command_scheduler
+        self.idle_timeout = idle_timeout or settings.TERMINAL_SESSION_IDLE_TIMEOUT
+        self.pool_size = settings.TERMINAL_SESSION_POOL_SIZE if pool_size is None else pool_size
+        self.sessions: Dict[str, ShellSession] = {}
+        self._spares: List[ShellSession] = []
+        self._lock = asyncio.Lock()
+        self._reaper: Optional[asyncio.Task] = None
+        self._refill: Optional[asyncio.Task] = None
+
+    async def get_or_create(self, name: str, cwd: Optional[str] = None,
+                            priority: str = "interactive") -> ShellSession:
+        """
+        The live session `name`, moved to `cwd` if one is given (None: stay
+        where it is), or a new one started in `cwd` (default: the server's
+        directory) whose shell runs under the limits for `priority`.
+        Raises ValueError if `cwd` is not a directory.
+        """
+        session, created = await self._get(name, cwd, priority)
+        if not created and cwd is not None:
+            # Outside the manager lock: the session may be busy with a command
+            await session.chdir(cwd)
+        return session
+
+    async def _get(self, name: str, cwd: Optional[str], priority: str) -> Tuple[ShellSession, bool]:
+        """The live session `name` as it is, or a new one started in `cwd`; and whether it is new."""
+        if cwd is not None and not os.path.isdir(cwd):
+            raise ValueError(f"Directory not found: {cwd}")
+        self._ensure_reaper()
+        async with self._lock:
+            session = self.sessions.get(name)
+            existing = session is not None and session.alive
+            if not existing:
+                if session is not None:
+                    # The shell died; release its PTY before replacing it
+                    self.sessions.pop(name)
+                    await session.close()
+                session = await self._create(name, cwd or ".", priority)
+        if not existing:
+            self._schedule_refill()
+        return session, not existing
+
+    async def _create(self, name: str, cwd: str, priority: str) -> ShellSession:
+        """Start a session, from a warm spare if there is one. Called with the manager lock held."""
+        if len(self.sessions) >= self.max_sessions:
+            await self._evict_one()
+
+        limits = ResourceLimits.for_priority(priority)
+        session = self._take_spare()
+        if session:
+            session.name = name
+            # Spares start at interactive priority; niceness can only go up
+            session.renice(limits.nice)
+            try:
+                await session.chdir(cwd)
+            except ValueError:
+                await session.close()
+                raise
+        else:
+            session = ShellSession(name, cwd, limits=limits)
+            await session.start()
+        self.sessions[name] = session
+        return session
+
+    async def run(self, name: str, command: str, cwd: Optional[str] = None, timeout: Optional[float] = None,
+                  max_output_bytes: Optional[int] = None, priority: str = "interactive",
+                  project: Optional[str] = None) -> Tuple[str, int]:
+        session, created = await self._get(name, cwd, priority)
+        async with self.scheduler.slot(project or os.path.abspath(cwd or session.cwd), priority):
+            # An existing session moves to `cwd` in the same turn as the command
+            return await session.run(command, timeout=timeout, max_output_bytes=max_output_bytes,
+                                     cwd=None if created else cwd)
+
+    async def close(self, name: str) -> bool:
+        session = self.sessions.pop(name, None)
+        if session is None:
+            return False
+        await session.close()
+        logger.info(f"Closed shell session '{name}'")
+        return True
+
+    async def close_all(self):
+        for task in (self._reaper, self._refill):
+            if task:
+                task.cancel()
+        for name in list(self.sessions):
+            await self.close(name)
+        while self._spares:
+            await self._spares.pop().close()
+
+    def list(self) -> List[Dict]:
+        return [session.info() for session in self.sessions.values()]
+
+    async def reap_idle(self):
+        now = time.monotonic()
+        for name, session in list(self.sessions.items()):
+            if not session.alive or (not session.busy and now - session.last_used > self.idle_timeout):
+                logger.info(f"Reaping idle shell session '{name}'")
+                await self.close(name)
+
+    async def _evict_one(self):
+        idle = [s for s in self.sessions.values() if not s.busy]
+        if not idle:
+            raise RuntimeError(f"Session limit reached ({self.max_sessions})")
+        victim = min(idle, key=lambda s: s.last_used)
+        logger.info(f"Evicting least recently used shell session '{victim.name}'")
+        self.sessions.pop(victim.name, None)
+        await victim.close()
+
+    def _take_spare(self) -> Optional[ShellSession]:
+        while self._spares:
+            session = self._spares.pop()
+            if session.alive:
+                return session
+        return None
+
+    def _schedule_refill(self):
+        if self.pool_size and (self._refill is None or self._refill.done()):
+            self._refill = asyncio.create_task(self._fill_pool())
+
+    async def _fill_pool(self):
+        try:
+            while len(self._spares) < self.pool_size:
+                spare = ShellSession(f"spare-{uuid.uuid4().hex[:8]}")
+                await spare.start()
+                self._spares.append(spare)
+        except Exception as e:
+            logger.error(f"Failed to warm shell session pool: {e}")
+
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_loop())
+
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(max(self.idle_timeout / 2, 1))
+            try:
+                await self.reap_idle()
+            except Exception as e:
+                logger.error(f"Session reaper error: {e}")
@@ -6,14 +6,28 @@ This module provides functionality to read various file types including:
 - Binary files (.pdf, .docx, .xlsx, etc.)
 - Image files (.jpg, .png, .gif, .bmp, etc.)
 - Audio/Video files (metadata extraction)
+
+Large files can be read by byte or line range through `mmap`, streamed as
+lines or base64 chunks, or previewed up to a size cap.
 """
 
 import os
+import mmap
 import mimetypes
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Union, Dict, Any, Optional
+from typing import Union, Dict, Any, Optional, Iterator
 import base64
 
+from app.core.file_cache import file_cache
+from app.tools.file_sniffer import sniff_file
+
+# Base64 chunks must be a multiple of 3 bytes so they concatenate cleanly
+BASE64_CHUNK_SIZE = 3 * 256 * 1024
+
+# Larger files are returned as a truncated preview unless asked for in full
+DEFAULT_MAX_BYTES = 1024 * 1024
+
 
 class FileReader:
     """Universal file reader that handles multiple file types"""
@@ -55,41 +69,69 @@ class FileReader:
         self.file_path = Path(file_path)
         self.extension = self.file_path.suffix.lower()
         self.mime_type = mimetypes.guess_type(str(self.file_path))[0]
+        self._sniffed: Optional[Dict[str, Optional[str]]] = None
         
         if not self.file_path.exists():
             raise FileNotFoundError(f"File not found: {self.file_path}")
     
-    def read(self, encoding: str = 'utf-8', errors: str = 'ignore') -> Dict[str, Any]:
+    def read(self, encoding: str = 'utf-8', errors: str = 'ignore', metadata_only: bool = False,
+             max_bytes: Optional[int] = DEFAULT_MAX_BYTES) -> Dict[str, Any]:
         """
         Read the file and return its contents with metadata
         
         Args:
             encoding: Text encoding to use (default: utf-8)
             errors: How to handle encoding errors (default: ignore)
+            metadata_only: If True, return metadata and content type without reading content
+            max_bytes: If the file is larger, return only a preview of its first
+                `max_bytes` bytes and set 'truncated' (default: DEFAULT_MAX_BYTES;
+                None reads the whole file, binary content as base64 only)
             
         Returns:
             Dictionary containing file metadata and content
         """
         file_info = self._get_file_info()
-        
-        if self._is_text_file():
-            content = self._read_text(encoding, errors)
-            file_info['content_type'] = 'text'
-            file_info['content'] = content
-        elif self._is_image_file():
-            content = self._read_binary()
-            file_info['content_type'] = 'image'
-            file_info['content'] = content
-            file_info['base64'] = base64.b64encode(content).decode('utf-8')
-        elif self._is_media_file():
-            file_info['content_type'] = 'media'
+        content_type = self._content_type()
+        file_info['content_type'] = content_type
+        file_info['truncated'] = False
+
+        if content_type == 'text':
+            file_info['encoding'] = self._sniff()['encoding']
+            if encoding == 'utf-8' and file_info['encoding'] in ('utf-8-sig', 'utf-16', 'utf-32', 'latin-1'):
+                # A byte order mark or non-UTF-8 content overrides the default encoding
+                encoding = file_info['encoding']
+
+        if metadata_only:
+            file_info['content'] = None
+            return file_info
+
+        if content_type == 'media':
             file_info['content'] = None
             file_info['message'] = 'Media file detected. Use specialized libraries for processing.'
-        else:
+            return file_info
+
+        if max_bytes is not None and file_info['size_bytes'] > max_bytes:
+            # Preview only the head of the file instead of loading all of it
+            file_info['truncated'] = True
+            content = self.read_range(0, max_bytes)
+            if content_type == 'text':
+                file_info['content'] = content.decode(encoding, errors)
+            else:
+                file_info['content'] = content
+                file_info['base64'] = base64.b64encode(content).decode('utf-8')
+            file_info['message'] = f"Showing the first {max_bytes} of {file_info['size_bytes']} bytes."
+            return file_info
+
+        if content_type == 'text':
+            file_info['content'] = self._read_text(encoding, errors)
+        elif file_info['size_bytes'] <= BASE64_CHUNK_SIZE:
             content = self._read_binary()
-            file_info['content_type'] = 'binary'
             file_info['content'] = content
             file_info['base64'] = base64.b64encode(content).decode('utf-8')
+        else:
+            # Encoded chunk by chunk, so the raw bytes are never held as well
+            file_info['content'] = None
+            file_info['base64'] = ''.join(self.iter_base64())
         
         return file_info
     
@@ -115,19 +157,77 @@ class FileReader:
         """
         return self._read_binary()
     
-    def read_lines(self, encoding: str = 'utf-8', errors: str = 'ignore') -> list:
+    def read_range(self, offset: int = 0, length: Optional[int] = None) -> bytes:
+        """
+        Read a byte range of the file without loading the rest of it
+        
+        Args:
+            offset: Byte offset to start at
+            length: Number of bytes to read (default: to the end of the file)
+            
+        Returns:
+            The requested bytes (shorter if the file ends first)
+        """
+        if offset < 0:
+            raise ValueError(f"offset must be non-negative, got {offset}")
+        with self._mmap() as mm:
+            if mm is None or offset >= len(mm):
+                return b''
+            end = len(mm) if length is None else min(offset + length, len(mm))
+            return mm[offset:end]
+    
+    def read_line_range(self, start_line: int = 1, end_line: Optional[int] = None,
+                        encoding: str = 'utf-8', errors: str = 'ignore',
+                        max_bytes: Optional[int] = None) -> str:
         """
-        Read file as list of lines
+        Read a range of lines without loading the rest of the file
         
         Args:
+            start_line: First line to return (1-based)
+            end_line: Last line to return, inclusive (default: to the end of the file)
             encoding: Text encoding to use
             errors: How to handle encoding errors
+            max_bytes: Stop after this many bytes, even mid-line (default: no limit)
             
         Returns:
-            List of lines
+            The requested lines, including their line endings
+        """
+        with self._mmap() as mm:
+            if mm is None:
+                return ''
+            start = 0
+            for _ in range(max(start_line, 1) - 1):
+                start = mm.find(b'\n', start)
+                if start == -1:
+                    return ''
+                start += 1
+
+            limit = len(mm) if max_bytes is None else min(start + max_bytes, len(mm))
+            end = start
+            if end_line is None:
+                end = limit
+            else:
+                for _ in range(end_line - max(start_line, 1) + 1):
+                    newline = mm.find(b'\n', end, limit)
+                    if newline == -1:
+                        end = limit
+                        break
+                    end = newline + 1
+            return mm[start:end].decode(encoding, errors)
+    
+    def read_lines(self, encoding: str = 'utf-8', errors: str = 'ignore') -> Iterator[str]:
+        """
+        Iterate over the lines of the file without reading it all at once
+        
+        Args:
+            encoding: Text encoding to use
+            errors: How to handle encoding errors
+            
+        Yields:
+            Lines, including their line endings
         """
         with open(self.file_path, 'r', encoding=encoding, errors=errors) as f:
-            return f.readlines()
+            yield from f
     
     def read_base64(self) -> str:
         """
@@ -136,26 +236,65 @@ class FileReader:
         Returns:
             Base64 encoded string
         """
-        content = self._read_binary()
-        return base64.b64encode(content).decode('utf-8')
+        return ''.join(self.iter_base64())
+    
+    def iter_base64(self, chunk_size: int = BASE64_CHUNK_SIZE) -> Iterator[str]:
+        """
+        Stream the file as base64 in chunks, never holding the whole file
+        
+        Args:
+            chunk_size: Bytes read per chunk (rounded down to a multiple of 3)
+            
+        Yields:
+            Base64 strings that concatenate to the encoding of the whole file
+        """
+        chunk_size = max(chunk_size - chunk_size % 3, 3)
+        with open(self.file_path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield base64.b64encode(chunk).decode('utf-8')
+    
+    @contextmanager
+    def _mmap(self) -> Iterator[Optional[mmap.mmap]]:
+        """Map the file read-only; yields None for empty files, which cannot be mapped"""
+        with open(self.file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield None
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
     
     def _read_text(self, encoding: str = 'utf-8', errors: str = 'ignore') -> str:
-        """Read file as text"""
-        with open(self.file_path, 'r', encoding=encoding, errors=errors) as f:
-            return f.read()
+        """Read file as text (through the shared content cache), with universal newlines"""
+        text = file_cache.get_text(self.file_path, encoding, errors)
+        return text.replace('\r\n', '\n').replace('\r', '\n')
     
     def _read_binary(self) -> bytes:
-        """Read file as binary"""
-        with open(self.file_path, 'rb') as f:
-            return f.read()
+        """Read file as binary (through the shared content cache)"""
+        return file_cache.get_bytes(self.file_path)
+    
+    def _sniff(self) -> Dict[str, Optional[str]]:
+        """Content type sniffed from the file's first bytes (cached by path, mtime and size)"""
+        if self._sniffed is None:
+            self._sniffed = sniff_file(self.file_path)
+        return self._sniffed
+    
+    def _content_type(self) -> str:
+        """Classify the file as 'text', 'image', 'media' or 'binary'"""
+        kind = self._sniff()['kind']
+        if kind == 'binary':
+            # Formats without a known signature fall back to the extension
+            if self._is_image_file():
+                return 'image'
+            if self._is_media_file():
+                return 'media'
+        return kind
     
     def _is_text_file(self) -> bool:
-        """Check if file is a text file"""
-        if self.extension in self.TEXT_EXTENSIONS:
-            return True
-        if self.mime_type and self.mime_type.startswith('text/'):
-            return True
-        return False
+        """Check if file is a text file, judged by its content"""
+        return self._sniff()['kind'] == 'text'
     
     def _is_image_file(self) -> bool:
         """Check if file is an image file"""
@@ -181,7 +320,7 @@ class FileReader:
             'filename': self.file_path.name,
             'path': str(self.file_path.absolute()),
             'extension': self.extension,
-            'mime_type': self.mime_type,
+            'mime_type': self.mime_type or self._sniff()['mime'],
             'size_bytes': stat.st_size,
             'size_kb': round(stat.st_size / 1024, 2),
             'size_mb': round(stat.st_size / (1024 * 1024), 2),
@@ -200,7 +339,8 @@ def read_file(file_path: Union[str, Path], encoding: str = 'utf-8') -> Dict[str,
         encoding: Text encoding (default: utf-8)
         
     Returns:
-        Dictionary with file info and content
+        Dictionary with file info and content (a preview of the first
+        DEFAULT_MAX_BYTES for larger files)
     """
     reader = FileReader(file_path)
     return reader.read(encoding=encoding)
@@ -260,7 +400,8 @@ if __name__ == "__main__":
     file_path = sys.argv[1]
     
     try:
-        result = read_file(file_path)
+        # Only a preview is printed, so don't load more than that
+        result = FileReader(file_path).read(max_bytes=64 * 1024)
         print(f"File: {result['filename']}")
         print(f"Type: {result['content_type']}")
         print(f"Size: {result['size_kb']} KB")
@@ -0,0 +1,109 @@
+"""
+Content Type Sniffing
+
+Classifies files as text, image, media or binary from their first few KB:
+magic numbers first, then BOM, NUL-byte and UTF-8 validity heuristics.
+Results are cached by (path, mtime, size), so repeated probes of an
+unchanged file cost a single `stat`.
+"""
+
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+# Bytes read from the head of a file
+SNIFF_BYTES = 8192
+
+# (signature, offset, kind, mime type)
+MAGIC_NUMBERS = [
+    (b'\x89PNG\r\n\x1a\n', 0, 'image', 'image/png'),
+    (b'\xff\xd8\xff', 0, 'image', 'image/jpeg'),
+    (b'GIF87a', 0, 'image', 'image/gif'),
+    (b'GIF89a', 0, 'image', 'image/gif'),
+    (b'II*\x00', 0, 'image', 'image/tiff'),
+    (b'MM\x00*', 0, 'image', 'image/tiff'),
+    (b'\x00\x00\x01\x00', 0, 'image', 'image/x-icon'),
+    (b'8BPS', 0, 'image', 'image/vnd.adobe.photoshop'),
+    (b'WEBP', 8, 'image', 'image/webp'),
+    (b'WAVE', 8, 'media', 'audio/wav'),
+    (b'AVI ', 8, 'media', 'video/x-msvideo'),
+    (b'ID3', 0, 'media', 'audio/mpeg'),
+    (b'fLaC', 0, 'media', 'audio/flac'),
+    (b'OggS', 0, 'media', 'audio/ogg'),
+    (b'\x1a\x45\xdf\xa3', 0, 'media', 'video/webm'),
+    (b'ftyp', 4, 'media', 'video/mp4'),
+    (b'%PDF-', 0, 'binary', 'application/pdf'),
+    (b'PK\x03\x04', 0, 'binary', 'application/zip'),
+    (b'\x1f\x8b', 0, 'binary', 'application/gzip'),
+    (b'7z\xbc\xaf\x27\x1c', 0, 'binary', 'application/x-7z-compressed'),
+    (b'Rar!\x1a\x07', 0, 'binary', 'application/vnd.rar'),
+    (b'\x7fELF', 0, 'binary', 'application/x-executable'),
+    (b'\xcf\xfa\xed\xfe', 0, 'binary', 'application/x-mach-binary'),
+    (b'\xca\xfe\xba\xbe', 0, 'binary', 'application/java-vm'),
+    (b'SQLite format 3\x00', 0, 'binary', 'application/vnd.sqlite3'),
+    (b'\x00asm', 0, 'binary', 'application/wasm'),
+]
+
+BOMS = [
+    (b'\xef\xbb\xbf', 'utf-8-sig'),
+    (b'\xff\xfe\x00\x00', 'utf-32'),
+    (b'\x00\x00\xfe\xff', 'utf-32'),
+    (b'\xff\xfe', 'utf-16'),
+    (b'\xfe\xff', 'utf-16'),
+]
+
+# Control characters that legitimately appear in text
+_TEXT_CONTROLS = set(b'\t\n\r\f\b\x1b')
+
+
+def sniff_bytes(head: bytes) -> Dict[str, Optional[str]]:
+    """Classify content from its first bytes."""
+    for signature, offset, kind, mime in MAGIC_NUMBERS:
+        if head[offset:offset + len(signature)] == signature:
+            return {'kind': kind, 'mime': mime, 'encoding': None}
+
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return {'kind': 'text', 'mime': 'text/plain', 'encoding': encoding}
+
+    if not head:
+        return {'kind': 'text', 'mime': 'text/plain', 'encoding': 'utf-8'}
+    if b'\x00' in head:
+        return {'kind': 'binary', 'mime': 'application/octet-stream', 'encoding': None}
+
+    try:
+        head.decode('utf-8')
+        return {'kind': 'text', 'mime': 'text/plain', 'encoding': 'utf-8'}
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off by the end of the sample is still UTF-8
+        if e.start >= len(head) - 3 and e.reason == 'unexpected end of data':
+            return {'kind': 'text', 'mime': 'text/plain', 'encoding': 'utf-8'}
+
+    # Legacy 8-bit encodings: text if control characters are rare
+    controls = sum(1 for b in head if b < 32 and b not in _TEXT_CONTROLS)
+    if controls / len(head) < 0.05:
+        return {'kind': 'text', 'mime': 'text/plain', 'encoding': 'latin-1'}
+    return {'kind': 'binary', 'mime': 'application/octet-stream', 'encoding': None}
+
+
+@lru_cache(maxsize=8192)
+def _sniff_cached(path: str, mtime_ns: int, size: int) -> Dict[str, Optional[str]]:
+    with open(path, 'rb') as f:
+        return sniff_bytes(f.read(SNIFF_BYTES))
+
+
+def sniff_file(file_path: Union[str, Path]) -> Dict[str, Optional[str]]:
+    """
+    Classify a file as 'text', 'image', 'media' or 'binary'.
+
+    Returns:
+        Dictionary with 'kind', 'mime' and, for text, the detected 'encoding'
+    """
+    path = os.fspath(file_path)
+    stat = os.stat(path)
+    return dict(_sniff_cached(path, stat.st_mtime_ns, stat.st_size))
+
+
+def is_text_file(file_path: Union[str, Path]) -> bool:
+    return sniff_file(file_path)['kind'] == 'text'
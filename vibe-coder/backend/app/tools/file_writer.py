@@ -2,25 +2,38 @@
 Universal File Writer Utility
 
 This module provides functionality to Create, Write, Replace, and Append to files.
-It handles both text and binary files.
+It handles both text and binary files. Changes to files inside a registered
+project are recorded in that project's edit history, so they can be undone.
+Overwrites and replacements go through a temporary file and a rename, so a
+crash mid-write never leaves a truncated file behind.
 """
 
 import os
+import re
+import tempfile
 from pathlib import Path
-from typing import Union, List, Optional
+from typing import Union, List, Optional, Dict, Tuple, Iterable
 import base64
 
+from app.core.file_cache import file_cache
+from app.repo.history import EditHistory, find_history
+
 class FileWriter:
     """Universal file writer that handles multiple file operations"""
 
-    def __init__(self, file_path: Union[str, Path]):
+    def __init__(self, file_path: Union[str, Path], history: Optional[EditHistory] = None, fsync: bool = False):
         """
         Initialize the FileWriter with a file path.
         
         Args:
             file_path: Path to the file to operate on
+            history: Edit history to record changes in (default: the history
+                of the registered project containing the file, if any)
+            fsync: If True, flush writes to disk before they are renamed into place
         """
         self.file_path = Path(file_path)
+        self.history = history if history is not None else find_history(self.file_path)
+        self.fsync = fsync
 
     def create(self, content: Union[str, bytes] = "", overwrite: bool = False, encoding: str = 'utf-8') -> bool:
         """
@@ -84,14 +97,7 @@ class FileWriter:
         Returns:
             True if modifications were made, False otherwise
         """
-        if not self.file_path.exists():
-            raise FileNotFoundError(f"File not found: {self.file_path}")
-
-        try:
-            with open(self.file_path, 'r', encoding=encoding) as f:
-                content = f.read()
-        except UnicodeDecodeError:
-            raise ValueError("Cannot perform text replacement on non-text / binary files.")
+        content = self._read_text(encoding)
 
         if target not in content:
             return False
@@ -101,26 +107,180 @@ class FileWriter:
         if new_content == content:
             return False
 
-        with open(self.file_path, 'w', encoding=encoding) as f:
-            f.write(new_content)
+        before = self._snapshot()
+        self._atomic_write(new_content.encode(encoding))
+        self._record(before)
             
         return True
 
+    def multi_replace(self, edits: Union[Dict[str, str], Iterable[Tuple[str, str]]],
+                      encoding: str = 'utf-8') -> Dict[str, int]:
+        """
+        Apply many replacements in a single scan of the file.
+        
+        All targets are matched at once, longest first at each position, and
+        replaced text is never rescanned, so edits cannot cascade into each
+        other. The file is rewritten once, atomically.
+        
+        Args:
+            edits: Mapping or (target, replacement) pairs
+            encoding: Encoding for text content
+            
+        Returns:
+            Number of replacements made for each target
+        """
+        pairs = list(edits.items()) if isinstance(edits, dict) else [tuple(e) for e in edits]
+        replacements = {}
+        for target, replacement in pairs:
+            if not target:
+                raise ValueError("Replacement targets must be non-empty")
+            if target in replacements and replacements[target] != replacement:
+                raise ValueError(f"Conflicting replacements for target: {target!r}")
+            replacements[target] = replacement
+
+        counts = {target: 0 for target in replacements}
+        if not replacements:
+            return counts
+        content = self._read_text(encoding)
+
+        def substitute(match: re.Match) -> str:
+            counts[match.group(0)] += 1
+            return replacements[match.group(0)]
+
+        new_content = _build_matcher(replacements).sub(substitute, content)
+        if new_content != content:
+            before = self._snapshot()
+            self._atomic_write(new_content.encode(encoding))
+            self._record(before)
+        return counts
+
+    def _read_text(self, encoding: str) -> str:
+        if not self.file_path.exists():
+            raise FileNotFoundError(f"File not found: {self.file_path}")
+        try:
+            return file_cache.get_text(self.file_path, encoding)
+        except UnicodeDecodeError:
+            raise ValueError("Cannot perform text replacement on non-text / binary files.")
+
+    def _atomic_write(self, data: bytes):
+        """Write `data` to a temporary file next to the target and rename it into place"""
+        directory = self.file_path.parent
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{self.file_path.name}.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            if self.file_path.exists():
+                os.chmod(tmp_path, self.file_path.stat().st_mode & 0o7777)
+            else:
+                # mkstemp creates files 0600; give new files the usual umask-based mode
+                umask = os.umask(0)
+                os.umask(umask)
+                os.chmod(tmp_path, 0o666 & ~umask)
+            os.replace(tmp_path, self.file_path)
+            file_cache.put(self.file_path, data)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        if self.fsync and os.name == 'posix':
+            # Persist the rename itself
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def _snapshot(self) -> Optional[bytes]:
+        """Current file content, captured only when an edit history is attached"""
+        if self.history is None or not self.file_path.exists():
+            return None
+        return file_cache.get_bytes(self.file_path)
+
+    def _record(self, before: Optional[bytes]):
+        """Record the change since `before` in the edit history"""
+        if self.history is not None:
+            self.history.record(self.file_path, before, file_cache.get_bytes(self.file_path))
+
     def _write_content(self, content: Union[str, bytes], mode: str, encoding: str) -> bool:
         """Internal helper to write content"""
-        if isinstance(content, str):
+        before = self._snapshot()
+        if mode == 'w':
+            if isinstance(content, str):
+                content = content.encode(encoding)
+            elif not isinstance(content, bytes):
+                raise TypeError("Content must be str or bytes")
+            self._atomic_write(content)
+        elif isinstance(content, str):
             with open(self.file_path, mode, encoding=encoding) as f:
                 f.write(content)
+            if self.fsync:
+                self._fsync_file()
+            file_cache.invalidate(self.file_path)
         elif isinstance(content, bytes):
             # Binary mode requires 'b' in the mode string (e.g., 'wb', 'ab')
             bin_mode = mode + 'b'
             with open(self.file_path, bin_mode) as f:
                 f.write(content)
+            if self.fsync:
+                self._fsync_file()
+            file_cache.invalidate(self.file_path)
         else:
             raise TypeError("Content must be str or bytes")
         
+        self._record(before)
         return True
 
+    def _fsync_file(self):
+        fd = os.open(self.file_path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+# Above this many targets the alternation is compiled as a trie, so matching
+# cost depends on the text rather than on the number of targets
+TRIE_THRESHOLD = 32
+# Longest target put in the trie; each character nests a group, and the regex
+# parser recurses per group, so longer targets are plain alternatives instead
+TRIE_MAX_TARGET_LENGTH = 64
+
+
+def _build_matcher(targets: Iterable[str]) -> re.Pattern:
+    """Compile one regex matching any target, preferring the longest at each position"""
+    targets = sorted(set(targets), key=len, reverse=True)
+    if len(targets) <= TRIE_THRESHOLD:
+        return re.compile("|".join(re.escape(t) for t in targets))
+
+    # Long targets are tried first: all of them are longer than anything in the trie
+    alternatives = [re.escape(t) for t in targets if len(t) > TRIE_MAX_TARGET_LENGTH]
+    trie: Dict = {}
+    for target in targets:
+        if len(target) > TRIE_MAX_TARGET_LENGTH:
+            continue
+        node = trie
+        for char in target:
+            node = node.setdefault(char, {})
+        node[""] = True
+    if trie:
+        alternatives.append(_trie_pattern(trie))
+    return re.compile("|".join(alternatives))
+
+
+def _trie_pattern(node: Dict) -> str:
+    terminal = "" in node
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in node.items() if char != ""]
+    if not branches:
+        return ""
+    body = "(?:" + "|".join(branches) + ")"
+    # A target may end here; the greedy '?' still tries longer targets first
+    return body + "?" if terminal else body
+
 # Convenience functions
 def create_file(file_path: Union[str, Path], content: Union[str, bytes] = "", overwrite: bool = False, encoding: str = 'utf-8') -> bool:
     """Create a file"""
@@ -138,6 +298,10 @@ def replace_in_file(file_path: Union[str, Path], target: str, replacement: str,
     """Replaces text in file"""
     return FileWriter(file_path).replace(target, replacement, count, encoding)
 
+def multi_replace_in_file(file_path: Union[str, Path], edits: Union[Dict[str, str], Iterable[Tuple[str, str]]], encoding: str = 'utf-8') -> Dict[str, int]:
+    """Applies many replacements to a file in one pass"""
+    return FileWriter(file_path).multi_replace(edits, encoding)
+
 if __name__ == "__main__":
     import sys
     
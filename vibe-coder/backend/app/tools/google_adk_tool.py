@@ -3,17 +3,29 @@
 Google AI Developer Kit (ADK) tool definition for reading files.
 This module provides a function `read_file_tool` that conforms to the Google
 function calling schema. It uses the existing `FileReader` utility to read any
-supported file type and returns a structured dictionary.
+supported file type and returns a structured dictionary. `read_files_tool`
+reads many files (by path or glob) concurrently in a single tool call.
 """
 
-from typing import Dict, Any, Union
+import os
+from typing import Dict, Any, Union, Optional, List
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import base64
 
 # Import the existing FileReader implementation
-from .file_reader import FileReader
+from .file_reader import DEFAULT_MAX_BYTES, FileReader
 
+# Batch reads: total content budget, file count cap and reader threads
+DEFAULT_BATCH_MAX_BYTES = 2 * 1024 * 1024
+DEFAULT_BATCH_MAX_FILES = 100
+BATCH_WORKERS = 16
 
-def read_file_tool(file_path: Union[str, Path], encoding: str = "utf-8") -> Dict[str, Any]:
+
+def read_file_tool(file_path: Union[str, Path], encoding: str = "utf-8",
+                   start_line: Optional[int] = None, end_line: Optional[int] = None,
+                   offset: Optional[int] = None, length: Optional[int] = None,
+                   metadata_only: bool = False, max_bytes: int = DEFAULT_MAX_BYTES) -> Dict[str, Any]:
     """Read a file and return its contents with metadata.
 
     This function is designed to be used as a Google ADK tool. The return value
@@ -22,13 +34,142 @@ def read_file_tool(file_path: Union[str, Path], encoding: str = "utf-8") -> Dict
     Args:
         file_path: Path to the file to read.
         encoding: Text encoding to use for text files (default: "utf-8").
+        start_line: First line to read (1-based). Enables a line-range read.
+        end_line: Last line to read, inclusive (default: end of file).
+        offset: Byte offset to start at. Enables a byte-range read.
+        length: Number of bytes to read from `offset`.
+        metadata_only: Return metadata and content type without content.
+        max_bytes: Cap on returned content; larger content is truncated.
 
     Returns:
         A dictionary containing file metadata and content. For binary files,
         the content is base64‑encoded.
     """
     reader = FileReader(file_path)
-    return reader.read(encoding=encoding)
+    if start_line is None and end_line is None and offset is None:
+        return reader.read(encoding=encoding, metadata_only=metadata_only, max_bytes=max_bytes)
+
+    result = reader.read(encoding=encoding, metadata_only=True)
+    if start_line is not None or end_line is not None:
+        # One byte past the cap tells a truncated range from one that fits
+        text = reader.read_line_range(start_line or 1, end_line, encoding=encoding, max_bytes=max_bytes + 1)
+        data = text.encode(encoding, errors="ignore")
+        result["start_line"] = start_line or 1
+        result["end_line"] = end_line
+    else:
+        data = reader.read_range(offset, min(length, max_bytes + 1) if length is not None else max_bytes + 1)
+        result["offset"] = offset
+
+    result["truncated"] = len(data) > max_bytes
+    data = data[:max_bytes]
+    if result["content_type"] == "text":
+        result["content"] = data.decode(encoding, errors="ignore")
+    else:
+        result["content"] = None
+        result["base64"] = base64.b64encode(data).decode("utf-8")
+    return result
+
+
+def read_files_tool(files: Optional[List[Union[str, Dict[str, Any]]]] = None,
+                    globs: Optional[List[str]] = None, root: Union[str, Path] = ".",
+                    encoding: str = "utf-8", max_total_bytes: int = DEFAULT_BATCH_MAX_BYTES,
+                    max_bytes_per_file: int = DEFAULT_MAX_BYTES,
+                    max_files: int = DEFAULT_BATCH_MAX_FILES) -> Dict[str, Any]:
+    """Read many files concurrently and return them in one response.
+
+    Args:
+        files: Paths, or dicts with `file_path` and optional `start_line`/`end_line`.
+        globs: Glob patterns (e.g. "src/**/*.py"), relative to `root`.
+        root: Directory that relative paths and globs are resolved against.
+        encoding: Text encoding to use for text files (default: "utf-8").
+        max_total_bytes: Content budget for the whole response, in bytes of
+            file content (before base64 encoding), shared out in request
+            order. A file the budget only partly covers is truncated; files
+            past it are returned with metadata only. Both have `truncated`
+            and `budget_exhausted` set.
+        max_bytes_per_file: Content cap for each file, in bytes.
+        max_files: Maximum number of files to read.
+
+    Returns:
+        A dictionary with a `files` list (one entry per file, in request
+        order, errors reported per file) and totals.
+    """
+    root_path = Path(root)
+    requests: List[Dict[str, Any]] = []
+    seen = set()
+
+    def add(path: Path, spec: Dict[str, Any]):
+        path = path if path.is_absolute() else root_path / path
+        key = (str(path), spec.get("start_line"), spec.get("end_line"))
+        if key not in seen:
+            seen.add(key)
+            requests.append(dict(spec, file_path=path))
+
+    for entry in files or []:
+        spec = {"file_path": entry} if isinstance(entry, (str, Path)) else dict(entry)
+        add(Path(spec["file_path"]), spec)
+    for pattern in globs or []:
+        for path in sorted(root_path.glob(pattern)):
+            if path.is_file():
+                add(path, {})
+
+    skipped = max(len(requests) - max_files, 0)
+    requests = requests[:max_files]
+
+    # Share out the budget before reading, so no file is read past what can
+    # be returned; sizes from stat bound what each file can use
+    budgets = []
+    remaining = max_total_bytes
+    for spec in requests:
+        try:
+            size = os.stat(spec["file_path"]).st_size
+        except OSError:
+            size = 0
+        wanted = min(max_bytes_per_file, size)
+        budget = min(wanted, remaining)
+        budgets.append((budget, budget < wanted))
+        remaining -= budget
+
+    def read_one(spec: Dict[str, Any], budget: int, exhausted: bool) -> Dict[str, Any]:
+        try:
+            if exhausted and not budget:
+                result = FileReader(spec["file_path"]).read(encoding=encoding, metadata_only=True)
+            else:
+                result = read_file_tool(
+                    spec["file_path"], encoding=encoding, start_line=spec.get("start_line"),
+                    end_line=spec.get("end_line"), max_bytes=budget,
+                )
+        except Exception as e:
+            return {"path": str(spec["file_path"]), "error": str(e)}
+        if result.get("base64") is not None:
+            # Raw bytes are not JSON-serializable; base64 carries the content
+            result["content"] = None
+        # A line range may still fit in what was left of the budget
+        if exhausted and (not budget or result.get("truncated")):
+            result["truncated"] = True
+            result["budget_exhausted"] = True
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, min(BATCH_WORKERS, len(requests)))) as pool:
+        results = list(pool.map(read_one, requests, *zip(*budgets))) if requests else []
+
+    return {
+        "files": results,
+        "total_bytes": sum(_content_bytes(r, encoding) for r in results),
+        "truncated": any(r.get("truncated") for r in results) or skipped > 0,
+        "skipped_files": skipped,
+        "errors": sum(1 for r in results if "error" in r),
+    }
+
+
+def _content_bytes(result: Dict[str, Any], encoding: str) -> int:
+    """Size in bytes of the content in a read result (decoded, for base64)."""
+    if result.get("base64"):
+        data = result["base64"]
+        return len(data) * 3 // 4 - data[-2:].count("=")
+    if result.get("content"):
+        return len(result["content"].encode(result.get("encoding") or encoding, errors="ignore"))
+    return 0
 
 
 def get_tool_definition() -> Dict[str, Any]:
@@ -53,12 +194,83 @@ def get_tool_definition() -> Dict[str, Any]:
                     "type": "string",
                     "description": "Encoding to use for text files (default: 'utf-8').",
                     "default": "utf-8"
+                },
+                "start_line": {
+                    "type": "integer",
+                    "description": "First line to read (1-based). Use with end_line to read part of a large file."
+                },
+                "end_line": {
+                    "type": "integer",
+                    "description": "Last line to read, inclusive (default: end of file)."
+                },
+                "offset": {
+                    "type": "integer",
+                    "description": "Byte offset to start reading at."
+                },
+                "length": {
+                    "type": "integer",
+                    "description": "Number of bytes to read from offset."
+                },
+                "metadata_only": {
+                    "type": "boolean",
+                    "description": "Return only metadata (size, type, timestamps) without content.",
+                    "default": False
+                },
+                "max_bytes": {
+                    "type": "integer",
+                    "description": "Maximum bytes of content to return; larger content is truncated.",
+                    "default": DEFAULT_MAX_BYTES
                 }
             },
             "required": ["file_path"]
         }
     }
 
+def get_batch_tool_definition() -> Dict[str, Any]:
+    """Return the Google ADK tool definition for `read_files_tool`."""
+    return {
+        "name": "read_files_tool",
+        "description": "Read many files in one call, by path and/or glob, with optional line ranges per file. Prefer this over repeated read_file_tool calls.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "files": {
+                    "type": "array",
+                    "description": "Files to read, each with an optional line range.",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "file_path": {"type": "string", "description": "Path to the file."},
+                            "start_line": {"type": "integer", "description": "First line to read (1-based)."},
+                            "end_line": {"type": "integer", "description": "Last line to read, inclusive."}
+                        },
+                        "required": ["file_path"]
+                    }
+                },
+                "globs": {
+                    "type": "array",
+                    "description": "Glob patterns such as 'src/**/*.py', relative to root.",
+                    "items": {"type": "string"}
+                },
+                "root": {
+                    "type": "string",
+                    "description": "Directory that relative paths and globs are resolved against.",
+                    "default": "."
+                },
+                "max_total_bytes": {
+                    "type": "integer",
+                    "description": "Content budget for the whole response; files past it are marked truncated.",
+                    "default": DEFAULT_BATCH_MAX_BYTES
+                }
+            }
+        }
+    }
+
+
+def get_tool_definitions() -> List[Dict[str, Any]]:
+    """Return Google ADK tool definitions for all reading tools."""
+    return [get_tool_definition(), get_batch_tool_definition()]
+
 # Example usage (not executed when imported as a tool)
 if __name__ == "__main__":
     import json, sys
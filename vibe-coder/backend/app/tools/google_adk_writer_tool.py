@@ -1,8 +1,9 @@
 # Google ADK Tool Wrapper for FileWriter
 """
 Google AI Developer Kit (ADK) tool definition for writing files.
-This module provides functions `write_file_tool`, `append_file_tool`, and
-`replace_in_file_tool` that conform to the Google function calling schema.
+This module provides functions `write_file_tool`, `append_file_tool`,
+`replace_in_file_tool` and `multi_replace_in_file_tool` that conform to the
+Google function calling schema.
 """
 
 from typing import Dict, Any, Union, List
@@ -98,6 +99,39 @@ def replace_in_file_tool(file_path: Union[str, Path], target: str, replacement:
             "path": str(file_path)
         }
 
+def multi_replace_in_file_tool(file_path: Union[str, Path], edits: List[Dict[str, str]],
+                               encoding: str = "utf-8", fsync: bool = False) -> Dict[str, Any]:
+    """Apply several replacements to a file in one atomic write.
+    
+    Args:
+        file_path: Path to the target file.
+        edits: List of {"target": ..., "replacement": ...} objects.
+        encoding: File encoding.
+        fsync: Flush the file to disk before it replaces the original.
+        
+    Returns:
+        Dictionary with success status, message and per-target counts.
+    """
+    try:
+        pairs = [(edit["target"], edit["replacement"]) for edit in edits]
+        counts = FileWriter(file_path, fsync=fsync).multi_replace(pairs, encoding=encoding)
+        total = sum(counts.values())
+        return {
+            "success": True,
+            "changed": total > 0,
+            "replacements": total,
+            "counts": counts,
+            "missing": [target for target, n in counts.items() if n == 0],
+            "message": f"Applied {total} replacement(s) in: {file_path}",
+            "path": str(file_path)
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error replacing in file: {str(e)}",
+            "path": str(file_path)
+        }
+
 def get_tool_definitions() -> List[Dict[str, Any]]:
     """Return Google ADK tool definitions for writing tools."""
     return [
@@ -139,5 +173,29 @@ def get_tool_definitions() -> List[Dict[str, Any]]:
                 },
                 "required": ["file_path", "target", "replacement"]
             }
+        },
+        {
+            "name": "multi_replace_in_file_tool",
+            "description": "Apply several text replacements to one file in a single atomic write. Prefer this over repeated replace_in_file_tool calls.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "file_path": { "type": "string", "description": "Path to the file." },
+                    "edits": {
+                        "type": "array",
+                        "description": "Replacements to apply. Targets are matched in the original text; replaced text is not searched again.",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "target": { "type": "string", "description": "Text string to find." },
+                                "replacement": { "type": "string", "description": "Text string to replace with." }
+                            },
+                            "required": ["target", "replacement"]
+                        }
+                    },
+                    "fsync": { "type": "boolean", "default": False, "description": "Flush to disk before replacing the file." }
+                },
+                "required": ["file_path", "edits"]
+            }
         }
     ]
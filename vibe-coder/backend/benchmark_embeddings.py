@@ -0,0 +1,147 @@
+"""
+Embedding backend benchmark and parity check.
+
+Encodes the files of a project with each encoder backend and reports
+throughput, plus how closely each backend agrees with the full-precision
+PyTorch reference: per-document cosine similarity and the overlap of
+top-k search results for sample queries.
+
+It then stores the reference vectors in each vector index type and reports
+index size and recall@k against exact search, and compares the memory of
+the columnar DocumentStore with plain document dicts.
+
+Usage: python benchmark_embeddings.py [--path app] [--backends torch onnx ...]
+                                      [--index-types flat fp16 sq8 pq]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+sys.path.append(os.getcwd())
+
+from app.ai_engine.document_store import DocumentStore
+from app.ai_engine.encoders import ENCODERS, get_encoder
+from app.ai_engine.vector_index import INDEX_TYPES, build_faiss_index, index_nbytes
+from app.repo.scanner import RepoScanner
+
+QUERIES = [
+    "where are terminal commands executed",
+    "parse a python traceback",
+    "read a range of lines from a file",
+    "undo the last edit",
+    "websocket chat endpoint",
+]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def top_k(doc_vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> list:
+    scores = normalize(query_vectors) @ normalize(doc_vectors).T
+    return [set(np.argsort(-row)[:k]) for row in scores]
+
+
+def deep_size(value) -> int:
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(k) + deep_size(v) for k, v in value.items())
+    elif isinstance(value, list):
+        size += sum(deep_size(v) for v in value)
+    return size
+
+
+def compare_index_types(docs: np.ndarray, queries: np.ndarray, index_types: list, k: int):
+    # Documents double as queries so recall is measured over the whole corpus
+    probes = np.concatenate([queries, docs[:500]]).astype('float32')
+    _, exact = build_faiss_index(docs, "flat").search(probes, k)
+    print(f"\n{'index':<8}{'type':<22}{'bytes':>12}{'x smaller':>11}{'recall@' + str(k):>11}")
+    flat_bytes = None
+    for index_type in index_types:
+        index = build_faiss_index(docs, index_type)
+        _, found = index.search(probes, k)
+        recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(found, exact)])
+        size = index_nbytes(index)
+        flat_bytes = flat_bytes or (size if index_type == "flat" else docs.nbytes)
+        print(f"{index_type:<8}{type(index).__name__:<22}{size:>12}{flat_bytes / size:>11.1f}{recall:>11.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=str(Path(os.getcwd()) / "app"), help="Project to encode")
+    parser.add_argument("--backends", nargs="+", default=list(ENCODERS), choices=list(ENCODERS))
+    parser.add_argument("--model", default=None, help="Model name (default: EMBEDDING_MODEL)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--index-types", nargs="*", default=list(INDEX_TYPES), choices=list(INDEX_TYPES))
+    args = parser.parse_args()
+
+    documents = RepoScanner(args.path).scan()
+    texts = [doc["content"] for doc in documents]
+    if not texts:
+        logger.error(f"No files to encode in {args.path}")
+        sys.exit(1)
+    total_chars = sum(len(t) for t in texts)
+    logger.info(f"Encoding {len(texts)} files ({total_chars / 1024:.0f} KB) from {args.path}")
+
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    reference = None
+    rows = []
+    for backend in backends:
+        try:
+            started = time.perf_counter()
+            encoder = get_encoder(backend, args.model)
+            load_time = time.perf_counter() - started
+            encoder.encode(texts[:args.batch_size], batch_size=args.batch_size)  # warm up
+            started = time.perf_counter()
+            docs = encoder.encode(texts, batch_size=args.batch_size)
+            encode_time = time.perf_counter() - started
+            queries = encoder.encode(QUERIES)
+        except Exception as e:
+            logger.error(f"{backend}: unavailable ({e})")
+            continue
+
+        row = {
+            "backend": backend,
+            "dim": encoder.dimension,
+            "load_s": load_time,
+            "docs_per_s": len(texts) / encode_time,
+            "cos_mean": 1.0,
+            "cos_min": 1.0,
+            "topk_overlap": 1.0,
+        }
+        if reference is None:
+            reference = (docs, top_k(docs, queries, args.k), queries)
+        else:
+            cosine = np.sum(normalize(docs) * normalize(reference[0]), axis=1)
+            hits = top_k(docs, queries, args.k)
+            row["cos_mean"] = float(cosine.mean())
+            row["cos_min"] = float(cosine.min())
+            row["topk_overlap"] = float(np.mean([len(a & b) / args.k for a, b in zip(hits, reference[1])]))
+        rows.append(row)
+
+    if not rows:
+        sys.exit(1)
+    print(f"\n{'backend':<12}{'dim':>6}{'load s':>9}{'docs/s':>10}{'cos mean':>10}{'cos min':>10}{'top-' + str(args.k):>8}")
+    for r in rows:
+        print(f"{r['backend']:<12}{r['dim']:>6}{r['load_s']:>9.2f}{r['docs_per_s']:>10.1f}"
+              f"{r['cos_mean']:>10.4f}{r['cos_min']:>10.4f}{r['topk_overlap']:>8.2f}")
+    if rows[0]["backend"] != "torch":
+        logger.warning("PyTorch reference unavailable; parity columns compare against the first backend")
+
+    if args.index_types:
+        compare_index_types(reference[0], reference[2], args.index_types, args.k)
+
+    store = DocumentStore(documents)
+    print(f"\ndocument metadata: {deep_size(documents)} bytes as dicts, "
+          f"{store.nbytes()} bytes in DocumentStore (content served from disk)")
+
+
+if __name__ == "__main__":
+    main()
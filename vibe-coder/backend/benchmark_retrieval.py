@@ -0,0 +1,94 @@
+"""
+Lexical index benchmark.
+
+Builds the BM25 index over a project and reports build time, the latency it
+adds to each query (BM25 search plus rank fusion), and the cost of an
+incremental single-document update. If an encoder backend can be loaded,
+vector search latency is reported alongside for comparison.
+
+Usage: python benchmark_retrieval.py [--path app] [--queries 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+sys.path.append(os.getcwd())
+
+from app.ai_engine.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+from app.repo.scanner import RepoScanner
+
+
+def percentiles(samples: list) -> str:
+    ms = np.array(samples) * 1000
+    return f"mean {ms.mean():.3f} ms, p50 {np.percentile(ms, 50):.3f} ms, p95 {np.percentile(ms, 95):.3f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=str(Path(os.getcwd()) / "app"), help="Project to index")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled queries")
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    documents = RepoScanner(args.path).scan()
+    if not documents:
+        logger.error(f"No files to index in {args.path}")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    index = BM25Index()
+    for doc_id, doc in enumerate(documents):
+        index.add(doc_id, f"{doc['path']}\n{doc['content']}")
+    build = time.perf_counter() - started
+    total_kb = sum(len(d["content"]) for d in documents) / 1024
+    print(f"build: {len(documents)} files, {total_kb:.0f} KB in {build:.3f}s ({total_kb / max(build, 1e-9):.0f} KB/s)")
+
+    # Queries are identifiers and phrases sampled from the corpus itself
+    rng = random.Random(0)
+    vocabulary = sorted({t for d in documents for t in tokenize(d["content"])})
+    queries = [" ".join(rng.sample(vocabulary, min(3, len(vocabulary)))) for _ in range(args.queries)]
+
+    lexical_times, fusion_times = [], []
+    for query in queries:
+        started = time.perf_counter()
+        hits = [doc_id for doc_id, _ in index.search(query, args.k)]
+        lexical_times.append(time.perf_counter() - started)
+        vector = rng.sample(range(len(documents)), min(args.k, len(documents)))
+        started = time.perf_counter()
+        reciprocal_rank_fusion([vector, hits])
+        fusion_times.append(time.perf_counter() - started)
+    print(f"bm25 query: {percentiles(lexical_times)}")
+    print(f"rank fusion: {percentiles(fusion_times)}")
+
+    update_times = []
+    for doc_id in rng.sample(range(len(documents)), min(50, len(documents))):
+        started = time.perf_counter()
+        index.add(doc_id, f"{documents[doc_id]['path']}\n{documents[doc_id]['content']}")
+        update_times.append(time.perf_counter() - started)
+    print(f"incremental update: {percentiles(update_times)}")
+
+    try:
+        from app.ai_engine.embeddings import EmbeddingManager
+        manager = EmbeddingManager()
+    except Exception as e:
+        logger.warning(f"Vector comparison skipped: encoder unavailable ({e})")
+        return
+    manager.create_index(documents)
+    vector_times = []
+    for query in queries[:50]:
+        started = time.perf_counter()
+        vector = manager.generate_embeddings([query]).astype("float32")
+        manager.index.search(vector, args.k)
+        vector_times.append(time.perf_counter() - started)
+    print(f"vector query (encode + search): {percentiles(vector_times)}")
+
+
+if __name__ == "__main__":
+    main()
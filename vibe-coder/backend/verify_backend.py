@@ -14,6 +14,7 @@ try:
     from app.repo.scanner import RepoScanner
     from app.repo.diff_manager import DiffManager
     from app.terminal.executor import TerminalExecutor
+    from app.tools.file_writer import FileWriter
 except ImportError as e:
     logger.error(f"Import Error: {e}")
     sys.exit(1)
@@ -51,6 +52,20 @@ async def test_backend():
     else:
         logger.error(f"Terminal Executor Failed: {stderr}")
 
+    # 4. Test File Writer multi-replace with many long targets (trie path)
+    logger.info("Testing File Writer multi-replace...")
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        target_file = Path(tmp) / "long_targets.txt"
+        targets = [f"block {i} " + "x" * 2000 for i in range(40)] + [f"name{i}" for i in range(40)]
+        target_file.write_text("\n".join(targets))
+        counts = FileWriter(target_file).multi_replace({t: f"<{n}>" for n, t in enumerate(targets)})
+        expected = "\n".join(f"<{n}>" for n in range(len(targets)))
+        if all(c == 1 for c in counts.values()) and target_file.read_text() == expected:
+            logger.info("File Writer Success: long targets replaced")
+        else:
+            logger.error(f"File Writer Failed: {counts}")
+
     logger.info("Backend Verification Complete.")
 
 if __name__ == "__main__":
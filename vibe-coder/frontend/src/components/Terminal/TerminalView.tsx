@@ -8,30 +8,36 @@ const TerminalView: React.FC = () => {
     const [cwd, setCwd] = useState('d:\\New folder\\Vide-Coder---testing'); // Default for MVP
     const [isLoading, setIsLoading] = useState(false);
     const bottomRef = useRef<HTMLDivElement>(null);
+    const runningRef = useRef<{ cancel: () => void } | null>(null);
 
     useEffect(() => {
         bottomRef.current?.scrollIntoView({ behavior: 'smooth' });
     }, [output]);
 
     const handleKeyDown = async (e: React.KeyboardEvent) => {
+        if (e.key === 'c' && e.ctrlKey && runningRef.current) {
+            runningRef.current.cancel();
+            return;
+        }
         if (e.key === 'Enter' && !e.shiftKey) {
-            if (!input.trim()) return;
+            if (!input.trim() || isLoading) return;
 
             const command = input;
             setInput('');
             setOutput(prev => prev + `\n$ ${command}\n`);
             setIsLoading(true);
 
-            try {
-                const res = await terminalService.run(command, cwd);
-                if (res.stdout) setOutput(prev => prev + res.stdout + '\n');
-                if (res.stderr) setOutput(prev => prev + res.stderr + '\n');
-                if (res.return_code !== 0) setOutput(prev => prev + `Exit code: ${res.return_code}\n`);
-            } catch (err: any) {
-                setOutput(prev => prev + `Error: ${err.message}\n`);
-            } finally {
-                setIsLoading(false);
-            }
+            runningRef.current = terminalService.stream(command, cwd, (event) => {
+                if (event.type === 'stdout' || event.type === 'stderr') {
+                    setOutput(prev => prev + event.data);
+                } else if (event.type === 'exit' || event.type === 'error') {
+                    if (event.timed_out) setOutput(prev => prev + 'Command timed out\n');
+                    if (event.type === 'error') setOutput(prev => prev + `Error: ${event.message}\n`);
+                    else if (event.return_code !== 0) setOutput(prev => prev + `Exit code: ${event.return_code}\n`);
+                    runningRef.current = null;
+                    setIsLoading(false);
+                }
+            });
         }
     };
 
@@ -55,7 +61,7 @@ const TerminalView: React.FC = () => {
                     onChange={(e) => setInput(e.target.value)}
                     onKeyDown={handleKeyDown}
                     autoFocus
-                    disabled={isLoading}
+                    readOnly={isLoading}
                 />
             </div>
         </div>
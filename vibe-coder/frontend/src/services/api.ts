@@ -68,5 +68,34 @@ export const terminalService = {
             throw new Error('Failed to run command');
         }
         return response.json();
+    },
+
+    stream(command: string, cwd: string | undefined, onEvent: (event: any) => void) {
+        const socket = new WebSocket(`${API_BASE_URL.replace(/^http/, 'ws')}/terminal/ws`);
+        // Set once the caller has seen the final event, so it is sent exactly once
+        let finished = false;
+        const finish = (event: any) => {
+            if (finished) return;
+            finished = true;
+            onEvent(event);
+            socket.close();
+        };
+        socket.onopen = () => socket.send(JSON.stringify({ command, cwd }));
+        socket.onmessage = (message) => {
+            const event = JSON.parse(message.data);
+            if (event.type === 'exit' || event.type === 'error') finish(event);
+            else onEvent(event);
+        };
+        socket.onerror = () => finish({ type: 'error', message: 'Terminal connection failed' });
+        // A socket dropped before the exit event would otherwise leave the command "running"
+        socket.onclose = () => finish({ type: 'error', message: 'Terminal connection closed' });
+
+        return {
+            cancel() {
+                if (socket.readyState === WebSocket.OPEN) {
+                    socket.send(JSON.stringify({ type: 'cancel' }));
+                }
+            }
+        };
     }
 };